@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 
 import subprocess as sp
-from itertools import tee
 import numpy as np
 import random
 
@@ -10,6 +9,7 @@ from sklearn.metrics.pairwise import pairwise_kernels
 
 from eden.path import Vectorizer as SeqVectorizer
 from eden.graph import Vectorizer as GraphVectorizer
+from eden.util.source import fan_out
 from eden.converter.rna import sequence_dotbracket_to_graph
 from eden.converter.fasta import seq_to_networkx
 from eden.converter.rna import rnafold
@@ -104,7 +104,9 @@ class Vectorizer(object):
         return self
 
     def fit_transform(self, seqs, sampling_prob=None, n_iter=None):
-        seqs, seqs_ = tee(seqs)
+        # NOTE: fit reads all the seqs first, so a one-shot iterator is held in memory
+        # as a whole by the tee of fan_out; lists and replayable sources are read twice
+        seqs, seqs_ = fan_out(seqs)
         return self.fit(seqs_).transform(seqs, sampling_prob=sampling_prob, n_iter=n_iter)
 
     def transform(self, seqs, sampling_prob=None, n_iter=None):
@@ -1,9 +1,5 @@
 import logging
 
-from sklearn.metrics import silhouette_score
-from sklearn.cluster import MiniBatchKMeans
-from sklearn.cluster import AgglomerativeClustering
-
 logger = logging.getLogger(__name__)
 
 
@@ -18,10 +14,12 @@ class AutoCluster(object):
 
     Parameters
     ----------
-    estimators : list(estimator)
-        List of scikit-learn clustering estimators.
+    estimators : list(estimator), default None
+        List of scikit-learn clustering estimators. When None, Ward, complete
+        and average AgglomerativeClustering and MiniBatchKMeans are used.
 
-    score_func : callable, default silhouette_score
+    score_func : callable, default None
+        When None, silhouette_score is used.
         Function that scores the quality of a cluster label assignment
         given the label assignment and the samples.
 
@@ -40,11 +38,17 @@ class AutoCluster(object):
         The optimal number of clusters according to the score_func.
     """
 
-    def __init__(self, estimators=[AgglomerativeClustering(linkage='ward'),
-                                   AgglomerativeClustering(linkage='complete'),
-                                   AgglomerativeClustering(linkage='average'),
-                                   MiniBatchKMeans()],
-                 score_func=silhouette_score):
+    def __init__(self, estimators=None, score_func=None):
+        from sklearn.metrics import silhouette_score
+        from sklearn.cluster import MiniBatchKMeans
+        from sklearn.cluster import AgglomerativeClustering
+        if estimators is None:
+            estimators = [AgglomerativeClustering(linkage='ward'),
+                          AgglomerativeClustering(linkage='complete'),
+                          AgglomerativeClustering(linkage='average'),
+                          MiniBatchKMeans()]
+        if score_func is None:
+            score_func = silhouette_score
         self.estimators = estimators
         self.score_func = score_func
 
@@ -0,0 +1,114 @@
+"""Thin client of the prediction server (see eden.server).
+
+Only the standard library is imported, so that a client call does not pay
+the start-up cost of the scientific stack.
+"""
+
+import os
+import sys
+import json
+import socket
+import httplib
+import argparse
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+
+class _UnixHTTPConnection(httplib.HTTPConnection):
+
+    def __init__(self, socket_path, timeout=None):
+        httplib.HTTPConnection.__init__(self, 'localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class PredictionClient(object):
+
+    """Client of a prediction server listening on host:port, or on socket_path if given.
+
+    The connection is kept open across requests."""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, timeout=None):
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._connection = None
+
+    def _connect(self):
+        if self.socket_path is not None:
+            return _UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        return httplib.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _request(self, method, path, payload=None):
+        body = None if payload is None else json.dumps(payload)
+        headers = {'Content-Type': 'application/json'}
+        for attempt in range(2):
+            if self._connection is None:
+                self._connection = self._connect()
+            try:
+                self._connection.request(method, path, body, headers)
+                response = self._connection.getresponse()
+                reply = json.loads(response.read())
+                break
+            except (httplib.HTTPException, socket.error):
+                # the server closed the persistent connection: retry once on a new one
+                self.close()
+                if attempt == 1:
+                    raise
+        if response.status != 200:
+            raise Exception('ERROR: %s' % reply.get('error', response.reason))
+        return reply
+
+    def predict(self, instances=None, input_file=None):
+        """Return the reply of the server (a dict with 'margins', 'predictions', 'ids' and
+        'timing') for a list of instances or for the instances in input_file, a path that
+        is read by the server."""
+
+        if input_file is not None:
+            return self._request('POST', '/predict', dict(input_file=os.path.abspath(input_file)))
+        return self._request('POST', '/predict', dict(instances=instances))
+
+    def metrics(self):
+        return self._request('GET', '/metrics')
+
+    def health(self):
+        return self._request('GET', '/health')
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Client of the EDeN prediction server: writes the \
+                                     prediction, margin and id of each instance of the input file.')
+    parser.add_argument("-i", "--input-file",
+                        dest="input_file",
+                        help="Path to file containing input, read by the server.")
+    parser.add_argument("--host", help="Host of the server.", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, help="Port of the server.", default=DEFAULT_PORT)
+    parser.add_argument("--socket",
+                        dest="socket_path",
+                        help="Path to the Unix socket of the server, used instead of host and port.",
+                        default=None)
+    parser.add_argument("--metrics",
+                        help="If set, print the latency metrics of the server.",
+                        action="store_true")
+    args = parser.parse_args(argv)
+
+    client = PredictionClient(host=args.host, port=args.port, socket_path=args.socket_path)
+    if args.input_file is not None:
+        reply = client.predict(input_file=args.input_file)
+        for prediction, margin, graph_info in zip(reply['predictions'], reply['margins'], reply['ids']):
+            sys.stdout.write("%d\t%s\t%s\n" % (prediction, margin, graph_info))
+    if args.metrics:
+        sys.stdout.write(json.dumps(client.metrics(), indent=2, sort_keys=True) + '\n')
+    client.close()
@@ -6,25 +6,18 @@ import numpy as np
 import subprocess
 import shlex
 from eden.util import read
+from eden.util.reader import read_lines, read_records
 from itertools import tee, groupby
 import random
 
 
 def mol_file_to_iterable(filename=None, file_format=None):
     if file_format == 'sdf':
-        with open(filename) as f:
-            s = ''
-            for line in f:
-                if line.strip() != '$$$$':
-                    s = s + line
-                else:
-                    return_value = s + line
-                    s = ''
-                    yield return_value
+        for record in read_records(filename, separator='$$$$'):
+            yield record
     elif file_format == 'smi':
-        with open(filename) as f:
-            for line in f:
-                yield line
+        for line in read_lines(filename):
+            yield line
     else:
         raise Exception('ERROR: unrecognized file format: %s' % file_format)
 
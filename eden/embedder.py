@@ -5,14 +5,7 @@ import random
 from copy import deepcopy
 
 import numpy as np
-from scipy.sparse.linalg import eigs
 import networkx as nx
-from sklearn.preprocessing import scale
-from sklearn.neighbors import NearestNeighbors
-from sklearn.metrics.pairwise import pairwise_kernels
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
-from sknn.mlp import Regressor, Layer
 
 from eden.selector import CompositeSelector
 from eden.selector import AllSelector
@@ -70,6 +63,7 @@ class Projector(object):
                  scaling_factor=0.8,
                  random_state=1,
                  metric='rbf', **kwds):
+        from sklearn.preprocessing import StandardScaler
         self.selector = selector
         self.scale = scale
         self.scaling_factor = scaling_factor
@@ -142,6 +136,7 @@ class Projector(object):
         data_matrix : array, shape = (n_samples, n_features_new)
             Transformed array.
         """
+        from sklearn.metrics.pairwise import pairwise_kernels
         if self.selected_instances is None:
             raise Exception('Error: attempt to use transform on non fit model')
         if self.selected_instances.shape[0] == 0:
@@ -297,6 +292,7 @@ class Embedder2D(object):
             return self._fit_transform(data_matrix, target=target)
 
     def fit_compiled(self, data_matrix_in, target=None):
+        from sknn.mlp import Regressor, Layer
         data_matrix_out = self._fit_transform(data_matrix_in, target=target)
         n_features_in = data_matrix_in.shape[1]
         n_features_out = data_matrix_out.shape[1]
@@ -333,6 +329,7 @@ class Embedder2D(object):
         return self._fit(data_matrix, target=target)._transform(data_matrix)
 
     def _transform(self, data_matrix):
+        from sklearn.decomposition import PCA
         # make a graph with instances as nodes
         graph = self._build_graph(data_matrix)
         # add the distance attribute to edges
@@ -373,6 +370,7 @@ class Embedder2D(object):
         return graph
 
     def _kernel_shift_links(self, data_matrix):
+        from sklearn.metrics.pairwise import pairwise_kernels
         data_size = data_matrix.shape[0]
         kernel_matrix = pairwise_kernels(data_matrix, metric=self.metric, **self.kwds)
         # compute instance density as average pairwise similarity
@@ -401,6 +399,7 @@ class Embedder2D(object):
         return link_ids
 
     def _add_knn_links(self, graph, data_matrix, selected_instances, selected_instances_ids):
+        from sklearn.neighbors import NearestNeighbors
         n_neighbors = min(self.n_nearest_neighbor_links, len(selected_instances))
         nn = NearestNeighbors(n_neighbors=n_neighbors)
         nn.fit(selected_instances)
@@ -422,6 +421,7 @@ class Embedder2D(object):
             raise Exception('Unknown layout type: %s' % self.layout)
 
     def _layout_force(self, graph):
+        from sklearn.preprocessing import scale
         two_dimensional_data_matrix = nx.graphviz_layout(graph,
                                                          prog=self.layout_prog, args=self.layout_prog_args)
         two_dimensional_data_list = [list(two_dimensional_data_matrix[i]) for i in range(len(graph))]
@@ -429,6 +429,8 @@ class Embedder2D(object):
         return embedded_data_matrix
 
     def _layout_laplacian(self, graph):
+        from scipy.sparse.linalg import eigs
+        from sklearn.preprocessing import scale
         nlm = nx.normalized_laplacian_matrix(graph)
         eigvals, eigvects = eigs(nlm, k=self.n_eigenvectors, which='SR')
         eigvals, eigvects = np.real(eigvals), np.real(eigvects)
@@ -585,6 +587,7 @@ class AutoEmbedder(object):
 class LocalEmbeddingEvaluator(object):
 
     def knn_quality_score(self, data_matrix, neighbors_list_highdim, n_neighbors):
+        from sklearn.neighbors import NearestNeighbors
         neigh_low = NearestNeighbors(n_neighbors=n_neighbors)
         neigh_low.fit(data_matrix)
         neighbors_list_lowdim = neigh_low.kneighbors(data_matrix, return_distance=0)
@@ -611,6 +614,7 @@ class LocalEmbeddingEvaluator(object):
         """Find k nearest neighbors in high and low dimensional case and return average
         neighborhood intersection size."""
 
+        from sklearn.neighbors import NearestNeighbors
         neigh_high = NearestNeighbors(n_neighbors=n_neighbors)
         neigh_high.fit(data_matrix_highdim)
         ns_high = neigh_high.kneighbors(data_matrix_highdim, return_distance=0)
@@ -674,6 +678,7 @@ class LocalEmbeddingRefiner(object):
                              n_neighbors=8,
                              emb_quality_th=1,
                              n_iter=20):
+        from sklearn.neighbors import NearestNeighbors
         # extract neighbors list for high dimensional case
         neigh_high = NearestNeighbors(n_neighbors=n_neighbors)
         neigh_high.fit(data_matrix_highdim)
@@ -4,22 +4,10 @@ from collections import defaultdict
 import random
 import logging
 import math
-import pylab as plt
 import numpy as np
 import scipy.sparse as sp
 
 import networkx as nx
-from sklearn import random_projection
-from sklearn.preprocessing import scale
-from sklearn.neighbors import NearestNeighbors
-from sklearn.metrics.pairwise import pairwise_kernels
-from sklearn.metrics import silhouette_score
-from sklearn.metrics import adjusted_rand_score
-from sklearn.cluster import MiniBatchKMeans
-from sklearn.cluster import AgglomerativeClustering
-import pymf
-
-from eden.util.display import plot_embeddings
 
 logger = logging.getLogger(__name__)
 
@@ -76,6 +64,7 @@ class Embedder2DSelector(object):
         return graph
 
     def _update_graph(self, graph, data_matrix, selected_instances, selected_instances_ids):
+        from sklearn.neighbors import NearestNeighbors
         nn = NearestNeighbors(n_neighbors=1)
         nn.fit(selected_instances)
         knns = nn.kneighbors(data_matrix, return_distance=0)
@@ -87,12 +76,14 @@ class Embedder2DSelector(object):
         return graph
 
     def _graph_embedding(self, graph):
+        from sklearn.preprocessing import scale
         two_dimensional_data_matrix = nx.graphviz_layout(graph, prog='sfdp', args='-Goverlap=scale')
         two_dimensional_data_list = [list(two_dimensional_data_matrix[i]) for i in range(len(graph))]
         embedded_data_matrix = scale(np.array(two_dimensional_data_list))
         return embedded_data_matrix
 
     def links(self, data_matrix):
+        from sklearn.metrics.pairwise import pairwise_kernels
         data_size = data_matrix.shape[0]
         kernel_matrix = pairwise_kernels(data_matrix, metric=self.metric, **self.kwds)
         # compute instance density as average pairwise similarity
@@ -128,6 +119,7 @@ def embedding_refinement(data_matrix_highdim,
                          n_neighbors=8,
                          emb_quality_th=1,
                          n_iter=20):
+    from sklearn.neighbors import NearestNeighbors
     # extract neighbors list for high dimensional case
     neigh_high = NearestNeighbors(n_neighbors=n_neighbors)
     neigh_high.fit(data_matrix_highdim)
@@ -182,6 +174,7 @@ def compute_average(ids, data_matrix_lowdim, neighbors_list_highdim):
 
 
 def knn_quality_score(data_matrix, neighbors_list_highdim, n_neighbors):
+    from sklearn.neighbors import NearestNeighbors
     neigh_low = NearestNeighbors(n_neighbors=n_neighbors)
     neigh_low.fit(data_matrix)
     neighbors_list_lowdim = neigh_low.kneighbors(data_matrix, return_distance=0)
@@ -208,6 +201,7 @@ def embedding_quality_score(data_matrix_highdim,
     """Find k nearest neighbors in high and low dimensional case and return average
     neighborhood intersection size."""
 
+    from sklearn.neighbors import NearestNeighbors
     neigh_high = NearestNeighbors(n_neighbors=n_neighbors)
     neigh_high.fit(data_matrix_highdim)
     ns_high = neigh_high.kneighbors(data_matrix_highdim, return_distance=0)
@@ -254,6 +248,7 @@ def averaged_embedding_quality_score(data_matrix_highdim,
 
 
 def plot(data_matrix, y=None, alpha=None, links=None, size=10, reliability=True):
+    import pylab as plt
     cmap = 'rainbow'
     if alpha is None:
         plt.figure(figsize=(size, size))
@@ -305,6 +300,7 @@ def plot(data_matrix, y=None, alpha=None, links=None, size=10, reliability=True)
 
 
 def optimal_n_clusters(data_matrix, n_clusters_upper_bound=20, clustering_algo=None, algorithm_name=None):
+    from sklearn.metrics import silhouette_score
     logger.debug('\t algorithm: %s \t max num clusters: %d' % (algorithm_name, n_clusters_upper_bound))
     max_score = 0
     for n_clusters in range(2, n_clusters_upper_bound):
@@ -320,6 +316,8 @@ def optimal_n_clusters(data_matrix, n_clusters_upper_bound=20, clustering_algo=N
 
 
 def recluster(data_matrix, max_n_clusters=20):
+    from sklearn.cluster import AgglomerativeClustering
+    from sklearn.cluster import MiniBatchKMeans
     logger.debug('ss=silhouette score')
     clustering_algos = []
     clustering_algos.append(('agglomerative (Ward)', AgglomerativeClustering(linkage='ward')))
@@ -344,6 +342,7 @@ def recluster(data_matrix, max_n_clusters=20):
 
 
 def plot_reclustering(data_matrix, y=None, preds=None, size=10):
+    import pylab as plt
     cmap = 'rainbow'
     plt.figure(figsize=(2 * size, size))
     plt.subplot(121)
@@ -552,6 +551,7 @@ def optimize_embedding(data_matrix, known_targets=None,
 def embed(data_matrix, true_targets=None, known_targets=None,
           max_n_clusters=8, score_threshold=0.8, max_iter=4,
           min_feature_ratio=.25, n_iter=30, n_repetitions=1):
+    from sklearn.metrics import adjusted_rand_score
     dataset_size = data_matrix.shape[0]
     if known_targets is not None:
         assert(dataset_size == len(known_targets))
@@ -703,6 +703,9 @@ class Embedder(object):
         self.random_state = random_state
 
     def fit(self, data_matrix):
+        from sklearn import random_projection
+        from sklearn.cluster import MiniBatchKMeans
+        import pymf
         n_rows, n_cols = data_matrix.shape
         if n_rows <= n_cols:
             n_components = n_rows
@@ -728,6 +731,7 @@ class Embedder(object):
             return self.matrix_factorizer.H.T
 
     def transform(self, data_matrix):
+        import pymf
         basis_data_matrix = self.matrix_factorizer.W
         data_matrix_new = self.transformer.transform(data_matrix)
         self.matrix_factorizer = pymf.SIVM(data_matrix_new.T, num_bases=self.complexity)
@@ -842,6 +846,7 @@ class Embedder2D(object):
 
 
 def matrix_factorization(data_matrix, n=10):
+    import pymf
     mf = pymf.SIVM(data_matrix.T, num_bases=n)
     mf.factorize()
     return mf.W.T, mf.H.T
@@ -853,6 +858,7 @@ def reduce_dimensionality(data_matrix, n=10):
 
 
 def low_dimensional_embedding(data_matrix, low_dim=None):
+    from sklearn import random_projection
     n_rows, n_cols = data_matrix.shape
     # perform data dimension reduction only if #features > #data points
     if n_cols <= n_rows:
@@ -884,10 +890,12 @@ def embedding_quality(data_matrix, y, opts, low_dim=None):
 
 
 def display_embedding(data_matrix, y, opts):
+    from eden.util.display import plot_embeddings
     plot_embeddings(data_matrix, y, **opts)
 
 
 def embed_two_dimensions(data, vectorizer, size=10, n_components=5, colormap='YlOrRd'):
+    import pylab as plt
     if hasattr(data, '__iter__'):
         iterable = data
     else:
@@ -925,6 +933,7 @@ def embed_dat_matrix_two_dimensions(low_dimension_data_matrix,
                                     labels=None,
                                     density_colormap='Blues',
                                     instance_colormap='YlOrRd'):
+    import pylab as plt
     from sklearn.preprocessing import scale
     low_dimension_data_matrix = scale(low_dimension_data_matrix)
     # make mesh
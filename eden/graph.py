@@ -2,17 +2,17 @@
 
 import math
 import numpy as np
-from scipy import stats
 from scipy.sparse import csr_matrix
 from numpy.linalg import norm
-from sklearn.cluster import MiniBatchKMeans
 from collections import defaultdict, deque
-import itertools
 import joblib
 import networkx as nx
 from eden import fast_hash, fast_hash_vec, fast_hash_2, fast_hash_3, fast_hash_4
 from eden import AbstractVectorizer
 from eden.util import serialize_dict
+from eden.util.source import fan_out
+from eden.util.graph_codec import GraphView
+from eden.util import instrumentation
 
 import logging
 logger = logging.getLogger(__name__)
@@ -140,6 +140,30 @@ class Vectorizer(AbstractVectorizer):
         self.key_original_label = key_original_label
         self.key_entity = key_entity
 
+    def get_params(self):
+        """Return the constructor parameters that produce the same feature vectors.
+
+        The fitted discretization models are not included."""
+
+        return dict(complexity=self.complexity,
+                    r=self.r // 2,
+                    d=self.d // 2,
+                    n=self.n,
+                    min_r=self.min_r // 2,
+                    min_d=self.min_d // 2,
+                    min_n=self.min_n,
+                    label_size=self.label_size,
+                    nbits=self.nbits,
+                    normalization=self.normalization,
+                    inner_normalization=self.inner_normalization,
+                    triangular_decomposition=self.triangular_decomposition,
+                    key_label=self.key_label,
+                    key_weight=self.key_weight,
+                    key_nesting=self.key_nesting,
+                    key_importance=self.key_importance,
+                    key_original_label=self.key_original_label,
+                    key_entity=self.key_entity)
+
     def set_params(self, **args):
         """Set the parameters of the vectorizer."""
 
@@ -196,7 +220,9 @@ class Vectorizer(AbstractVectorizer):
         Parameters
         ----------
         graphs : list[graphs]
-            The input list of networkx graphs.
+            The input list of networkx graphs. The graphs are read twice: a one-shot
+            iterator is duplicated with itertools.tee and is held in memory as a whole;
+            pass a list, a GraphStore or a ReplayableSource to avoid it.
 
         Returns
         -------
@@ -207,9 +233,10 @@ class Vectorizer(AbstractVectorizer):
             # fit is meaningful only when n>1
             logger.debug('Warning: fit was asked with n=1')
         else:
+            from sklearn.cluster import MiniBatchKMeans
             n_clusters_list = self._compute_n_clusters_list()
             label_data_matrixs = dict()
-            graphs, graphs_ = itertools.tee(graphs)
+            graphs, graphs_ = fan_out(graphs)
             label_data_matrixs = self._assemble_dense_data_matrices(graphs_)
             label_data_matrixs.update(self._assemble_sparse_data_matrices(graphs))
             for node_entity in label_data_matrixs:
@@ -271,14 +298,16 @@ class Vectorizer(AbstractVectorizer):
         Parameters
         ----------
         graphs : list[graphs]
-            The input list of networkx graphs.
+            The input list of networkx graphs. The graphs are read twice, first all of
+            them by fit: a one-shot iterator is duplicated with itertools.tee and is held
+            in memory as a whole; pass a list, a GraphStore or a ReplayableSource to avoid it.
 
         Returns
         -------
         data_matrix : array-like, shape = [n_samples, n_features]
             Vector representation of input graphs.
         """
-        graphs, graphs_ = itertools.tee(graphs)
+        graphs, graphs_ = fan_out(graphs)
         self.fit(graphs_)
         return self.transform(graphs)
 
@@ -288,7 +317,7 @@ class Vectorizer(AbstractVectorizer):
         Parameters
         ----------
         graphs : list[graphs]
-            The input list of networkx graphs.
+            The input list of networkx graphs (or GraphView objects over encoded graphs).
 
         Returns
         -------
@@ -303,7 +332,10 @@ class Vectorizer(AbstractVectorizer):
             feature_dict.update(self._transform(instance_id, G))
         if instance_id is None:
             raise Exception('ERROR: something went wrong, no graphs are present in current iterator.')
-        return self._convert_dict_to_sparse_matrix(feature_dict)
+        matrix_laps = instrumentation.laps()
+        data_matrix = self._convert_dict_to_sparse_matrix(feature_dict)
+        matrix_laps.lap('vectorize.sparse_matrix', instances=data_matrix.shape[0], nnz=data_matrix.nnz)
+        return data_matrix
 
     def transform_single(self, graph):
         """Transform a single networkx graph into one sparse row in Compressed Sparse Row matrix format."""
@@ -541,6 +573,8 @@ class Vectorizer(AbstractVectorizer):
         # edge_to_vertex transformation, then do not repeat the transformation but
         # simply return the graph
         if 'expanded' in original_graph.graph:
+            if isinstance(original_graph, GraphView):
+                return original_graph.to_networkx()
             return original_graph
         else:
             graph = nx.Graph()
@@ -606,21 +640,28 @@ class Vectorizer(AbstractVectorizer):
         return out_graph
 
     def _graph_preprocessing(self, original_graph):
+        graph_laps = instrumentation.laps()
         if self.triangular_decomposition:
+            if isinstance(original_graph, GraphView):
+                original_graph = original_graph.to_networkx()
             graph = self._extract_and_add_triangles(original_graph)
         else:
             graph = original_graph
         graph = self._edge_to_vertex_transform(graph)
         self._weight_preprocessing(graph)
         self._label_preprocessing(graph)
+        graph_laps.lap('vectorize.graph_preprocessing')
         self._compute_distant_neighbours(graph, max(self.r, self.d))
+        graph_laps.lap('vectorize.bfs')
         self._compute_neighborhood_graph_hash_cache(graph)
         if graph.graph.get('weighted', False):
             self._compute_neighborhood_graph_weight_cache(graph)
+        graph_laps.lap('vectorize.neighborhood_hash')
         return graph
 
     def _transform(self, instance_id, original_graph):
         graph = self._graph_preprocessing(original_graph)
+        graph_laps = instrumentation.laps()
         # collect all features for all vertices for each label_index
         feature_list = defaultdict(lambda: defaultdict(float))
         for v, d in graph.nodes_iter(data=True):
@@ -629,7 +670,10 @@ class Vectorizer(AbstractVectorizer):
                 self._transform_vertex(graph, v, feature_list)
             if d.get(self.key_nesting, False):  # only for vertices of type self.key_nesting
                 self._transform_nesting_vertex(graph, v, feature_list)
-        return self._normalization(feature_list, instance_id)
+        graph_laps.lap('vectorize.feature_hash')
+        feature_vector = self._normalization(feature_list, instance_id)
+        graph_laps.lap('vectorize.normalization', instances=1)
+        return feature_vector
 
     def _transform_nesting_vertex(self, graph, nesting_vertex, feature_list):
         # extract endpoints
@@ -765,6 +809,7 @@ class Vectorizer(AbstractVectorizer):
         # compute the geometric mean weight on edges
         # compute the pruduct of the two
         # make a list of the neighborhood_graph_weight at every distance
+        from scipy.stats import gmean
         neighborhood_graph_weight_list = []
         w = graph.node[root][self.key_weight]
         node_weight_list = np.array([w], dtype=np.float64)
@@ -781,7 +826,7 @@ class Vectorizer(AbstractVectorizer):
                 node_average = np.mean(node_weight_list)
             else:  # edges
                 edge_weight_list = np.concatenate((edge_weight_list, weight_array_at_d))
-                edge_average = stats.gmean(edge_weight_list)
+                edge_average = gmean(edge_weight_list)
             weight = node_average * edge_average
             neighborhood_graph_weight_list.append(weight)
         graph.node[root]['neighborhood_graph_weight'] = neighborhood_graph_weight_list
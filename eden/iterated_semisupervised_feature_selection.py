@@ -2,11 +2,6 @@ import random
 import logging
 import numpy as np
 
-from sklearn.semi_supervised import LabelSpreading
-from sklearn.feature_selection import RFECV
-from sklearn.linear_model import SGDClassifier
-from sklearn.preprocessing import LabelEncoder
-
 logger = logging.getLogger(__name__)
 
 
@@ -36,6 +31,7 @@ def semisupervised_target(target=None,
     target : array-like, shape = (n_samples)
         Class labels using -1 for the unknown class.
     """
+    from sklearn.preprocessing import LabelEncoder
     if unknown_fraction is not None and known_fraction is not None:
         if unknown_fraction != 1 - known_fraction:
             raise Exception('unknown_fraction and known_fraction are inconsistent. bailing out')
@@ -85,12 +81,15 @@ class IteratedSemiSupervisedFeatureSelection(object):
     """
 
     def __init__(self,
-                 estimator=SGDClassifier(average=True, shuffle=True, penalty='elasticnet'),
+                 estimator=None,
                  n_iter=30,
                  step=0.1,
                  cv=5,
                  min_feature_ratio=0.1,
                  n_neighbors=5):
+        from sklearn.linear_model import SGDClassifier
+        if estimator is None:
+            estimator = SGDClassifier(average=True, shuffle=True, penalty='elasticnet')
         self.estimator = estimator
         self.n_iter = n_iter
         self.step = step
@@ -184,6 +183,7 @@ class IteratedSemiSupervisedFeatureSelection(object):
         return self.transform(data_matrix_copy)
 
     def _semi_supervised_learning(self, data_matrix, target):
+        from sklearn.semi_supervised import LabelSpreading
         n_classes = len(set(target))
         # if there are too few classes (e.g. less than -1 and at least 2 other classes)
         # then just bail out and return the original target
@@ -207,6 +207,7 @@ class IteratedSemiSupervisedFeatureSelection(object):
         return np.array(extended_target).reshape(-1, 1)
 
     def _feature_selection(self, data_matrix, target):
+        from sklearn.feature_selection import RFECV
         try:
             # perform recursive feature elimination
             feature_selector = RFECV(self.estimator, step=self.step, cv=self.cv)
@@ -2,30 +2,43 @@
 
 import numpy as np
 from scipy.sparse import vstack
-from sklearn import cross_validation
 import random
 import time
 import datetime
 import joblib
 import copy
+import os
+import multiprocessing
 from collections import defaultdict
-from sklearn.linear_model import SGDClassifier
-from itertools import tee, izip
-from sklearn.metrics import classification_report, roc_auc_score, average_precision_score
-from eden.util import selection_iterator, is_iterable, report_base_statistics
-from eden.util import vectorize, mp_pre_process
-from eden.util import serialize_dict
+from sklearn.base import clone
+from itertools import izip
+from eden.util import is_iterable, report_base_statistics
+from eden.util import vectorize, mp_pre_process, pre_process_vectorize
+from eden.util import multi_metric_cross_val_scores, report_scores
+from eden.util import WarmStartCV, supports_warm_start
+from eden.util.pool import max_n_jobs, BackgroundTask
+from eden.util.checkpoint import SnapshotTracker, AsyncCheckpointer, MIN_INTERVAL
+from eden.util.feature_store import FeatureStore
+from eden.util.source import replayable
+from eden.util.matrix_cache import DataMatrixCache, MEMORY_BUDGET
+from eden.util.trial_log import TrialLog, trial_key
+from eden.scorer import compile_linear_model
+from eden.util import serialize_dict, chunk_iterator
+from eden.util import instrumentation
 from eden.graph import Vectorizer
 
 import logging
 logger = logging.getLogger(__name__)
 
+# default number of instances processed at a time by the chunked predictions
+CHUNK_SIZE = 10000
+
 
 class ActiveLearningBinaryClassificationModel(object):
 
     def __init__(self, pre_processor=None,
                  vectorizer=Vectorizer(complexity=1),
-                 estimator=SGDClassifier(class_weight='auto', shuffle=True),
+                 estimator=None,
                  fit_vectorizer=False,
                  n_jobs=4,
                  n_blocks=8,
@@ -34,7 +47,11 @@ class ActiveLearningBinaryClassificationModel(object):
                  pre_processor_n_blocks=8,
                  pre_processor_block_size=None,
                  description=None,
-                 random_state=1):
+                 random_state=1,
+                 pool=None):
+        if estimator is None:
+            from sklearn.linear_model import SGDClassifier
+            estimator = SGDClassifier(class_weight='auto', shuffle=True)
         self.pre_processor = copy.deepcopy(pre_processor)
         self.vectorizer = copy.deepcopy(vectorizer)
         self.estimator = copy.deepcopy(estimator)
@@ -49,13 +66,44 @@ class ActiveLearningBinaryClassificationModel(object):
         self.pre_processor_n_jobs = pre_processor_n_jobs
         self.pre_processor_n_blocks = pre_processor_n_blocks
         self.pre_processor_block_size = pre_processor_block_size
+        self.pool = pool
         random.seed(random_state)
 
+    def __getstate__(self):
+        # NOTE: worker processes are not part of the model
+        state = self.__dict__.copy()
+        state.pop('pool', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.pool = None
+
+    def set_pool(self, pool):
+        """Set the WorkerPool used for the parallel pre-processing and vectorization."""
+        self.pool = pool
+
     def save(self, model_name):
+        stage_laps = instrumentation.laps()
         joblib.dump(self, model_name, compress=1)
+        stage_laps.lap('save', bytes=os.path.getsize(model_name))
 
     def load(self, obj):
+        pool = getattr(self, 'pool', None)
         self.__dict__.update(joblib.load(obj).__dict__)
+        self.pool = pool
+
+    def compile(self, path):
+        """Write in the directory path the compact scoring artifact of the fit model: the
+        nonzero coefficients, the intercept and the vectorizer parameters.
+
+        The artifact is read by eden.scorer.CompiledScorer; the pre_processor is not included."""
+
+        info = dict(pre_processor_args=self.pre_processor_args,
+                    vectorizer_args=self.vectorizer_args,
+                    estimator_args=self.estimator_args,
+                    description=self.description)
+        compile_linear_model(path, self.estimator, self.vectorizer, info=info)
 
     def get_pre_processor(self):
         return self.pre_processor
@@ -84,27 +132,54 @@ class ActiveLearningBinaryClassificationModel(object):
         data_matrix, y = self._data_matrices(iterable_pos, iterable_neg, fit_vectorizer=self.fit_vectorizer)
         self.estimator.fit(data_matrix, y)
 
-    def predict(self, iterable):
-        data_matrix = self._data_matrix(iterable)
-        return self.estimator.predict(data_matrix)
-
-    def decision_function(self, iterable):
-        data_matrix = self._data_matrix(iterable)
-        return self.estimator.decision_function(data_matrix)
+    def predict(self, iterable, chunk_size=None):
+        """Return the predicted classes; if chunk_size is not None the instances are
+        pre-processed, vectorized and predicted chunk_size at a time."""
+
+        if chunk_size is None:
+            data_matrix = self._data_matrix(iterable)
+            return self.estimator.predict(data_matrix)
+        predictions = [self.estimator.predict(chunk) for chunk in self._chunked_data_matrix(iterable, chunk_size)]
+        if len(predictions) == 0:
+            # no instances
+            return np.array([], dtype=np.asarray(self.estimator.classes_).dtype)
+        return np.concatenate(predictions)
+
+    def decision_function(self, iterable, chunk_size=None):
+        """Return the margins; if chunk_size is not None the instances are pre-processed,
+        vectorized and scored chunk_size at a time."""
+
+        if chunk_size is None:
+            data_matrix = self._data_matrix(iterable)
+            return self.estimator.decision_function(data_matrix)
+        margins = [self.estimator.decision_function(chunk) for chunk in self._chunked_data_matrix(iterable, chunk_size)]
+        if len(margins) == 0:
+            # no instances
+            return np.array([], dtype=np.float64)
+        return np.concatenate(margins)
 
     def get_info(self, iterable, key='id'):
         iterable_graph = self.pre_processor(iterable, **self.pre_processor_args)
         for graph in iterable_graph:
             yield graph.graph.get(key, 'N/A')
 
-    def decision_function_info(self, iterable, key='id'):
-        iterable, iterable_ = tee(iterable)
-        data_matrix = self._data_matrix(iterable)
-        info_iterable = self.get_info(iterable_, key=key)
-        for margin, graph_info in izip(self.estimator.decision_function(data_matrix), info_iterable):
-            yield margin, graph_info
+    def decision_function_info(self, iterable, key='id', chunk_size=None):
+        """Yield the pairs (margin, value of the graph attribute key).
+
+        If chunk_size is not None the instances are pre-processed, vectorized and scored
+        chunk_size at a time, so that the memory used does not grow with the input."""
+
+        # the graph info is collected while the data matrix is built, in a single pass
+        if chunk_size is None:
+            chunks = [self._data_matrix(iterable, key=key)]
+        else:
+            chunks = self._chunked_data_matrix(iterable, chunk_size, key=key)
+        for data_matrix, info_list in chunks:
+            for margin, graph_info in izip(self.estimator.decision_function(data_matrix), info_list):
+                yield margin, graph_info
 
     def estimate(self, iterable_pos, iterable_neg, report_cross_validation=False):
+        from sklearn.metrics import classification_report, roc_auc_score, average_precision_score
         data_matrix, y = self._data_matrices(iterable_pos, iterable_neg, fit_vectorizer=False)
         margins = self.estimator.decision_function(data_matrix)
         predictions = self.estimator.predict(data_matrix)
@@ -127,10 +202,9 @@ class ActiveLearningBinaryClassificationModel(object):
 
         if report_cross_validation:
             text.append('\nCross-validated estimate:')
-            for scoring in ['accuracy', 'precision', 'recall', 'f1', 'average_precision', 'roc_auc']:
-                scores = cross_validation.cross_val_score(self.estimator, data_matrix, y, cv=10,
-                                                          scoring=scoring, n_jobs=self.n_jobs)
-                text.append('%20s: %.3f +- %.3f' % (scoring, np.mean(scores), np.std(scores)))
+            # a single cross validation pass provides all the scores
+            report_scores(multi_metric_cross_val_scores(self.estimator, data_matrix, y, cv=10, n_jobs=self.n_jobs),
+                          log=text.append)
 
         logger.info('\n'.join(text))
         return apr, roc
@@ -164,7 +238,15 @@ class ActiveLearningBinaryClassificationModel(object):
                  cv=10,
                  scoring='roc_auc',
                  score_func=lambda u, s: u - s,
-                 two_steps_optimization=True):
+                 two_steps_optimization=True,
+                 feature_store_path=None,
+                 cache=False,
+                 matrix_cache_budget=MEMORY_BUDGET,
+                 matrix_cache_dir=None,
+                 checkpoint_interval=MIN_INTERVAL,
+                 warm_start=False,
+                 trial_log_path=None,
+                 resume=False):
 
         def _get_parameters_range():
             text = []
@@ -180,12 +262,10 @@ class ActiveLearningBinaryClassificationModel(object):
         logger.debug(_get_parameters_range())
         # init
         n_failures = 0
-        best_pre_processor_ = None
-        best_vectorizer_ = None
-        best_estimator_ = None
-        best_pre_processor_args_ = dict()
-        best_vectorizer_args_ = dict()
-        best_estimator_args_ = dict()
+        # copies of the best machines and parameters, taken only when they change
+        best_ = SnapshotTracker()
+        # the vectorizer changes only when a new data matrix is built
+        data_matrix_version = 0
         best_pre_processor_parameters_ = defaultdict(list)
         best_vectorizer_parameters_ = defaultdict(list)
         best_estimator_parameters_ = defaultdict(list)
@@ -214,17 +294,69 @@ class ActiveLearningBinaryClassificationModel(object):
                 data_matrix_is_stable = True
             else:
                 data_matrix_is_stable = False
+            # the instances are read again at each iteration: pass lists or replayable
+            # sources (e.g. ReplayableSource re-reading a file); one-shot iterators are
+            # refused, unless the caller opts in with cache=True to keep them in memory
+            iterable_pos = replayable(iterable_pos, cache=cache)
+            iterable_neg = replayable(iterable_neg, cache=cache)
+            # data matrices of the pre_processor and vectorizer settings seen so far
+            data_matrix_cache = DataMatrixCache(memory_budget=matrix_cache_budget, spill_dir=matrix_cache_dir)
+            # the data matrix of the next setting can be built while the current one is evaluated
+            prefetch_data_matrix = data_matrix_is_stable is False and n_active_learning_iterations == 0 and \
+                self.fit_vectorizer is False
+            prefetch = prefetch_args = None
+            # the best model is saved in the background, at most once every checkpoint_interval seconds
+            checkpointer = AsyncCheckpointer(lambda model: model.save(model_name), min_interval=checkpoint_interval)
+            # estimators that accept initial coefficients can be fit starting from similar settings
+            warm_start = warm_start and supports_warm_start(self.estimator)
+            warm_start_cv = None
+            # every evaluated setting is appended to the trial log; when resuming, the search
+            # continues after the last logged iteration and logged settings are not evaluated again
+            trial_log = None
+            start_iteration = 0
+            if trial_log_path is not None:
+                trial_log = TrialLog(trial_log_path, resume=resume)
+                for record in trial_log.records:
+                    if record.get('improved'):
+                        for key, value in record['pre_processor_args'].items():
+                            best_pre_processor_parameters_[key].append(value)
+                        for key, value in record['vectorizer_args'].items():
+                            best_vectorizer_parameters_[key].append(value)
+                        for key, value in record['estimator_args'].items():
+                            best_estimator_parameters_[key].append(value)
+                if len(trial_log) > 0 and os.path.exists(model_name):
+                    # the best model of the interrupted search was checkpointed in model_name
+                    # together with its scores: the log can be ahead of the last checkpoint
+                    best_scores = self._resume_best(model_name, best_, trial_log)
+                    if best_scores is not None:
+                        best_score_, best_score_mean_, best_score_std_ = best_scores
+                start_iteration = trial_log.last_iteration() + 1
+                if start_iteration > 0:
+                    logger.info('Resuming the search at iteration %d/%d with best score %.3f' %
+                                (start_iteration + 1, n_iter, best_score_))
+            # with a time budget, settings are evaluated in batches of one setting per worker,
+            # so that the budget is checked between inner iterations while all the
+            # (setting, fold) pairs of a batch are still evaluated in parallel
+            n_workers = multiprocessing.cpu_count() if self.n_jobs == -1 else self.n_jobs
+            batch_size = n_inner_iter_estimator
+            if max_total_time != -1:
+                batch_size = max(1, n_workers)
+            # iteration at which the parameter lists are narrowed
+            narrow_iteration = max(int(n_iter / 2), start_iteration)
+            out_of_time = False
             # main iteration
-            for i in range(n_iter):
+            for i in range(start_iteration, n_iter):
                 if max_total_time != -1:
                     if time.time() - start > max_total_time:
-                        delta_time = datetime.timedelta(seconds=(time.time() - start))
-                        logger.warning('Reached max time: %s' % (str(delta_time)))
-                        break
+                        out_of_time = True
+                if out_of_time:
+                    delta_time = datetime.timedelta(seconds=(time.time() - start))
+                    logger.warning('Reached max time: %s' % (str(delta_time)))
+                    break
 
                 # after n_iter/2 iterations, replace the parameter lists with only those values that
                 # have been found to increase the performance
-                if i == int(n_iter / 2) and two_steps_optimization is True:
+                if i == narrow_iteration and two_steps_optimization is True:
                     if len(best_pre_processor_parameters_) > 0:
                         pre_processor_parameters = dict(best_pre_processor_parameters_)
                     if len(best_vectorizer_parameters_) > 0:
@@ -240,8 +372,12 @@ class ActiveLearningBinaryClassificationModel(object):
                 # build data matrix only the first time or if needed e.g. because
                 # there are more choices in the paramter settings for the
                 # pre_processor or the vectorizer
-                if i == 0 or data_matrix_is_stable is False:
-                    if i == 0:
+                if i == start_iteration or data_matrix_is_stable is False:
+                    data_matrix_laps = instrumentation.laps()
+                    if prefetch is not None:
+                        # the parameters were sampled when the background task was started
+                        self.pre_processor_args, self.vectorizer_args = prefetch_args
+                    elif i == 0:
                         # select default paramters
                         self.pre_processor_args = self._default(pre_processor_parameters)
                         self.vectorizer_args = self._default(vectorizer_parameters)
@@ -249,12 +385,23 @@ class ActiveLearningBinaryClassificationModel(object):
                         # sample paramters randomly
                         self.pre_processor_args = self._sample(pre_processor_parameters)
                         self.vectorizer_args = self._sample(vectorizer_parameters)
-                    # copy the iterators for later re-use
-                    iterable_pos, iterable_pos_ = tee(iterable_pos)
-                    iterable_neg, iterable_neg_ = tee(iterable_neg)
+                    iterable_pos_, iterable_neg_ = iter(iterable_pos), iter(iterable_neg)
                     try:
+                        if prefetch is not None:
+                            X, y = prefetch.result()
+                            self.vectorizer.set_params(**self.vectorizer_args)
                         # if no active learning mode, just produce data matrix
-                        if n_active_learning_iterations == 0:
+                        elif n_active_learning_iterations == 0 and feature_store_path is not None and \
+                                data_matrix_is_stable and self.fit_vectorizer is False:
+                            # re-use the data matrix stored by a previous run with the same parameters
+                            X, y = self._stored_data_matrices(iterable_pos_,
+                                                              iterable_neg_,
+                                                              feature_store_path=feature_store_path)
+                        elif n_active_learning_iterations == 0 and self.fit_vectorizer is False:
+                            X, y = self._cached_data_matrices(iterable_pos_,
+                                                              iterable_neg_,
+                                                              data_matrix_cache=data_matrix_cache)
+                        elif n_active_learning_iterations == 0:
                             X, y = self._data_matrices(iterable_pos_,
                                                        iterable_neg_,
                                                        fit_vectorizer=self.fit_vectorizer)
@@ -267,7 +414,8 @@ class ActiveLearningBinaryClassificationModel(object):
                                 lower_bound_threshold_positive=lower_bound_threshold_positive,
                                 upper_bound_threshold_positive=upper_bound_threshold_positive,
                                 lower_bound_threshold_negative=lower_bound_threshold_negative,
-                                upper_bound_threshold_negative=upper_bound_threshold_negative)
+                                upper_bound_threshold_negative=upper_bound_threshold_negative,
+                                data_matrix_cache=data_matrix_cache)
                     except Exception as e:
                         delta_time = datetime.timedelta(seconds=(time.time() - start))
                         text = []
@@ -279,14 +427,57 @@ class ActiveLearningBinaryClassificationModel(object):
                         text.append(self.get_parameters())
                         text.append('...continuing')
                         logger.debug('\n'.join(text))
-
-                # iterate more frequently across the estimator parameters
-                for inner_i in range(n_inner_iter_estimator):
+                    prefetch = None
+                    data_matrix_version += 1
+                    data_matrix_laps.lap('optimize.data_matrix')
+
+                # start building the data matrix of the next iteration in the background, unless
+                # the parameter lists can still change after this iteration
+                if prefetch_data_matrix and i + 1 < n_iter and \
+                        not (i + 1 == narrow_iteration and two_steps_optimization is True):
+                    prefetch_args = (self._sample(pre_processor_parameters), self._sample(vectorizer_parameters))
+                    prefetch = BackgroundTask(self._prefetched_data_matrices, iterable_pos, iterable_neg,
+                                              prefetch_args, data_matrix_cache)
+
+                # iterate more frequently across the estimator parameters: all the settings are
+                # cross validated at once, fitting the (setting, fold) pairs in parallel on the same X, y
+                estimator_args_list = [self._sample(estimator_parameters) for inner_i in range(n_inner_iter_estimator)]
+                if trial_log is not None:
+                    estimator_args_list = [args for args in estimator_args_list
+                                           if trial_key(self.pre_processor_args, self.vectorizer_args,
+                                                        args) not in trial_log]
+                results = []
+                cv_times = []
+                for batch_start in range(0, len(estimator_args_list), batch_size):
+                    if max_total_time != -1 and time.time() - start > max_total_time:
+                        out_of_time = True
+                        break
+                    batch = estimator_args_list[batch_start:batch_start + batch_size]
+                    batch_start_time = time.time()
+                    try:
+                        if warm_start:
+                            # the per fold coefficients are kept as long as the data matrix does not change
+                            if warm_start_cv is None or warm_start_cv.X is not X:
+                                warm_start_cv = WarmStartCV(X, y, cv=cv, n_jobs=self.n_jobs)
+                            results += warm_start_cv.cross_val_scores(self.estimator, batch, scorings=[scoring])
+                        else:
+                            results += multi_metric_cross_val_scores(self.estimator, X, y, cv=cv,
+                                                                     scorings=[scoring],
+                                                                     n_jobs=self.n_jobs, params_list=batch,
+                                                                     catch_errors=True)
+                    except Exception as e:
+                        results += [e] * len(batch)
+                    cv_times += [(time.time() - batch_start_time) / len(batch)] * len(batch)
+                    instrumentation.add('optimize.cross_validation', time.time() - batch_start_time,
+                                        settings=len(batch))
+                for inner_i in range(len(results)):
+                    improved = False
                     try:
-                        self.estimator_args = self._sample(estimator_parameters)
+                        self.estimator_args = estimator_args_list[inner_i]
                         self.estimator.set_params(**self.estimator_args)
-                        scores = cross_validation.cross_val_score(self.estimator, X, y, cv=cv,
-                                                                  scoring=scoring, n_jobs=self.n_jobs)
+                        if isinstance(results[inner_i], Exception):
+                            raise results[inner_i]
+                        scores = results[inner_i][scoring]
                     except Exception as e:
                         delta_time = datetime.timedelta(seconds=(time.time() - start))
                         text = []
@@ -300,6 +491,9 @@ class ActiveLearningBinaryClassificationModel(object):
                         text.append('...continuing')
                         logger.debug('\n'.join(text))
                         n_failures += 1
+                        if trial_log is not None:
+                            self._log_trial(trial_log, i, inner_i, cv_times[inner_i], time.time() - start,
+                                            error=e)
                     else:
                         # consider as score the mean-std for a robust estimate of predictive performance
                         score_mean = np.mean(scores)
@@ -309,20 +503,28 @@ class ActiveLearningBinaryClassificationModel(object):
                                      (inner_i + 1, n_inner_iter_estimator, i + 1, n_iter,
                                       scoring, score, score_mean, score_std))
                         # update the best confirguration
-                        if best_score_ < score:
+                        improved = bool(best_score_ < score)
+                        if improved:
                             # fit the estimator since the cross_validation estimate does not
-                            # set the estimator parametrs
-                            self.estimator.fit(X, y)
-                            self.save(model_name)
+                            # set the estimator parametrs; a new estimator is fit so that
+                            # it does not need to be copied
+                            best_estimator = clone(self.estimator)
+                            with instrumentation.timer('optimize.fit'):
+                                if warm_start:
+                                    warm_start_cv.fit(best_estimator, self.estimator_args)
+                                else:
+                                    best_estimator.fit(X, y)
                             best_score_ = score
                             best_score_mean_ = score_mean
                             best_score_std_ = score_std
-                            best_pre_processor_ = copy.deepcopy(self.pre_processor)
-                            best_vectorizer_ = copy.deepcopy(self.vectorizer)
-                            best_estimator_ = copy.deepcopy(self.estimator)
-                            best_pre_processor_args_ = copy.deepcopy(self.pre_processor_args)
-                            best_vectorizer_args_ = copy.deepcopy(self.vectorizer_args)
-                            best_estimator_args_ = copy.deepcopy(self.estimator_args)
+                            best_.snapshot('pre_processor', self.pre_processor, version=0)
+                            best_.snapshot('vectorizer', self.vectorizer, version=data_matrix_version)
+                            best_.snapshot('estimator', best_estimator, copy_value=False)
+                            best_.snapshot('pre_processor_args', self.pre_processor_args)
+                            best_.snapshot('vectorizer_args', self.vectorizer_args)
+                            best_.snapshot('estimator_args', self.estimator_args)
+                            best_.snapshot('best_scores', (best_score_, best_score_mean_, best_score_std_))
+                            checkpointer.submit(self._snapshot_model(best_))
                             # add parameter to list of best parameters
                             for key in self.pre_processor_args:
                                 best_pre_processor_parameters_[key].append(self.pre_processor_args[key])
@@ -343,37 +545,185 @@ class ActiveLearningBinaryClassificationModel(object):
                             text.append(report_base_statistics(y))
                             text.append(self.get_parameters())
                             logger.info('\n'.join(text))
+                        if trial_log is not None:
+                            self._log_trial(trial_log, i, inner_i, cv_times[inner_i], time.time() - start,
+                                            scores=scores, score=score, improved=improved)
+            if prefetch is not None:
+                # wait for the background task before removing the cache it writes to
+                try:
+                    prefetch.result()
+                except Exception:
+                    pass
+            logger.debug('Data matrix cache: %d hits, %d misses' %
+                         (data_matrix_cache.n_hits, data_matrix_cache.n_misses))
+            data_matrix_cache.clear()
             # store the best hyperparamter configuration
-            self.pre_processor_args = copy.deepcopy(best_pre_processor_args_)
-            self.vectorizer_args = copy.deepcopy(best_vectorizer_args_)
-            self.estimator_args = copy.deepcopy(best_estimator_args_)
+            self.pre_processor_args = best_.get('pre_processor_args', dict())
+            self.vectorizer_args = best_.get('vectorizer_args', dict())
+            self.estimator_args = best_.get('estimator_args', dict())
             # store the best machines
-            self.pre_processor = copy.deepcopy(best_pre_processor_)
-            self.vectorizer = copy.deepcopy(best_vectorizer_)
-            self.estimator = copy.deepcopy(best_estimator_)
+            self.pre_processor = best_.get('pre_processor')
+            self.vectorizer = best_.get('vectorizer')
+            self.estimator = best_.get('estimator')
+            self.best_scores_ = best_.get('best_scores')
+            # the final save goes through the checkpointer: it supersedes the pending checkpoint,
+            # starts after the one being written, if any, and is waited for
+            checkpointer.submit(self)
+            checkpointer.close(flush=True)
+            logger.debug('Checkpoints: %d saves, %d copies' % (checkpointer.n_saves, best_.n_copies))
 
         # save to disk
+        if n_iter == 1:
+            self.save(model_name)
         logger.info('Saved current best model in %s' % model_name)
-        self.save(model_name)
         if n_failures >= n_iter:
             logger.warning('ERROR: no iteration has produced any viable solution.')
 
-    def _data_matrix(self, iterable, fit_vectorizer=False):
+    def _data_matrix(self, iterable, fit_vectorizer=False, key=None):
+        """Return the data matrix of the instances in iterable.
+
+        If key is not None return also the list of the values of the graph attribute key."""
+
         assert(is_iterable(iterable)), 'Not iterable'
+        self.vectorizer.set_params(**self.vectorizer_args)
+        if fit_vectorizer is False:
+            # fused stage: graphs are produced and consumed inside the workers
+            return pre_process_vectorize(iterable,
+                                         pre_processor=self.pre_processor,
+                                         pre_processor_args=self.pre_processor_args,
+                                         vectorizer=self.vectorizer,
+                                         key=key,
+                                         n_blocks=max(self.n_blocks, self.pre_processor_n_blocks),
+                                         block_size=self.pre_processor_block_size,
+                                         n_jobs=max_n_jobs(self.n_jobs, self.pre_processor_n_jobs),
+                                         pool=self.pool)
+        # the vectorizer has to be fit on the graphs in the current process:
+        # the graphs are kept in their compact encoding and are not decoded here
         graphs = mp_pre_process(iterable,
                                 pre_processor=self.pre_processor,
                                 pre_processor_args=self.pre_processor_args,
                                 n_blocks=self.pre_processor_n_blocks,
                                 block_size=self.pre_processor_block_size,
-                                n_jobs=self.pre_processor_n_jobs)
-        graphs, graphs_ = tee(graphs)
-        self.vectorizer.set_params(**self.vectorizer_args)
+                                n_jobs=self.pre_processor_n_jobs,
+                                pool=self.pool,
+                                as_views=True)
+        if key is not None:
+            graphs = list(graphs)
         data_matrix = vectorize(graphs,
                                 vectorizer=self.vectorizer,
                                 fit_flag=fit_vectorizer,
                                 n_jobs=self.n_jobs,
-                                n_blocks=self.n_blocks)
-        return data_matrix
+                                n_blocks=self.n_blocks,
+                                block_size=self.block_size,
+                                pool=self.pool)
+        if key is None:
+            return data_matrix
+        else:
+            return data_matrix, [graph.graph.get(key, 'N/A') for graph in graphs]
+
+    def _chunked_data_matrix(self, iterable, chunk_size=CHUNK_SIZE, key=None):
+        # yield the data matrices (and graph info lists if key is not None) of consecutive chunks
+        for chunk in chunk_iterator(iterable, chunk_size=chunk_size):
+            yield self._data_matrix(chunk, key=key)
+
+    def _stored_data_matrices(self, iterable_pos, iterable_neg, feature_store_path=None):
+        """Return the data matrix and targets, re-using those in the feature store at feature_store_path
+        if they were computed with the current pre_processor and vectorizer parameters."""
+
+        data_key = self._data_key()
+        store = FeatureStore(feature_store_path)
+        if store.exists() and store.info == {'data_key': data_key}:
+            logger.info('Loaded data matrix from feature store: %s' % feature_store_path)
+            self.vectorizer.set_params(**self.vectorizer_args)
+            return store.to_csr(), store.target()
+        X, y = self._data_matrices(iterable_pos, iterable_neg, fit_vectorizer=False)
+        store = FeatureStore(feature_store_path, overwrite=True)
+        store.append(X, target=y)
+        store.set_info(info={'data_key': data_key}, vectorizer=self.vectorizer)
+        logger.info('Saved data matrix in feature store: %s' % feature_store_path)
+        return X, y
+
+    def _data_key(self):
+        # the data matrices depend only on the pre_processor and vectorizer parameters
+        return repr((sorted(self.pre_processor_args.items()), sorted(self.vectorizer_args.items())))
+
+    def _cached_data_matrices(self, iterable_pos, iterable_neg, data_matrix_cache=None):
+        """Return the data matrix and targets, re-using those computed earlier with the current
+        pre_processor and vectorizer parameters."""
+
+        data_key = self._data_key()
+        entry = data_matrix_cache.get(data_key)
+        if entry is not None:
+            logger.debug('Re-using the data matrix of a previous iteration')
+            # the vectorizer is saved with the model: keep it in sync with the parameters
+            self.vectorizer.set_params(**self.vectorizer_args)
+            return entry
+        X, y = self._data_matrices(iterable_pos, iterable_neg, fit_vectorizer=False)
+        data_matrix_cache.put(data_key, X, y)
+        return X, y
+
+    def _snapshot_model(self, snapshots):
+        # model with the machines and parameters recorded in snapshots, which are never modified
+        model = copy.copy(self)
+        for name in ['pre_processor', 'vectorizer', 'estimator',
+                     'pre_processor_args', 'vectorizer_args', 'estimator_args']:
+            setattr(model, name, snapshots.get(name))
+        model.best_scores_ = snapshots.get('best_scores')
+        return model
+
+    def _resume_best(self, model_name, snapshots, trial_log):
+        # record the machines of the model checkpointed by an interrupted search as the best ones
+        # and return its (score, score_mean, score_std); return None if model_name was not
+        # checkpointed by the search in trial_log
+        model = copy.copy(self)
+        model.load(model_name)
+        best_scores = getattr(model, 'best_scores_', None)
+        key = trial_key(model.pre_processor_args or dict(),
+                        model.vectorizer_args or dict(),
+                        model.estimator_args or dict())
+        record = trial_log.get(key)
+        if best_scores is None or record is None or not record.get('improved'):
+            logger.warning('Model %s is not a checkpoint of the logged search: the best model is not resumed' %
+                           model_name)
+            return None
+        snapshots.snapshot('pre_processor', model.pre_processor, version=0, copy_value=False)
+        snapshots.snapshot('vectorizer', model.vectorizer, version=-1, copy_value=False)
+        for name in ['estimator', 'pre_processor_args', 'vectorizer_args', 'estimator_args']:
+            snapshots.snapshot(name, getattr(model, name), copy_value=False)
+        snapshots.snapshot('best_scores', tuple(best_scores), copy_value=False)
+        return tuple(best_scores)
+
+    def _log_trial(self, trial_log, iteration, inner_iteration, cv_time, elapsed_time,
+                   scores=None, score=None, improved=False, error=None):
+        record = dict(iteration=iteration,
+                      inner_iteration=inner_iteration,
+                      key=trial_key(self.pre_processor_args, self.vectorizer_args, self.estimator_args),
+                      data_key=self._data_key(),
+                      pre_processor_args=self.pre_processor_args,
+                      vectorizer_args=self.vectorizer_args,
+                      estimator_args=self.estimator_args,
+                      cv_time=cv_time,
+                      elapsed_time=elapsed_time,
+                      improved=improved)
+        if error is None:
+            record.update(status='ok',
+                          scores=[float(value) for value in scores],
+                          score=float(score),
+                          score_mean=float(np.mean(scores)),
+                          score_std=float(np.std(scores)))
+        else:
+            record.update(status='failed', error='%s: %s' % (type(error).__name__, error))
+        trial_log.append(record)
+
+    def _prefetched_data_matrices(self, iterable_pos, iterable_neg, args, data_matrix_cache):
+        # build the data matrices of the (pre_processor_args, vectorizer_args) pair args on a
+        # copy of the model, so that the model itself can be used and saved meanwhile
+        model = copy.copy(self)
+        model.pool = self.pool
+        model.vectorizer = copy.deepcopy(self.vectorizer)
+        model.pre_processor_args, model.vectorizer_args = args
+        return model._cached_data_matrices(iter(iterable_pos), iter(iterable_neg),
+                                           data_matrix_cache=data_matrix_cache)
 
     def _data_matrices(self, iterable_pos, iterable_neg, fit_vectorizer=False):
         data_matrix_pos = self._data_matrix(iterable_pos, fit_vectorizer=fit_vectorizer)
@@ -410,32 +760,35 @@ class ActiveLearningBinaryClassificationModel(object):
                               lower_bound_threshold_positive=-1,
                               upper_bound_threshold_positive=1,
                               lower_bound_threshold_negative=-1,
-                              upper_bound_threshold_negative=1):
+                              upper_bound_threshold_negative=1,
+                              data_matrix_cache=None):
+        # the pools of instances are vectorized once: each round scores the cached vectors
+        # with the current estimator and slices the rows of the selected instances
+        if data_matrix_cache is not None and self.fit_vectorizer is False:
+            pool_data_matrix, pool_y = self._cached_data_matrices(iterable_pos, iterable_neg,
+                                                                  data_matrix_cache=data_matrix_cache)
+        else:
+            pool_data_matrix, pool_y = self._data_matrices(iterable_pos, iterable_neg,
+                                                           fit_vectorizer=self.fit_vectorizer)
+        n_positives = int(np.sum(pool_y == 1))
+        pool_pos, pool_neg = pool_data_matrix[:n_positives], pool_data_matrix[n_positives:]
         # select the initial ids simply as the first occurrences
         if size_positive != -1:
-            positive_ids = range(size_positive)
+            positive_ids = range(min(size_positive, pool_pos.shape[0]))
         if size_negative != -1:
-            negative_ids = range(size_negative)
+            negative_ids = range(min(size_negative, pool_neg.shape[0]))
         # iterate: select instances according to current model and create novel
         # data matrix to fit the model in next round
         for i in range(n_active_learning_iterations):
             # make data matrix on selected instances
-            # if this is the first iteration or we need to select positives
-            if i == 0 or size_positive != -1:
-                iterable_pos, iterable_pos_, iterable_pos__ = tee(iterable_pos, 3)
-                if size_positive == -1:  # if we take all positives
-                    data_matrix_pos = self._data_matrix(iterable_pos_, fit_vectorizer=self.fit_vectorizer)
-                else:  # otherwise use selection
-                    data_matrix_pos = self._data_matrix(selection_iterator(iterable_pos_, positive_ids),
-                                                        fit_vectorizer=self.fit_vectorizer)
-            # if this is the first iteration or we need to select negatives
-            if i == 0 or size_negative != -1:
-                iterable_neg, iterable_neg_, iterable_neg__ = tee(iterable_neg, 3)
-                if size_negative == -1:  # if we take all negatives
-                    data_matrix_neg = self._data_matrix(iterable_neg_, fit_vectorizer=False)
-                else:  # otherwise use selection
-                    data_matrix_neg = self._data_matrix(selection_iterator(iterable_neg_, negative_ids),
-                                                        fit_vectorizer=False)
+            if size_positive == -1:  # if we take all positives
+                data_matrix_pos = pool_pos
+            else:  # otherwise use selection, in the original order
+                data_matrix_pos = pool_pos[sorted(positive_ids)]
+            if size_negative == -1:  # if we take all negatives
+                data_matrix_neg = pool_neg
+            else:
+                data_matrix_neg = pool_neg[sorted(negative_ids)]
             # assemble data matrix
             data_matrix, y = self._assemble_data_matrix(data_matrix_pos, data_matrix_neg)
             # stop the fitting procedure at the last-1 iteration and return data_matrix,y
@@ -445,26 +798,23 @@ class ActiveLearningBinaryClassificationModel(object):
             self.estimator.fit(data_matrix, y)
             # use the trained estimator to select the next instances
             if size_positive != -1:
-                positive_ids = self._bounded_selection(iterable_pos__,
+                positive_ids = self._bounded_selection(pool_pos,
                                                        size=size_positive,
                                                        lower_bound_threshold=lower_bound_threshold_positive,
                                                        upper_bound_threshold=upper_bound_threshold_positive)
             if size_negative != -1:
-                negative_ids = self._bounded_selection(iterable_neg__,
+                negative_ids = self._bounded_selection(pool_neg,
                                                        size=size_negative,
                                                        lower_bound_threshold=lower_bound_threshold_negative,
                                                        upper_bound_threshold=upper_bound_threshold_negative)
         return data_matrix, y
 
-    def _bounded_selection(self, iterable, size=None, lower_bound_threshold=None, upper_bound_threshold=None):
-        # transform row data to graphs
-        iterable = self.pre_processor(iterable)
-        # use estimator to predict margin for instances in an out-of-core fashion
-        predictions = self.vectorizer.predict(iterable, self.estimator)
-        ids = list()
-        for i, prediction in enumerate(predictions):
-            if prediction >= float(lower_bound_threshold) and prediction <= float(upper_bound_threshold):
-                ids.append(i)
+    def _bounded_selection(self, data_matrix, size=None, lower_bound_threshold=None, upper_bound_threshold=None):
+        # score all the instances at once with the current estimator
+        predictions = self.estimator.decision_function(data_matrix)
+        in_bounds = np.logical_and(predictions >= float(lower_bound_threshold),
+                                   predictions <= float(upper_bound_threshold))
+        ids = list(np.flatnonzero(in_bounds))
         if len(ids) == 0:
             raise Exception('No instances found that satisfy constraints')
         # keep a random sample of interesting instances
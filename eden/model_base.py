@@ -7,17 +7,20 @@ import argparse
 import logging
 import logging.handlers
 from eden.util import configure_logging
+from eden.util import instrumentation
 from eden.util import serialize_dict
 
 
+import numpy as np
 from numpy.random import randint
 from numpy.random import uniform
 
-from sklearn.linear_model import SGDClassifier
-from sklearn import metrics
 
 from eden.graph import Vectorizer
 from eden.util import save_output, store_matrix
+from eden.util.pool import WorkerPool, max_n_jobs
+from eden.util.feature_store import FeatureStore
+from eden.util.source import ReplayableSource
 from eden.converter.graph.node_link_data import node_link_data_to_eden
 
 import logging
@@ -90,6 +93,7 @@ class ModelInitializerBase(object):
 
     def estimator_init(self, args):
         """Setup the estimator and set of matching parameter choices."""
+        from sklearn.linear_model import SGDClassifier
         estimator = SGDClassifier(average=True, class_weight='auto', shuffle=True)
         estimator_parameters = {'n_iter': randint(5, 200, size=args.n_iter),
                                 'penalty': ['l1', 'l2', 'elasticnet'],
@@ -144,51 +148,142 @@ class ModelInitializerBase(object):
         return parser
 
 
+def worker_pool(n_jobs=-1, pre_processor_n_jobs=-1):
+    """Return a WorkerPool large enough for both the pre-processing and the vectorization."""
+
+    return WorkerPool(n_jobs=max_n_jobs(n_jobs, pre_processor_n_jobs))
+
+
 def main_fit(model_initializer, args):
-    # init
-    pos_train_iterator = model_initializer.load_positive_data(args)
-    neg_train_iterator = model_initializer.load_negative_data(args)
+    # init: the optimization reads the instances at each iteration, re-loading them from the input files
+    pos_train_iterator = ReplayableSource(model_initializer.load_positive_data, args)
+    neg_train_iterator = ReplayableSource(model_initializer.load_negative_data, args)
     pre_processor, pre_processor_parameters = model_initializer.pre_processor_init(args)
     vectorizer, vectorizer_parameters = model_initializer.vectorizer_init(args)
     estimator, estimator_parameters = model_initializer.estimator_init(args)
 
+    # save model
+    if not os.path.exists(args.output_dir_path):
+        os.mkdir(args.output_dir_path)
+    full_out_file_name = os.path.join(args.output_dir_path, args.model_file)
+
+    from eden.model import ActiveLearningBinaryClassificationModel
+    with worker_pool(args.n_jobs, args.pre_processor_n_jobs) as pool:
+        model = ActiveLearningBinaryClassificationModel(pre_processor=pre_processor,
+                                                        estimator=estimator,
+                                                        vectorizer=vectorizer,
+                                                        fit_vectorizer=args.fit_vectorizer,
+                                                        n_jobs=args.n_jobs,
+                                                        n_blocks=args.n_blocks,
+                                                        block_size=args.block_size,
+                                                        pre_processor_n_jobs=args.pre_processor_n_jobs,
+                                                        pre_processor_n_blocks=args.pre_processor_n_blocks,
+                                                        pre_processor_block_size=args.pre_processor_block_size,
+                                                        random_state=args.random_state,
+                                                        pool=pool)
+        # hyper parameters optimization
+        model.optimize(pos_train_iterator, neg_train_iterator,
+                       model_name=full_out_file_name,
+                       n_iter=args.n_iter,
+                       n_inner_iter_estimator=args.n_inner_iter_estimator,
+                       pre_processor_parameters=pre_processor_parameters,
+                       vectorizer_parameters=vectorizer_parameters,
+                       estimator_parameters=estimator_parameters,
+                       n_active_learning_iterations=args.n_active_learning_iterations,
+                       size_positive=args.size_positive,
+                       size_negative=args.size_negative,
+                       lower_bound_threshold_positive=args.lower_bound_threshold_positive,
+                       upper_bound_threshold_positive=args.upper_bound_threshold_positive,
+                       lower_bound_threshold_negative=args.lower_bound_threshold_negative,
+                       upper_bound_threshold_negative=args.upper_bound_threshold_negative,
+                       max_total_time=args.max_total_time,
+                       cv=args.cv,
+                       scoring=args.scoring,
+                       score_func=lambda u, s: u - s,
+                       two_steps_optimization=args.two_steps_optimization,
+                       feature_store_path=args.feature_store_path,
+                       trial_log_path=os.path.join(args.output_dir_path, 'trials.jsonl'),
+                       resume=args.resume)
+
+
+def main_profile(model_initializer, args):
+    import cProfile
+    import pstats
+    import shutil
+    import tempfile
+    from itertools import islice
     from eden.model import ActiveLearningBinaryClassificationModel
+    from eden.util import multi_metric_cross_val_scores
+
+    # all the stages run serially on a sample, so that they are all timed in this process;
+    # the other commands run with the instrumentation disabled
+    instrumentation.enable()
+    profiler = None
+    if args.profile_file is not None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    with instrumentation.timer('profile.load'):
+        pos = list(islice(model_initializer.load_positive_data(args), args.sample_size))
+        neg = list(islice(model_initializer.load_negative_data(args), args.sample_size))
+    instrumentation.count('profile.load', instances=len(pos) + len(neg))
+    pre_processor, pre_processor_parameters = model_initializer.pre_processor_init(args)
+    vectorizer, vectorizer_parameters = model_initializer.vectorizer_init(args)
+    estimator, estimator_parameters = model_initializer.estimator_init(args)
     model = ActiveLearningBinaryClassificationModel(pre_processor=pre_processor,
                                                     estimator=estimator,
                                                     vectorizer=vectorizer,
                                                     fit_vectorizer=args.fit_vectorizer,
-                                                    n_jobs=args.n_jobs,
-                                                    n_blocks=args.n_blocks,
-                                                    block_size=args.block_size,
-                                                    pre_processor_n_jobs=args.pre_processor_n_jobs,
-                                                    pre_processor_n_blocks=args.pre_processor_n_blocks,
-                                                    pre_processor_block_size=args.pre_processor_block_size,
+                                                    n_jobs=1,
+                                                    pre_processor_n_jobs=1,
                                                     random_state=args.random_state)
-    # save model
-    if not os.path.exists(args.output_dir_path):
-        os.mkdir(args.output_dir_path)
-    full_out_file_name = os.path.join(args.output_dir_path, args.model_file)
-
-    # hyper parameters optimization
-    model.optimize(pos_train_iterator, neg_train_iterator,
-                   model_name=full_out_file_name,
-                   n_iter=args.n_iter,
-                   n_inner_iter_estimator=args.n_inner_iter_estimator,
-                   pre_processor_parameters=pre_processor_parameters,
-                   vectorizer_parameters=vectorizer_parameters,
-                   estimator_parameters=estimator_parameters,
-                   n_active_learning_iterations=args.n_active_learning_iterations,
-                   size_positive=args.size_positive,
-                   size_negative=args.size_negative,
-                   lower_bound_threshold_positive=args.lower_bound_threshold_positive,
-                   upper_bound_threshold_positive=args.upper_bound_threshold_positive,
-                   lower_bound_threshold_negative=args.lower_bound_threshold_negative,
-                   upper_bound_threshold_negative=args.upper_bound_threshold_negative,
-                   max_total_time=args.max_total_time,
-                   cv=args.cv,
-                   scoring=args.scoring,
-                   score_func=lambda u, s: u - s,
-                   two_steps_optimization=args.two_steps_optimization)
+    model.pre_processor_args = model._default(pre_processor_parameters)
+    model.vectorizer_args = model._default(vectorizer_parameters)
+    model.estimator_args = model._default(estimator_parameters)
+    model.vectorizer.set_params(**model.vectorizer_args)
+    model.estimator.set_params(**model.estimator_args)
+
+    with instrumentation.timer('profile.pre_process'):
+        graphs_pos = list(model.pre_processor(pos, **model.pre_processor_args))
+        graphs_neg = list(model.pre_processor(neg, **model.pre_processor_args))
+    instrumentation.count('profile.pre_process', instances=len(graphs_pos) + len(graphs_neg))
+    with instrumentation.timer('profile.vectorize'):
+        if args.fit_vectorizer:
+            model.vectorizer.fit(graphs_pos)
+        data_matrix_pos = model.vectorizer.transform(graphs_pos)
+        data_matrix_neg = model.vectorizer.transform(graphs_neg)
+    data_matrix, y = model._assemble_data_matrix(data_matrix_pos, data_matrix_neg)
+    instrumentation.count('profile.vectorize', instances=data_matrix.shape[0], nnz=data_matrix.nnz)
+    with instrumentation.timer('profile.cross_validation'):
+        multi_metric_cross_val_scores(model.estimator, data_matrix, y, cv=args.cv, scorings=[args.scoring])
+    with instrumentation.timer('profile.fit'):
+        model.estimator.fit(data_matrix, y)
+    temp_dir = tempfile.mkdtemp()
+    try:
+        with instrumentation.timer('profile.save'):
+            model.save(os.path.join(temp_dir, 'model'))
+    finally:
+        shutil.rmtree(temp_dir)
+
+    text = [instrumentation.report()]
+    instrumentation.disable()
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile_file)
+        logger.info('Written profile: %s' % args.profile_file)
+        stats = pstats.Stats(args.profile_file)
+        text.append('\nFunctions with the largest cumulative time (see %s):' % args.profile_file)
+        text.append(_print_stats(stats, args.n_profile_functions))
+    logger.info('\n'.join(text))
+    save_output(text='\n'.join(text).split('\n'), output_dir_path=args.output_dir_path, out_file_name='profile.txt')
+
+
+def _print_stats(stats, n_functions):
+    # pstats prints to its stream: capture the output
+    from StringIO import StringIO
+    stream = StringIO()
+    stats.stream = stream
+    stats.sort_stats('cumulative').print_stats(n_functions)
+    return stream.getvalue()
 
 
 def main_estimate(model_initializer, args):
@@ -199,43 +294,110 @@ def main_estimate(model_initializer, args):
     model = ActiveLearningBinaryClassificationModel()
     model.load(args.model_file)
     logger.info(model.get_parameters())
-    apr, rocauc = model.estimate(pos_test_iterator, neg_test_iterator,
-                                 report_cross_validation=args.cross_validation)
+    with worker_pool(model.n_jobs, model.pre_processor_n_jobs) as pool:
+        model.set_pool(pool)
+        apr, rocauc = model.estimate(pos_test_iterator, neg_test_iterator,
+                                     report_cross_validation=args.cross_validation)
 
 
 def main_predict(model_initializer, args):
     iterator = model_initializer.load_data(args)
-    from itertools import tee
-    iterator, iterator_ = tee(iterator)
 
     from eden.model import ActiveLearningBinaryClassificationModel
     model = ActiveLearningBinaryClassificationModel()
     model.load(args.model_file)
     logger.info(model.get_parameters())
 
-    text = []
-    for margin, graph_info in model.decision_function_info(iterator, key='id'):
-        if margin > 0:
-            prediction = 1
-        else:
-            prediction = -1
-        text.append("%d\t%s\t%s\n" % (prediction, margin, graph_info))
-    save_output(text=text, output_dir_path=args.output_dir_path, out_file_name='predictions.txt')
+    def prediction_lines(pool):
+        model.set_pool(pool)
+        for margin, graph_info in model.decision_function_info(iterator, key='id', chunk_size=args.chunk_size):
+            if margin > 0:
+                prediction = 1
+            else:
+                prediction = -1
+            yield "%d\t%s\t%s\n" % (prediction, margin, graph_info)
 
+    # the predictions are written as they are computed, chunk_size instances at a time
+    with worker_pool(model.n_jobs, model.pre_processor_n_jobs) as pool:
+        save_output(text=prediction_lines(pool), output_dir_path=args.output_dir_path,
+                    out_file_name='predictions.txt')
 
-def main_matrix(model_initializer, args):
-    iterator = model_initializer.load_data(args)
 
+def main_serve(model_initializer, args):
     from eden.model import ActiveLearningBinaryClassificationModel
+    from eden.server import PredictionService, serve
     model = ActiveLearningBinaryClassificationModel()
     model.load(args.model_file)
     logger.info(model.get_parameters())
-    data_matrix = model._data_matrix(iterator)
-    kernel_matrix = metrics.pairwise.pairwise_kernels(data_matrix, metric='linear')
-    store_matrix(matrix=kernel_matrix,
-                 output_dir_path=args.output_dir_path,
-                 out_file_name='Gram_matrix',
-                 output_format=args.output_format)
+
+    def load_data(input_file):
+        # read the input file of a request as the predict command would
+        request_args = argparse.Namespace(**vars(args))
+        request_args.input_file = input_file
+        return model_initializer.load_data(request_args)
+
+    def score(instances):
+        return model.decision_function_info(instances, key='id', chunk_size=args.max_batch_size)
+
+    # the model and the worker processes are loaded once and shared by all the requests
+    with worker_pool(model.n_jobs, model.pre_processor_n_jobs) as pool:
+        model.set_pool(pool)
+        service = PredictionService(score, load_data=load_data,
+                                    max_batch_size=args.max_batch_size, max_wait=args.max_wait)
+        serve(service, host=args.host, port=args.port, socket_path=args.socket_path)
+
+
+def main_compile(model_initializer, args):
+    from eden.model import ActiveLearningBinaryClassificationModel
+    model = ActiveLearningBinaryClassificationModel()
+    model.load(args.model_file)
+    logger.info(model.get_parameters())
+    full_out_dir_name = os.path.join(args.output_dir_path, os.path.basename(args.model_file) + '.scorer')
+    model.compile(full_out_dir_name)
+    logger.info('Written scoring artifact: %s' % full_out_dir_name)
+
+
+def main_matrix(model_initializer, args):
+    from eden.util.kernel import gram_matrix
+    if not os.path.exists(args.output_dir_path):
+        os.mkdir(args.output_dir_path)
+    store = FeatureStore(args.input_file)
+    with worker_pool(args.n_jobs) as pool:
+        if os.path.isdir(args.input_file) and store.exists():
+            # the input is a feature store written by the feature command: read it lazily
+            logger.info('Reading data matrix from feature store: %s' % store)
+            data_matrix = store.to_csr()
+        else:
+            iterator = model_initializer.load_data(args)
+
+            from eden.model import ActiveLearningBinaryClassificationModel
+            model = ActiveLearningBinaryClassificationModel()
+            model.load(args.model_file)
+            logger.info(model.get_parameters())
+            model.set_pool(pool)
+            data_matrix = model._data_matrix(iterator)
+        # the dense Gram matrix is written block by block in a memory mapped .npy file
+        if args.output_format == 'numpy':
+            npy_file_name = os.path.join(args.output_dir_path, 'Gram_matrix.npy')
+        else:
+            npy_file_name = os.path.join(args.output_dir_path, 'Gram_matrix.tmp.npy')
+        kernel_matrix = gram_matrix(data_matrix,
+                                    path=npy_file_name,
+                                    block_size=args.kernel_block_size,
+                                    dtype=np.float32 if args.float32 else np.float64,
+                                    top_k=args.top_k,
+                                    n_jobs=args.n_jobs,
+                                    pool=pool)
+    if args.top_k is None and args.output_format == 'numpy':
+        logger.info("Written file: %s" % npy_file_name)
+    else:
+        store_matrix(matrix=kernel_matrix,
+                     output_dir_path=args.output_dir_path,
+                     out_file_name='Gram_matrix',
+                     output_format=args.output_format)
+        if args.top_k is None:
+            del kernel_matrix
+            os.remove(npy_file_name)
 
 
 def main_feature(model_initializer, args):
@@ -245,20 +407,41 @@ def main_feature(model_initializer, args):
     model = ActiveLearningBinaryClassificationModel()
     model.load(args.model_file)
     logger.info(model.get_parameters())
-    data_matrix = model._data_matrix(iterator)
-    store_matrix(matrix=data_matrix,
-                 output_dir_path=args.output_dir_path,
-                 out_file_name='data_matrix',
-                 output_format=args.output_format)
+    if args.output_format in ['feature_store', 'MatrixMarket', 'svmlight']:
+        # the rows are written chunk_size at a time, together with their ids, as they are vectorized
+        from eden.util.matrix_writer import matrix_writer
+        if not os.path.exists(args.output_dir_path):
+            os.mkdir(args.output_dir_path)
+        writer = matrix_writer(os.path.join(args.output_dir_path, 'data_matrix'), args.output_format,
+                               vectorizer=model.vectorizer)
+        with worker_pool(model.n_jobs, model.pre_processor_n_jobs) as pool:
+            model.set_pool(pool)
+            for data_matrix, ids in model._chunked_data_matrix(iterator, args.chunk_size, key='id'):
+                writer.write(data_matrix, ids=ids)
+        writer.close()
+    else:
+        with worker_pool(model.n_jobs, model.pre_processor_n_jobs) as pool:
+            model.set_pool(pool)
+            data_matrix = model._data_matrix(iterator)
+        store_matrix(matrix=data_matrix,
+                     output_dir_path=args.output_dir_path,
+                     out_file_name='data_matrix',
+                     output_format=args.output_format)
 
 
 def main(model_initializer, args):
     if args.which == 'fit':
         main_fit(model_initializer, args)
+    elif args.which == 'profile':
+        main_profile(model_initializer, args)
     elif args.which == 'estimate':
         main_estimate(model_initializer, args)
     elif args.which == 'predict':
         main_predict(model_initializer, args)
+    elif args.which == 'compile':
+        main_compile(model_initializer, args)
+    elif args.which == 'serve':
+        main_serve(model_initializer, args)
     elif args.which == 'matrix':
         main_matrix(model_initializer, args)
     elif args.which == 'feature':
@@ -388,6 +571,17 @@ def argparse_setup(model_initializer, description, epilog):
                             type=int,
                             help="Cross validation size.",
                             default=10)
+    fit_parser.add_argument("--feature-store-dir",
+                            dest="feature_store_path",
+                            help="Path to a feature store directory where the data matrix is saved. A later \
+                            run with the same pre-processor and vectorizer parameters reads the data matrix \
+                            from it instead of computing it. Used only when the data matrix does not change \
+                            across iterations and without active learning.",
+                            default=None)
+    fit_parser.add_argument("--resume",
+                            help="If set, resume an interrupted optimization from the trial log in the \
+                            output directory: the iterations and settings already evaluated are skipped.",
+                            action="store_true")
     fit_parser.add_argument("-B", "--nbits",
                             type=int,
                             help="Number of bits used to express the graph kernel features. A value of 20 \
@@ -435,6 +629,29 @@ def argparse_setup(model_initializer, description, epilog):
                             help="Random seed.",
                             default=1)
 
+    # profile commands: the fit arguments select the pipeline to profile
+    profile_parser = subparsers.add_parser('profile',
+                                           help='Profile the fit pipeline on a sample',
+                                           parents=[fit_parser],
+                                           conflict_handler='resolve',
+                                           formatter_class=DefaultsRawDescriptionHelpFormatter)
+    profile_parser.set_defaults(which='profile')
+    profile_parser.add_argument("--sample-size",
+                                dest="sample_size",
+                                type=int,
+                                help="Number of positive and of negative instances in the sample.",
+                                default=200)
+    profile_parser.add_argument("--profile-file",
+                                dest="profile_file",
+                                help="If set, run the sample under cProfile and dump the statistics in \
+                                this file, readable with the pstats module.",
+                                default=None)
+    profile_parser.add_argument("--n-profile-functions",
+                                dest="n_profile_functions",
+                                type=int,
+                                help="Number of functions with the largest cumulative time reported.",
+                                default=30)
+
     # estimate commands
     estimate_parser = subparsers.add_parser('estimate', help='Estimate commands',
                                             formatter_class=DefaultsRawDescriptionHelpFormatter)
@@ -474,6 +691,63 @@ def argparse_setup(model_initializer, description, epilog):
                                            formatter_class=DefaultsRawDescriptionHelpFormatter)
     predict_parser.set_defaults(which='predict')
     predict_parser = model_initializer.add_arguments_predict(predict_parser)
+    predict_parser.add_argument("--chunk-size",
+                                dest="chunk_size",
+                                type=int,
+                                help="Number of instances pre-processed, vectorized and predicted at a time. \
+                                The predictions of each chunk are written before the next chunk is read.",
+                                default=10000)
+
+    # compile commands
+    compile_parser = subparsers.add_parser('compile',
+                                           help='Export the compact scoring artifact of a fit model',
+                                           formatter_class=DefaultsRawDescriptionHelpFormatter)
+    compile_parser.set_defaults(which='compile')
+    compile_parser.add_argument("-m", "--model-file",
+                                dest="model_file",
+                                help="Path to a fit model file.",
+                                default="model")
+    compile_parser.add_argument("-o", "--output-dir",
+                                dest="output_dir_path",
+                                help="Path to output directory. The artifact is written in the \
+                                directory <model file name>.scorer, see eden.scorer.",
+                                default="out")
+
+    # serve commands
+    serve_parser = subparsers.add_parser('serve',
+                                         help='Serve predictions of a fit model to eden.client requests',
+                                         formatter_class=DefaultsRawDescriptionHelpFormatter)
+    serve_parser.set_defaults(which='serve')
+    serve_parser = model_initializer.add_arguments_base(serve_parser)
+    # the input files are given by the requests
+    for action in serve_parser._actions:
+        if action.dest == 'input_file':
+            action.required = False
+    serve_parser.add_argument("-m", "--model-file",
+                              dest="model_file",
+                              help="Path to a fit model file.",
+                              default="model")
+    serve_parser.add_argument("--host",
+                              help="Host to listen on.",
+                              default="127.0.0.1")
+    serve_parser.add_argument("--port",
+                              type=int,
+                              help="Port to listen on.",
+                              default=8765)
+    serve_parser.add_argument("--socket",
+                              dest="socket_path",
+                              help="Path to a Unix socket to listen on instead of host and port.",
+                              default=None)
+    serve_parser.add_argument("--max-batch-size",
+                              dest="max_batch_size",
+                              type=int,
+                              help="Maximal number of instances of concurrent requests scored together.",
+                              default=1000)
+    serve_parser.add_argument("--max-wait",
+                              dest="max_wait",
+                              type=float,
+                              help="Number of seconds a request waits for other requests to be batched with.",
+                              default=0.005)
 
     # matrix commands
     matrix_parser = subparsers.add_parser('matrix',
@@ -482,10 +756,31 @@ def argparse_setup(model_initializer, description, epilog):
                                           formatter_class=DefaultsRawDescriptionHelpFormatter)
     matrix_parser.set_defaults(which='matrix')
     matrix_parser = model_initializer.add_arguments_matrix(matrix_parser)
-    matrix_parser.add_argument("-t", "--output-format", choices=["text", "numpy", "MatrixMarket", "joblib"],
+    matrix_parser.add_argument("-t", "--output-format",
+                               choices=["text", "numpy", "MatrixMarket", "joblib", "feature_store"],
                                dest="output_format",
-                               help="Output file format.",
+                               help="Output file format. With the 'numpy' format the Gram matrix is \
+                               written block by block in a memory mapped file and is never held in memory.",
                                default="MatrixMarket")
+    matrix_parser.add_argument("--kernel-block-size",
+                               dest="kernel_block_size",
+                               type=int,
+                               help="Number of rows and columns of the blocks of the Gram matrix computed \
+                               by each task.",
+                               default=2000)
+    matrix_parser.add_argument("--float32",
+                               help="If set, store the Gram matrix in single precision.",
+                               action="store_true")
+    matrix_parser.add_argument("--top-k",
+                               dest="top_k",
+                               type=int,
+                               help="If set, keep only the k largest entries of each row in a sparse matrix.",
+                               default=None)
+    matrix_parser.add_argument("-j", "--n-jobs",
+                               dest="n_jobs",
+                               type=int,
+                               help="Number of cores to use in multiprocessing.",
+                               default=-1)
 
     # feature commands
     feature_parser = subparsers.add_parser('feature',
@@ -494,10 +789,19 @@ def argparse_setup(model_initializer, description, epilog):
                                            formatter_class=DefaultsRawDescriptionHelpFormatter)
     feature_parser.set_defaults(which='feature')
     feature_parser = model_initializer.add_arguments_feature(feature_parser)
-    feature_parser.add_argument("-t", "--output-format", choices=["text", "numpy", "MatrixMarket", "joblib"],
+    feature_parser.add_argument("-t", "--output-format",
+                                choices=["text", "numpy", "MatrixMarket", "joblib", "feature_store", "svmlight"],
                                 dest="output_format",
-                                help="Output file format.",
+                                help="Output file format. The 'feature_store' format is a directory of \
+                                memory mappable shards that can be given as input file to the matrix command. \
+                                The 'feature_store', 'MatrixMarket' and 'svmlight' outputs are written chunk by \
+                                chunk, with the row ids in the shards or in the file data_matrix.<format>.ids.",
                                 default="MatrixMarket")
+    feature_parser.add_argument("--chunk-size",
+                                dest="chunk_size",
+                                type=int,
+                                help="Number of instances vectorized and written at a time.",
+                                default=10000)
     return parser
 
 
@@ -2,19 +2,18 @@
 
 import random
 from time import time
-import multiprocessing as mp
 from itertools import tee, chain
 from collections import defaultdict
 
 import joblib
 
-from eden import apply_async
 from eden.graph import Vectorizer
 from eden.path import Vectorizer as PathVectorizer
-from eden.util import vectorize, mp_pre_process, compute_intervals
+from eden.util import vectorize, mp_pre_process, compute_schedule
 from eden.converter.fasta import sequence_to_eden
 from eden.modifier.seq import seq_to_seq, shuffle_modifier
 from eden.util import fit
+from eden.util.pool import resolve_pool
 from eden.util.iterated_maximum_subarray import compute_max_subarrays
 
 import esm
@@ -23,6 +22,10 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def serial_graph_motif(seqs, sequence_motif=None):
+    return sequence_motif._serial_graph_motif(seqs)
+
+
 class SequenceMotif(object):
 
     def __init__(self,
@@ -43,13 +46,15 @@ class SequenceMotif(object):
                  pre_processor_n_jobs=4,
                  pre_processor_n_blocks=8,
                  pre_processor_block_size=None,
-                 random_state=1):
+                 random_state=1,
+                 pool=None):
         self.n_jobs = n_jobs
         self.n_blocks = n_blocks
         self.block_size = block_size
         self.pre_processor_n_jobs = pre_processor_n_jobs
         self.pre_processor_n_blocks = pre_processor_n_blocks
         self.pre_processor_block_size = pre_processor_block_size
+        self.pool = pool
         self.training_size = training_size
         self.n_iter_search = n_iter_search
         self.complexity = complexity
@@ -72,12 +77,24 @@ class SequenceMotif(object):
         self.clusters = defaultdict(list)
         self.cluster_models = []
 
+    def __getstate__(self):
+        # NOTE: worker processes are not part of the model
+        state = self.__dict__.copy()
+        state.pop('pool', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.pool = None
+
     def save(self, model_name):
         self.clustering_algorithm = None  # NOTE: some algorithms cannot be pickled
         joblib.dump(self, model_name, compress=1)
 
     def load(self, obj):
+        pool = getattr(self, 'pool', None)
         self.__dict__.update(joblib.load(obj).__dict__)
+        self.pool = pool
         self._build_cluster_models()
 
     def fit(self, seqs, neg_seqs=None):
@@ -226,15 +243,14 @@ class SequenceMotif(object):
         return motives
 
     def _multiprocess_graph_motif(self, seqs):
-        size = len(seqs)
-        intervals = compute_intervals(size=size, n_blocks=self.n_blocks, block_size=self.block_size)
-        if self.n_jobs == -1:
-            pool = mp.Pool()
-        else:
-            pool = mp.Pool(processes=self.n_jobs)
-        results = [apply_async(pool, self._serial_graph_motif, args=(seqs[start:end], True))
-                   for start, end in intervals]
-        output = [p.get() for p in results]
+        pool = resolve_pool(self.pool, n_jobs=self.n_jobs)
+        intervals = compute_schedule(seqs, n_blocks=self.n_blocks, block_size=self.block_size, n_jobs=pool.n_jobs)
+        # the fitted model is transferred once per worker, the blocks carry only the sequences
+        token = pool.share(sequence_motif=self)
+        try:
+            output = pool.map_shared(serial_graph_motif, token, [(seqs[start:end],) for start, end in intervals])
+        finally:
+            pool.release(token)
         return list(chain(*output))
 
     def _motif_finder(self, seqs):
@@ -249,7 +265,8 @@ class SequenceMotif(object):
         pos_graphs = mp_pre_process(pos_seqs, pre_processor=sequence_to_eden,
                                     n_blocks=self.pre_processor_n_blocks,
                                     block_size=self.pre_processor_block_size,
-                                    n_jobs=self.pre_processor_n_jobs)
+                                    n_jobs=self.pre_processor_n_jobs,
+                                    pool=self.pool)
         if neg_seqs is None:
             # shuffle seqs to obtain negatives
             neg_seqs = seq_to_seq(pos_seqs_,
@@ -259,7 +276,8 @@ class SequenceMotif(object):
         neg_graphs = mp_pre_process(neg_seqs, pre_processor=sequence_to_eden,
                                     n_blocks=self.pre_processor_n_blocks,
                                     block_size=self.pre_processor_block_size,
-                                    n_jobs=self.pre_processor_n_jobs)
+                                    n_jobs=self.pre_processor_n_jobs,
+                                    pool=self.pool)
         # fit discriminative estimator
         self.estimator = fit(pos_graphs, neg_graphs,
                              vectorizer=self.vectorizer,
@@ -267,14 +285,16 @@ class SequenceMotif(object):
                              n_jobs=self.n_jobs,
                              n_blocks=self.n_blocks,
                              block_size=self.block_size,
-                             random_state=self.random_state)
+                             random_state=self.random_state,
+                             pool=self.pool)
 
     def _cluster(self, seqs, clustering_algorithm=None):
         data_matrix = vectorize(seqs,
                                 vectorizer=self.seq_vectorizer,
                                 n_blocks=self.n_blocks,
                                 block_size=self.block_size,
-                                n_jobs=self.n_jobs)
+                                n_jobs=self.n_jobs,
+                                pool=self.pool)
         predictions = clustering_algorithm.fit_predict(data_matrix)
         # collect instance ids per cluster id
         for i in range(len(predictions)):
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 
 from sklearn.linear_model import SGDClassifier
-import itertools
+from eden.util.source import fan_out
 import copy
 from eden.graph import Vectorizer
 
@@ -101,7 +101,12 @@ class ListVectorizer(Vectorizer):
         weights : list of positive real values.
           Weights for the linear combination of sparse vectors obtained on each iterated tuple of graphs.
         """
-        graphs_iterators_list_fit, graphs_iterators_list_transf = itertools.tee(graphs_iterators_list)
+        # each list of graphs is read once by fit and once by transform
+        graphs_iterators_list_fit, graphs_iterators_list_transf = [], []
+        for graphs in graphs_iterators_list:
+            graphs_fit, graphs_transf = fan_out(graphs)
+            graphs_iterators_list_fit.append(graphs_fit)
+            graphs_iterators_list_transf.append(graphs_transf)
         self.fit(graphs_iterators_list_fit)
         return self.transform(graphs_iterators_list_transf)
 
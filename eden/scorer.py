@@ -0,0 +1,124 @@
+"""Compact scoring artifacts of fitted linear models.
+
+compile_linear_model writes a directory with:
+
+- hashes.npy: the sorted feature indices (hashes) with a nonzero coefficient
+- weights.npy: the corresponding coefficients
+- meta.json: the intercept, the classes, the number of features and the
+  constructor parameters of the vectorizer (see Vectorizer.get_params)
+
+A CompiledScorer memory maps the arrays and computes the margins of a
+sparse data matrix by looking up its feature indices in the sorted hash
+table. Only numpy is needed to score a data matrix; the vectorizer is
+rebuilt on demand to score graphs.
+"""
+
+import os
+import json
+import numpy as np
+
+
+def _json_default(value):
+    # numpy scalars are written as the equivalent python numbers, anything else is refused
+    if isinstance(value, np.generic):
+        return value.item()
+    raise Exception('ERROR: %r of type %s cannot be written in the scoring artifact' %
+                    (value, type(value).__name__))
+
+
+def _native(value):
+    # JSON decodes strings as unicode
+    if isinstance(value, unicode):
+        return str(value)
+    return value
+
+
+def compile_linear_model(path, estimator, vectorizer, info=None):
+    """Write the scoring artifact of a fitted binary linear estimator in the directory path."""
+
+    if not hasattr(estimator, 'coef_') or np.asarray(estimator.coef_).shape[0] != 1:
+        raise Exception('ERROR: only binary linear estimators with a coef_ attribute can be compiled')
+    from eden.graph import Vectorizer
+    if type(vectorizer) is not Vectorizer:
+        raise Exception('ERROR: only eden.graph.Vectorizer can be compiled, got: %s' % type(vectorizer).__name__)
+    if getattr(vectorizer, 'fit_status', None) == 'fit':
+        raise Exception('ERROR: vectorizers with fitted discretization models cannot be compiled')
+    vectorizer_params = vectorizer.get_params()
+    if Vectorizer(**vectorizer_params).get_params() != vectorizer_params:
+        raise Exception('ERROR: the vectorizer cannot be rebuilt from its parameters: %s' % vectorizer_params)
+    coef = np.asarray(estimator.coef_).ravel()
+    hashes = np.flatnonzero(coef).astype(np.int64)
+    meta = dict(intercept=float(np.asarray(estimator.intercept_).ravel()[0]),
+                classes=[value.item() for value in np.asarray(estimator.classes_)],
+                n_features=len(coef),
+                vectorizer=vectorizer_params,
+                info=info if info is not None else dict())
+    # serialize before writing anything, so that an error does not leave an incomplete artifact
+    text = json.dumps(meta, indent=2, sort_keys=True, default=_json_default)
+    if not os.path.exists(path):
+        os.makedirs(path)
+    np.save(os.path.join(path, 'hashes.npy'), hashes)
+    np.save(os.path.join(path, 'weights.npy'), coef[hashes].astype(np.float64))
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        f.write(text)
+
+
+class CompiledScorer(object):
+
+    """Scorer of the artifact written by compile_linear_model in the directory path.
+
+    Parameters
+    ----------
+    path : string
+        The artifact directory.
+
+    mmap_mode : string or None (default 'r')
+        Memory mapping mode of the coefficient arrays, None to read them in memory.
+    """
+
+    def __init__(self, path, mmap_mode='r'):
+        self.path = path
+        self.hashes = np.load(os.path.join(path, 'hashes.npy'), mmap_mode=mmap_mode)
+        self.weights = np.load(os.path.join(path, 'weights.npy'), mmap_mode=mmap_mode)
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.intercept = self.meta['intercept']
+        self.classes = self.meta['classes']
+        self.n_features = self.meta['n_features']
+        self._vectorizer = None
+
+    def decision_function(self, data_matrix):
+        """Return the margins of the rows of a scipy sparse data matrix."""
+
+        data_matrix = data_matrix.tocsr()
+        if data_matrix.shape[1] != self.n_features:
+            raise Exception('ERROR: data matrix has %d features, the model %d' %
+                            (data_matrix.shape[1], self.n_features))
+        n_rows = data_matrix.shape[0]
+        if len(self.hashes) == 0:
+            return np.zeros(n_rows) + self.intercept
+        positions = np.searchsorted(self.hashes, data_matrix.indices)
+        positions = np.minimum(positions, len(self.hashes) - 1)
+        found = self.hashes[positions] == data_matrix.indices
+        contributions = np.where(found, data_matrix.data * self.weights[positions], 0)
+        rows = np.repeat(np.arange(n_rows), np.diff(data_matrix.indptr))
+        return np.bincount(rows, weights=contributions, minlength=n_rows) + self.intercept
+
+    def predict(self, data_matrix):
+        """Return the predicted classes of the rows of a scipy sparse data matrix."""
+
+        return np.where(self.decision_function(data_matrix) > 0, self.classes[1], self.classes[0])
+
+    def vectorizer(self):
+        """Return a Vectorizer with the parameters of the compiled model."""
+
+        if self._vectorizer is None:
+            from eden.graph import Vectorizer
+            params = dict((str(key), _native(value)) for key, value in self.meta['vectorizer'].items())
+            self._vectorizer = Vectorizer(**params)
+        return self._vectorizer
+
+    def decision_function_graphs(self, graphs):
+        """Return the margins of the graphs."""
+
+        return self.decision_function(self.vectorizer().transform(graphs))
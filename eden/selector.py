@@ -8,15 +8,6 @@ from copy import deepcopy
 import numpy as np
 from scipy import sparse
 
-import pymf
-from sklearn.preprocessing import normalize
-from sklearn.metrics.pairwise import pairwise_kernels
-from sklearn.metrics.pairwise import pairwise_distances
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.linear_model import SGDClassifier
-from scipy.stats import entropy
-from sklearn.random_projection import SparseRandomProjection
-
 from eden.util import serialize_dict
 
 logger = logging.getLogger(__name__)
@@ -295,6 +286,7 @@ class SparseSelector(AbstractSelector):
         return '\n'.join(serial)
 
     def select(self, data_matrix, target=None):
+        from sklearn.metrics.pairwise import pairwise_kernels
         # extract difference matrix
         kernel_matrix = pairwise_kernels(data_matrix, metric=self.metric, **self.kwds)
         # set minimum value
@@ -349,6 +341,8 @@ class MaxVolSelector(AbstractSelector):
         return '\n'.join(serial)
 
     def select(self, data_matrix, target=None):
+        from sklearn.random_projection import SparseRandomProjection
+        import pymf
         if sparse.issparse(data_matrix):
             data_matrix = SparseRandomProjection().fit_transform(data_matrix).toarray()
         mf = pymf.SIVM(data_matrix.T, num_bases=self.n_instances)
@@ -358,6 +352,7 @@ class MaxVolSelector(AbstractSelector):
         return selected_instances_ids
 
     def _get_ids(self, data_matrix, selected):
+        from sklearn.metrics.pairwise import pairwise_distances
         diffs = pairwise_distances(data_matrix, selected)
         selected_instances_ids = [i for i, diff in enumerate(diffs) if 0 in diff]
         return selected_instances_ids
@@ -395,6 +390,7 @@ class OnionSelector(AbstractSelector):
         return '\n'.join(serial)
 
     def transform(self, data_matrix, target=None):
+        from sklearn.random_projection import SparseRandomProjection
         if sparse.issparse(data_matrix):
             data_matrix = SparseRandomProjection().fit_transform(data_matrix).toarray()
         current_data_matrix = data_matrix
@@ -420,6 +416,7 @@ class OnionSelector(AbstractSelector):
         return current_data_matrix[selected_instances_ids]
 
     def select_layer(self, data_matrix):
+        import pymf
         mf = pymf.SIVM(data_matrix.T, num_bases=self.n_instances)
         mf.factorize()
         basis = mf.W.T
@@ -427,6 +424,7 @@ class OnionSelector(AbstractSelector):
         return selected_instances_ids
 
     def _get_ids(self, data_matrix, selected):
+        from sklearn.metrics.pairwise import pairwise_distances
         diffs = pairwise_distances(data_matrix, selected)
         selected_instances_ids = [i for i, diff in enumerate(diffs) if 0 in diff]
         return selected_instances_ids
@@ -512,6 +510,7 @@ class QuickShiftSelector(AbstractSelector):
         return '\n'.join(serial)
 
     def select(self, data_matrix, target=None):
+        from sklearn.metrics.pairwise import pairwise_distances
         # compute parent relationship
         self.parent_ids = self.parents(data_matrix, target=target)
         # compute norm of parent-instance vector
@@ -528,6 +527,7 @@ class QuickShiftSelector(AbstractSelector):
         return selected_instances_ids
 
     def parents(self, data_matrix, target=None):
+        from sklearn.metrics.pairwise import pairwise_kernels
         data_size = data_matrix.shape[0]
         kernel_matrix = pairwise_kernels(data_matrix, metric=self.metric, **self.kwds)
         # compute instance density as 1 over average pairwise distance
@@ -606,6 +606,7 @@ class DensitySelector(AbstractSelector):
         return selected_instances_ids
 
     def _density_func(self, data_matrix, target=None):
+        from sklearn.metrics.pairwise import pairwise_kernels
         kernel_matrix = pairwise_kernels(data_matrix, metric=self.metric, **self.kwds)
         # compute instance density as average pairwise similarity
         densities = np.mean(kernel_matrix, 0)
@@ -630,11 +631,14 @@ class DecisionSurfaceSelector(AbstractSelector):
     """
 
     def __init__(self, n_instances=20,
-                 estimator=SGDClassifier(average=True, class_weight='balanced', shuffle=True),
+                 estimator=None,
                  random_state=1,
                  randomized=False):
+        from sklearn.linear_model import SGDClassifier
         self.name = 'DecisionSurfaceSelector'
         self.n_instances = n_instances
+        if estimator is None:
+            estimator = SGDClassifier(average=True, class_weight='balanced', shuffle=True)
         self.estimator = estimator
         self.random_state = random_state
         self.randomized = randomized
@@ -676,6 +680,8 @@ class DecisionSurfaceSelector(AbstractSelector):
         return selected_instances_ids
 
     def _probability_func(self, data_matrix, target=None):
+        from scipy.stats import entropy
+        from sklearn.preprocessing import normalize
         # select maximally ambiguous (max entropy) or unpredictable instances
         self.estimator.fit(data_matrix, target)
         decision_function = getattr(self.estimator, "decision_function", None)
@@ -701,6 +707,8 @@ class DecisionSurfaceSelector(AbstractSelector):
         return probabilities
 
     def randomize(self, data_matrix, amount=1.0):
+        from sklearn.linear_model import SGDClassifier
+        from sklearn.neighbors import KNeighborsClassifier
         random.seed(self.random_state)
         self.n_instances = self._auto_n_instances(data_matrix.shape[0])
         algo = random.choice(['SGDClassifier', 'KNeighborsClassifier'])
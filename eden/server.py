@@ -0,0 +1,333 @@
+"""Long-lived prediction server.
+
+A PredictionService wraps a scoring function, e.g. the chunked
+decision_function_info of a fitted model loaded once at start-up.
+Concurrent requests are queued to a MicroBatcher that merges those
+arriving within max_wait seconds (up to max_batch_size instances) into a
+single scoring call, so that the pre-processing, vectorization and scoring
+of many small requests are amortized.
+
+The service is exposed over HTTP on localhost or on a Unix socket:
+
+- POST /predict with a JSON object holding either 'instances' (a list of
+  inputs for the pre-processor) or 'input_file' (a path read by the
+  server); the reply holds 'margins', 'predictions', 'ids' and the
+  'timing' of the request.
+- GET /metrics returns the latency statistics of the recent requests.
+- GET /health returns {'status': 'ok'}.
+
+See eden.client for the matching client.
+"""
+
+import os
+import json
+import threading
+import Queue
+import BaseHTTPServer
+import SocketServer
+from collections import deque
+from time import time
+import numpy as np
+import logging
+logger = logging.getLogger(__name__)
+
+# default maximal number of instances scored in a single call
+MAX_BATCH_SIZE = 1000
+# default number of seconds a request waits for others to be batched with it
+MAX_WAIT = 0.005
+# default number of recent requests the latency statistics are computed on
+METRICS_WINDOW = 10000
+
+
+class _Request(object):
+
+    def __init__(self, instances):
+        self.instances = instances
+        self.results = None
+        self.error = None
+        self.batch_size = 0
+        self.submit_time = time()
+        self.start_time = self.end_time = None
+        self.done = threading.Event()
+
+
+class MicroBatcher(object):
+
+    """Merge the instances of concurrent requests into batches scored by a single thread.
+
+    Parameters
+    ----------
+    score_fun : callable
+        Function that takes a list of instances and returns the list of their results.
+
+    max_batch_size : int (default MAX_BATCH_SIZE)
+        Maximal number of instances in a batch; a larger request is scored on its own.
+
+    max_wait : float (default MAX_WAIT)
+        Number of seconds the first request of a batch waits for further requests.
+    """
+
+    def __init__(self, score_fun, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT):
+        self.score_fun = score_fun
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.n_batches = 0
+        self.n_batched_instances = 0
+        self._queue = Queue.Queue()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, instances):
+        """Score instances, blocking until their batch is done; return the request record."""
+
+        request = _Request(list(instances))
+        self._queue.put(request)
+        # NOTE: waiting with a timeout keeps the calling thread interruptible
+        while not request.done.wait(1):
+            pass
+        if request.error is not None:
+            raise request.error
+        return request
+
+    def _run(self):
+        closing = False
+        while not closing:
+            request = self._queue.get()
+            if request is None:
+                return
+            batch = [request]
+            n_instances = len(request.instances)
+            deadline = time() + self.max_wait
+            while n_instances < self.max_batch_size:
+                timeout = deadline - time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except Queue.Empty:
+                    break
+                if request is None:
+                    closing = True
+                    break
+                batch.append(request)
+                n_instances += len(request.instances)
+            self._score(batch)
+
+    def _score(self, batch):
+        start_time = time()
+        instances = [instance for request in batch for instance in request.instances]
+        try:
+            results = list(self.score_fun(instances))
+            if len(results) != len(instances):
+                raise Exception('ERROR: %d results for %d instances' % (len(results), len(instances)))
+        except Exception as e:
+            if len(batch) > 1:
+                # isolate the failing request: score each request on its own
+                for request in batch:
+                    self._score([request])
+                return
+            batch[0].error = e
+            results = []
+        self.n_batches += 1
+        self.n_batched_instances += len(instances)
+        end_time = time()
+        offset = 0
+        for request in batch:
+            if request.error is None:
+                request.results = results[offset:offset + len(request.instances)]
+            offset += len(request.instances)
+            request.batch_size = len(instances)
+            request.start_time, request.end_time = start_time, end_time
+            request.done.set()
+
+    def close(self):
+        """Score the queued requests and stop the batching thread."""
+
+        self._queue.put(None)
+        self._thread.join()
+
+
+class LatencyStats(object):
+
+    """Latency statistics of the most recent requests."""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.n_requests = self.n_instances = self.n_errors = 0
+        self._lock = threading.Lock()
+
+    def add(self, latency, n_instances=0, error=False):
+        with self._lock:
+            self.latencies.append(latency)
+            self.n_requests += 1
+            self.n_instances += n_instances
+            if error:
+                self.n_errors += 1
+
+    def summary(self):
+        """Return a dict with the request counts and the latency percentiles in milliseconds."""
+
+        with self._lock:
+            latencies = np.array(self.latencies) * 1000
+            summary = dict(n_requests=self.n_requests, n_instances=self.n_instances, n_errors=self.n_errors)
+        if len(latencies):
+            summary.update(latency_mean=float(np.mean(latencies)),
+                           latency_p50=float(np.percentile(latencies, 50)),
+                           latency_p90=float(np.percentile(latencies, 90)),
+                           latency_p99=float(np.percentile(latencies, 99)),
+                           latency_max=float(np.max(latencies)))
+        return summary
+
+
+class PredictionService(object):
+
+    """Score the instances of prediction requests in micro-batches.
+
+    Parameters
+    ----------
+    score_fun : callable
+        Function that takes a list of instances and returns the list of pairs (margin, id).
+
+    load_data : callable or None (default None)
+        Function that takes a path and returns the instances in the file, used for the
+        requests that give an 'input_file'.
+
+    max_batch_size, max_wait : see MicroBatcher.
+    """
+
+    def __init__(self, score_fun, load_data=None, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT):
+        self.load_data = load_data
+        self.batcher = MicroBatcher(score_fun, max_batch_size=max_batch_size, max_wait=max_wait)
+        self.stats = LatencyStats()
+
+    def predict(self, payload):
+        """Return the reply to the request payload (a dict)."""
+
+        start_time = time()
+        n_instances = 0
+        try:
+            if payload.get('input_file') is not None:
+                if self.load_data is None:
+                    raise Exception('ERROR: the server does not read input files')
+                instances = list(self.load_data(payload['input_file']))
+            elif payload.get('instances') is not None:
+                instances = payload['instances']
+            else:
+                raise Exception('ERROR: the request has no instances nor input_file')
+            n_instances = len(instances)
+            request = self.batcher.submit(instances)
+        except Exception:
+            self.stats.add(time() - start_time, n_instances, error=True)
+            raise
+        end_time = time()
+        self.stats.add(end_time - start_time, n_instances)
+        margins = [float(margin) for margin, graph_info in request.results]
+        return dict(margins=margins,
+                    predictions=[1 if margin > 0 else -1 for margin in margins],
+                    ids=[graph_info for margin, graph_info in request.results],
+                    timing=dict(total=end_time - start_time,
+                                queue=request.start_time - request.submit_time,
+                                score=request.end_time - request.start_time,
+                                batch_size=request.batch_size))
+
+    def metrics(self):
+        metrics = self.stats.summary()
+        metrics.update(n_batches=self.batcher.n_batches)
+        if self.batcher.n_batches:
+            metrics.update(mean_batch_size=self.batcher.n_batched_instances / float(self.batcher.n_batches))
+        return metrics
+
+    def close(self):
+        self.batcher.close()
+
+
+class _PredictionHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    # persistent connections: a client can send many requests on one connection
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            self._reply(200, self.server.service.metrics())
+        elif self.path == '/health':
+            self._reply(200, dict(status='ok'))
+        else:
+            self._reply(404, dict(error='Unknown path: %s' % self.path))
+
+    def do_POST(self):
+        length = int(self.headers.getheader('content-length', 0))
+        body = self.rfile.read(length)
+        if self.path != '/predict':
+            self._reply(404, dict(error='Unknown path: %s' % self.path))
+            return
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            self._reply(400, dict(error='Malformed request: %s' % e))
+            return
+        try:
+            reply = self.server.service.predict(payload)
+        except Exception as e:
+            logger.warning('Failed request: %s' % e)
+            self._reply(500, dict(error=str(e)))
+            return
+        self._reply(200, reply)
+
+    def _reply(self, code, obj):
+        body = json.dumps(obj)
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # the client address of a Unix socket is not a (host, port) pair
+        return str(self.client_address)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class _HTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class _UnixHTTPServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, host='127.0.0.1', port=0, socket_path=None):
+    """Return a threading HTTP server of service, listening on socket_path if given,
+    otherwise on host:port (port 0 selects a free port)."""
+
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            # stale socket of a previous server
+            os.remove(socket_path)
+        server = _UnixHTTPServer(socket_path, _PredictionHandler)
+    else:
+        server = _HTTPServer((host, port), _PredictionHandler)
+    server.service = service
+    return server
+
+
+def serve(service, host='127.0.0.1', port=0, socket_path=None):
+    """Serve requests until interrupted."""
+
+    server = make_server(service, host=host, port=port, socket_path=socket_path)
+    if socket_path is not None:
+        logger.info('Serving on %s' % socket_path)
+    else:
+        logger.info('Serving on http://%s:%d' % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info('Interrupted')
+    finally:
+        server.server_close()
+        service.close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+        logger.info('Served requests: %s' % json.dumps(service.metrics(), sort_keys=True))
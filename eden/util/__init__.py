@@ -1,24 +1,32 @@
 import numpy as np
-from scipy import io
-from sklearn.externals import joblib
-import requests
 import os
 import sys
-from sklearn.linear_model import SGDClassifier
-from sklearn.grid_search import RandomizedSearchCV
-from sklearn import cross_validation
-from sklearn.metrics import classification_report, roc_auc_score, average_precision_score
-from scipy.stats import randint
-from scipy.stats import uniform
+import shutil
+import tempfile
+import inspect
 from scipy.sparse import vstack
 from itertools import tee
 import random
 from time import time
 import logging.handlers
-from eden import apply_async
+from eden.util.pool import resolve_pool
+from eden.util import instrumentation
+from eden.util.reader import read_lines
+from eden.util.partition import partition_iter
+from eden.util.source import fan_out
+from eden.util.graph_codec import GraphView, encode_graphs
+from eden.util.csr_buffer import CSRBuffer, write_block, block_capacities, buffer_size
+from eden.util.feature_store import FeatureStore
+from eden.util.csr_buffer import nnz_key, estimate_nnz_per_cost, update_nnz_per_cost
 import logging
 logger = logging.getLogger(__name__)
 
+# minimal number of tasks per worker used for dynamic load balancing
+TASKS_PER_WORKER = 4
+
+# scorings reported in the cross validated estimates
+SCORINGS = ['accuracy', 'precision', 'recall', 'f1', 'average_precision', 'roc_auc']
+
 
 def configure_logging(logger, verbosity=0, filename=None):
     """Utility to configure the logging aspects. If filename is None then no info is stored in files.
@@ -83,19 +91,16 @@ def read(uri):
     """
     Abstract read function. EDeN can accept a URL, a file path and a python list.
     In all cases an iteratatable object should be returned.
+
+    URLs and files are streamed line by line; gzip, bzip2 and xz compressed
+    inputs are decompressed on the fly.
     """
     if hasattr(uri, '__iter__'):
         # test if it is iterable: works for lists and generators, but not for
         # strings
         return uri
     else:
-        try:
-                # try if it is a URL and if we can open it
-            f = requests.get(uri).text.split('\n')
-        except ValueError:
-            # assume it is a file object
-            f = open(uri)
-        return f
+        return read_lines(uri)
 
 
 def is_iterable(test):
@@ -128,6 +133,60 @@ def compute_intervals(size=None, n_blocks=None, block_size=None):
     return intervals
 
 
+def estimate_cost(item):
+    """Return an estimate of the work needed to process item.
+
+    Graphs cost their number of nodes plus edges, sequences and (header, sequence)
+    pairs cost their length, strings (e.g. SDF or JSON records) cost their length;
+    any other item has unit cost."""
+
+    if hasattr(item, 'number_of_nodes'):
+        return item.number_of_nodes() + item.number_of_edges()
+    if isinstance(item, tuple) and len(item) == 2 and isinstance(item[1], basestring):
+        return len(item[1])
+    if isinstance(item, basestring):
+        return len(item)
+    return 1
+
+
+def compute_balanced_intervals(costs, n_blocks=None):
+    """Split the sequence of costs into at most n_blocks contiguous intervals of similar total cost."""
+
+    size = len(costs)
+    n_blocks = max(1, min(n_blocks, size))
+    prefix_costs = np.cumsum(costs, dtype=np.float64)
+    total_cost = prefix_costs[-1] if size > 0 else 0
+    boundaries = [0]
+    for k in range(1, n_blocks):
+        # place the boundary where the cumulative cost is closest to the k-th share of the total cost
+        target = total_cost * k / n_blocks
+        i = int(np.searchsorted(prefix_costs, target))
+        if i < size and i > 0 and target - prefix_costs[i - 1] < prefix_costs[i] - target:
+            boundary = i
+        else:
+            boundary = i + 1
+        boundary = min(max(boundary, boundaries[-1] + 1), size)
+        if boundary < size:
+            boundaries.append(boundary)
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries[:-1], boundaries[1:]) if end > start]
+
+
+def compute_schedule(iterable, n_blocks=5, block_size=None, n_jobs=8):
+    """Return the list of (start, end) intervals in which iterable is processed in parallel.
+
+    If block_size is given use blocks with equal number of instances. Otherwise use
+    at least TASKS_PER_WORKER blocks per worker and size them by the estimated cost
+    of their instances, so that the idle workers can pick up the remaining work."""
+
+    size = len(iterable)
+    if block_size is not None:
+        return compute_intervals(size=size, block_size=block_size)
+    n_blocks = max(n_blocks, n_jobs * TASKS_PER_WORKER)
+    costs = [estimate_cost(item) for item in iterable]
+    return compute_balanced_intervals(costs, n_blocks=n_blocks)
+
+
 def serial_pre_process(iterable, pre_processor=None, pre_processor_args=None):
     if pre_processor_args:
         return list(pre_processor(iterable, **pre_processor_args))
@@ -135,30 +194,38 @@ def serial_pre_process(iterable, pre_processor=None, pre_processor_args=None):
         return list(pre_processor(iterable))
 
 
+def serial_pre_process_encode(iterable, pre_processor=None, pre_processor_args=None):
+    graphs = serial_pre_process(iterable, pre_processor=pre_processor, pre_processor_args=pre_processor_args)
+    return encode_graphs(graphs)
+
+
 def multiprocess_pre_process(iterable,
                              pre_processor=None,
                              pre_processor_args=None,
                              n_blocks=5,
                              block_size=None,
-                             n_jobs=8):
+                             n_jobs=8,
+                             pool=None,
+                             as_views=False):
     iterable = list(iterable)
-    import multiprocessing as mp
-    size = len(iterable)
-    intervals = compute_intervals(
-        size=size, n_blocks=n_blocks, block_size=block_size)
-    if n_jobs == -1:
-        pool = mp.Pool()
+    pool = resolve_pool(pool, n_jobs=n_jobs)
+    intervals = compute_schedule(iterable, n_blocks=n_blocks, block_size=block_size, n_jobs=pool.n_jobs)
+    # the pre_processor is transferred once per worker, the blocks carry only the data
+    token = pool.share(pre_processor=pre_processor, pre_processor_args=pre_processor_args)
+    if as_views:
+        # the workers return the compact binary encoding of the graphs
+        serial_fun = serial_pre_process_encode
     else:
-        pool = mp.Pool(n_jobs)
-    results = [apply_async(pool, serial_pre_process,
-                           args=(iterable[start:end], pre_processor, pre_processor_args))
-               for start, end in intervals]
-    output = [p.get() for p in results]
-    pool.close()
-    pool.join()
+        serial_fun = serial_pre_process
+    try:
+        output = pool.map_shared(serial_fun, token, [(iterable[start:end],) for start, end in intervals])
+    finally:
+        pool.release(token)
     return_list = []
     for items in output:
         for item in items:
+            if as_views:
+                item = GraphView(item)
             return_list.append(item)
     return return_list
 
@@ -168,7 +235,16 @@ def mp_pre_process(iterable,
                    pre_processor_args=None,
                    n_blocks=5,
                    block_size=None,
-                   n_jobs=8):
+                   n_jobs=8,
+                   pool=None,
+                   as_views=False):
+    """Apply the pre_processor to the instances in iterable, in parallel if n_jobs is not 1.
+
+    If as_views is True the graphs produced in parallel are returned as GraphView objects
+    over their compact binary encoding: they are not decoded in the calling process and
+    are transferred again as compact bytes when vectorized in parallel.
+    """
+
     if n_jobs == 1:
         return pre_processor(iterable, **pre_processor_args)
     else:
@@ -177,7 +253,9 @@ def mp_pre_process(iterable,
                                         pre_processor_args=pre_processor_args,
                                         n_blocks=n_blocks,
                                         block_size=block_size,
-                                        n_jobs=n_jobs)
+                                        n_jobs=n_jobs,
+                                        pool=pool,
+                                        as_views=as_views)
 
 
 def serial_vectorize(graphs, vectorizer=None, fit_flag=False):
@@ -188,38 +266,220 @@ def serial_vectorize(graphs, vectorizer=None, fit_flag=False):
     return data_matrix
 
 
-def multiprocess_vectorize(graphs, vectorizer=None, fit_flag=False, n_blocks=5, block_size=None, n_jobs=8):
+def serial_vectorize_to_buffer(graphs, slot, vectorizer=None):
+    return write_block(vectorizer.transform(graphs), slot), None
+
+
+def map_to_shared_output(pool, serial_fun, token, blocks, vectorizer=None, calibration_transform=None):
+    """Apply serial_fun(block, slot, **state) to the blocks and assemble the sparse rows written in a shared buffer.
+
+    serial_fun has to return the pair (write_block(data_matrix, slot), block_info). The
+    regions of the buffer are sized from the expected number of nonzeros of each block,
+    which is measured the first time with calibration_transform on a few instances.
+    Return the csr_matrix and the list of block_info, or None if there is no space for the
+    buffer or no block: in that case the caller collects the blocks in memory.
+    """
+
+    if len(blocks) == 0:
+        return None
+    costs = [[estimate_cost(item) for item in block] for block in blocks]
+    block_costs = [sum(block_cost) for block_cost in costs]
+    key = nnz_key(vectorizer, blocks[0][0])
+    nnz_per_cost = estimate_nnz_per_cost(key, blocks[0], costs[0], transform=calibration_transform)
+    block_rows = [len(block) for block in blocks]
+    block_nnz = block_capacities(block_costs, nnz_per_cost)
+    # workers that write past the end of a full memory backed file system are killed by SIGBUS
+    path = pool.shared_path('csr', size=buffer_size(block_rows, block_nnz, vectorizer.feature_size))
+    if path is None:
+        return None
+    output_buffer = CSRBuffer(path, block_rows=block_rows, block_nnz=block_nnz, n_features=vectorizer.feature_size)
+    try:
+        output = pool.map_shared(serial_fun, token,
+                                 [(block, output_buffer.slot(block_id)) for block_id, block in enumerate(blocks)])
+    except Exception:
+        output_buffer.remove()
+        raise
+    for ((nnz, n_rows, overflow), block_info), block_cost in zip(output, block_costs):
+        update_nnz_per_cost(key, nnz, block_cost)
+    data_matrix = output_buffer.assemble([result for result, block_info in output])
+    return data_matrix, [block_info for result, block_info in output]
+
+
+def multiprocess_vectorize(graphs, vectorizer=None, fit_flag=False, n_blocks=5, block_size=None, n_jobs=8,
+                           pool=None, shared_output=True):
     graphs = list(graphs)
     # fitting happens in a serial fashion
     if fit_flag:
         vectorizer.fit(graphs)
-    import multiprocessing as mp
-    size = len(graphs)
-    intervals = compute_intervals(
-        size=size, n_blocks=n_blocks, block_size=block_size)
-    if n_jobs == -1:
-        pool = mp.Pool()
-    else:
-        pool = mp.Pool(n_jobs)
-    results = [apply_async(pool, serial_vectorize, args=(graphs[start:end], vectorizer, False))
-               for start, end in intervals]
-    output = [p.get() for p in results]
-    pool.close()
-    pool.join()
+    pool = resolve_pool(pool, n_jobs=n_jobs)
+    intervals = compute_schedule(graphs, n_blocks=n_blocks, block_size=block_size, n_jobs=pool.n_jobs)
+    blocks = [graphs[start:end] for start, end in intervals]
+    # the vectorizer is transferred once per worker, the blocks carry only the graphs
+    token = pool.share(vectorizer=vectorizer)
+    try:
+        if shared_output and hasattr(vectorizer, 'feature_size'):
+            # the workers write the sparse rows directly in a shared buffer
+            shared = map_to_shared_output(pool, serial_vectorize_to_buffer, token, blocks,
+                                          vectorizer=vectorizer,
+                                          calibration_transform=vectorizer.transform)
+            if shared is not None:
+                data_matrix, info = shared
+                return data_matrix
+        output = pool.map_shared(serial_vectorize, token, [(block,) for block in blocks])
+    finally:
+        pool.release(token)
     data_matrix = vstack(output, format="csr")
     return data_matrix
 
 
-def vectorize(graphs, vectorizer=None, fit_flag=False, n_blocks=5, block_size=None, n_jobs=8):
+def vectorize(graphs, vectorizer=None, fit_flag=False, n_blocks=5, block_size=None, n_jobs=8, pool=None):
+    stage_laps = instrumentation.laps()
     if n_jobs == 1:
-        return serial_vectorize(graphs, vectorizer=vectorizer, fit_flag=fit_flag)
+        data_matrix = serial_vectorize(graphs, vectorizer=vectorizer, fit_flag=fit_flag)
     else:
-        return multiprocess_vectorize(graphs,
-                                      vectorizer=vectorizer,
-                                      fit_flag=fit_flag,
-                                      n_blocks=n_blocks,
-                                      block_size=block_size,
-                                      n_jobs=n_jobs)
+        data_matrix = multiprocess_vectorize(graphs,
+                                             vectorizer=vectorizer,
+                                             fit_flag=fit_flag,
+                                             n_blocks=n_blocks,
+                                             block_size=block_size,
+                                             n_jobs=n_jobs,
+                                             pool=pool)
+    stage_laps.lap('vectorize', instances=data_matrix.shape[0], nnz=data_matrix.nnz)
+    return data_matrix
+
+
+def serial_pre_process_vectorize(iterable, pre_processor=None, pre_processor_args=None, vectorizer=None,
+                                 key=None):
+    """Convert raw instances to graphs and graphs to a sparse data matrix in a single pass.
+
+    If key is not None return also the list of the values of the graph attribute key."""
+
+    graphs = serial_pre_process(iterable, pre_processor=pre_processor, pre_processor_args=pre_processor_args)
+    if len(graphs) == 0:
+        # the pre_processor can discard all the instances of a block
+        data_matrix = None
+    else:
+        data_matrix = vectorizer.transform(graphs)
+    if key is None:
+        return data_matrix
+    else:
+        return data_matrix, [graph.graph.get(key, 'N/A') for graph in graphs]
+
+
+def serial_pre_process_vectorize_to_buffer(iterable, slot, pre_processor=None, pre_processor_args=None,
+                                           vectorizer=None, key=None):
+    result = serial_pre_process_vectorize(iterable,
+                                          pre_processor=pre_processor,
+                                          pre_processor_args=pre_processor_args,
+                                          vectorizer=vectorizer,
+                                          key=key)
+    if key is None:
+        data_matrix, block_info = result, None
+    else:
+        data_matrix, block_info = result
+    return write_block(data_matrix, slot), block_info
+
+
+def multiprocess_pre_process_vectorize(iterable,
+                                       pre_processor=None,
+                                       pre_processor_args=None,
+                                       vectorizer=None,
+                                       key=None,
+                                       n_blocks=5,
+                                       block_size=None,
+                                       n_jobs=8,
+                                       pool=None,
+                                       shared_output=True):
+    iterable = list(iterable)
+    pool = resolve_pool(pool, n_jobs=n_jobs)
+    intervals = compute_schedule(iterable, n_blocks=n_blocks, block_size=block_size, n_jobs=pool.n_jobs)
+    blocks = [iterable[start:end] for start, end in intervals]
+    # each worker receives raw instances and returns only the sparse rows:
+    # graphs never cross the process boundary
+    token = pool.share(pre_processor=pre_processor, pre_processor_args=pre_processor_args,
+                       vectorizer=vectorizer, key=key)
+    try:
+        if shared_output and hasattr(vectorizer, 'feature_size'):
+            # the workers write the sparse rows directly in a shared buffer
+            def calibration_transform(items):
+                return serial_pre_process_vectorize(items,
+                                                    pre_processor=pre_processor,
+                                                    pre_processor_args=pre_processor_args,
+                                                    vectorizer=vectorizer)
+            shared = map_to_shared_output(pool, serial_pre_process_vectorize_to_buffer, token, blocks,
+                                          vectorizer=vectorizer,
+                                          calibration_transform=calibration_transform)
+            if shared is not None:
+                data_matrix, output = shared
+                if data_matrix.shape[0] == 0:
+                    raise Exception('ERROR: something went wrong, no graphs were produced by the pre_processor.')
+                if key is None:
+                    return data_matrix
+                else:
+                    return data_matrix, [item for block_info in output for item in block_info]
+        output = pool.map_shared(serial_pre_process_vectorize, token, [(block,) for block in blocks])
+    finally:
+        pool.release(token)
+    if key is None:
+        data_matrices, info = output, None
+    else:
+        data_matrices = [block_matrix for block_matrix, block_info in output]
+        info = [item for block_matrix, block_info in output for item in block_info]
+    data_matrices = [block_matrix for block_matrix in data_matrices if block_matrix is not None]
+    if len(data_matrices) == 0:
+        raise Exception('ERROR: something went wrong, no graphs were produced by the pre_processor.')
+    data_matrix = vstack(data_matrices, format="csr")
+    if key is None:
+        return data_matrix
+    else:
+        return data_matrix, info
+
+
+def pre_process_vectorize(iterable,
+                          pre_processor=None,
+                          pre_processor_args=None,
+                          vectorizer=None,
+                          key=None,
+                          n_blocks=5,
+                          block_size=None,
+                          n_jobs=8,
+                          pool=None):
+    """Fused pre-processing and vectorization stage.
+
+    Equivalent to vectorize(mp_pre_process(iterable, ...), ...) without fitting
+    the vectorizer, but in the parallel case the graphs are created, vectorized
+    and discarded inside the workers, so that only the raw instances and the
+    resulting sparse rows are transferred between processes.
+    If key is not None return the pair (data_matrix, list of graph attribute values).
+    """
+
+    if pre_processor_args is None:
+        pre_processor_args = dict()
+    stage_laps = instrumentation.laps()
+    if n_jobs == 1:
+        if key is None:
+            output = vectorizer.transform(pre_processor(iterable, **pre_processor_args))
+        else:
+            output = serial_pre_process_vectorize(iterable,
+                                                  pre_processor=pre_processor,
+                                                  pre_processor_args=pre_processor_args,
+                                                  vectorizer=vectorizer,
+                                                  key=key)
+            if output[0] is None:
+                raise Exception('ERROR: something went wrong, no graphs were produced by the pre_processor.')
+    else:
+        output = multiprocess_pre_process_vectorize(iterable,
+                                                    pre_processor=pre_processor,
+                                                    pre_processor_args=pre_processor_args,
+                                                    vectorizer=vectorizer,
+                                                    key=key,
+                                                    n_blocks=n_blocks,
+                                                    block_size=block_size,
+                                                    n_jobs=n_jobs,
+                                                    pool=pool)
+    data_matrix = output if key is None else output[0]
+    stage_laps.lap('pre_process_vectorize', instances=data_matrix.shape[0], nnz=data_matrix.nnz)
+    return output
 
 
 def describe(data_matrix):
@@ -253,13 +513,15 @@ def selection_iterator(iterable, ids):
                 break
 
 
-def random_bipartition_iter(iterable, relative_size=.5, random_state=1):
-    size_iterable, iterable1, iterable2 = tee(iterable, 3)
-    size = iterator_size(size_iterable)
-    part1_ids, part2_ids = random_bipartition(
-        size, relative_size=relative_size, random_state=random_state)
-    part1_iterable = selection_iterator(iterable1, part1_ids)
-    part2_iterable = selection_iterator(iterable2, part2_ids)
+def random_bipartition_iter(iterable, relative_size=.5, random_state=1, key=None, stratify=None, spool_dir=None):
+    """Split iterable in two parts reading it only once.
+
+    Items are assigned with a seeded hash of their index (or of key(item)), or
+    following a per stratum schedule if stratify is given; see partition_iter."""
+
+    part1_iterable, part2_iterable = partition_iter(iterable, fractions=[relative_size, 1 - relative_size],
+                                                    key=key, stratify=stratify, random_state=random_state,
+                                                    spool_dir=spool_dir)
     return part1_iterable, part2_iterable
 
 
@@ -268,7 +530,7 @@ def join_pre_processes(iterable, pre_processes=None, weights=None):
     assert(len(weights) == len(pre_processes)), 'Different lengths'
     # NOTE: we have to duplicate the sequences iterator if we want to use
     # different modifiers in parallel
-    iterables = tee(iterable, len(pre_processes))
+    iterables = fan_out(iterable, n_copies=len(pre_processes))
     for pre_process_item, iterable_item in zip(pre_processes, iterables):
         graphs_list.append(pre_process_item(iterable_item))
     return (graphs_list, weights)
@@ -290,6 +552,291 @@ def make_data_matrix(positive_data_matrix=None, negative_data_matrix=None, targe
     return data_matrix, y
 
 
+def _score(scoring, y, predictions, margins):
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+    from sklearn.metrics import roc_auc_score, average_precision_score
+    try:
+        if scoring == 'accuracy':
+            return accuracy_score(y, predictions)
+        if scoring == 'precision':
+            return precision_score(y, predictions)
+        if scoring == 'recall':
+            return recall_score(y, predictions)
+        if scoring == 'f1':
+            return f1_score(y, predictions)
+        if scoring == 'average_precision':
+            return average_precision_score(y, margins)
+        if scoring == 'roc_auc':
+            return roc_auc_score(y, margins)
+    except ValueError:
+        # e.g. a single class in the test fold
+        return np.nan
+    raise Exception('ERROR: unknown scoring: %s' % scoring)
+
+
+def _fit_and_score(estimator, params, X, y, train, test, scorings):
+    from sklearn.base import clone
+    estimator = clone(estimator)
+    estimator.set_params(**params)
+    estimator.fit(X[train], y[train])
+    return _test_scores(estimator, X, y, test, scorings)
+
+
+def _test_scores(estimator, X, y, test, scorings):
+    predictions = estimator.predict(X[test])
+    if hasattr(estimator, 'decision_function'):
+        margins = estimator.decision_function(X[test])
+    else:
+        margins = estimator.predict_proba(X[test])[:, 1]
+    scores = dict()
+    for scoring in scorings:
+        if scoring in SCORINGS:
+            scores[scoring] = _score(scoring, y[test], predictions, margins)
+        else:
+            # any other scorer known to scikit-learn
+            from sklearn.metrics import get_scorer
+            scores[scoring] = get_scorer(scoring)(estimator, X[test], y[test])
+    return scores
+
+
+def _fit_and_score_or_error(estimator, params, X, y, train, test, scorings):
+    try:
+        return _fit_and_score(estimator, params, X, y, train, test, scorings)
+    except Exception as e:
+        return e
+
+
+def multi_metric_cross_val_scores(estimator, X, y, cv=10, scorings=SCORINGS, n_jobs=1, params_list=None,
+                                  catch_errors=False):
+    """Return the cross validated scores for all the scorings computing a single fit per fold.
+
+    If params_list is given, evaluate the estimator with each parameter setting and
+    return a list of results, one per setting; all the (setting, fold) pairs are
+    evaluated in parallel, and large arrays are memory mapped once and shared by the
+    workers. Each result is a dict mapping each scoring to the array of the scores in
+    the folds. If catch_errors is True, the result of a setting that fails in any fold
+    is the exception that was raised, instead of being raised.
+    """
+
+    from sklearn import cross_validation
+    from sklearn.externals import joblib
+    y = np.asarray(y)
+    folds = list(cross_validation.StratifiedKFold(y, n_folds=cv))
+    if params_list is None:
+        settings = [dict()]
+    else:
+        settings = params_list
+    if catch_errors:
+        fit_and_score = _fit_and_score_or_error
+    else:
+        fit_and_score = _fit_and_score
+    with instrumentation.timer('cross_validation', fits=len(settings) * len(folds)):
+        fold_scores = joblib.Parallel(n_jobs=n_jobs)(
+            joblib.delayed(fit_and_score)(estimator, params, X, y, train, test, scorings)
+            for params in settings for train, test in folds)
+    results = []
+    for i in range(len(settings)):
+        setting_scores = fold_scores[i * len(folds):(i + 1) * len(folds)]
+        errors = [scores for scores in setting_scores if isinstance(scores, Exception)]
+        if errors:
+            results.append(errors[0])
+        else:
+            results.append(dict((scoring, np.array([scores[scoring] for scores in setting_scores]))
+                                for scoring in scorings))
+    if params_list is None:
+        return results[0]
+    return results
+
+
+def supports_warm_start(estimator):
+    """Return True if the fit method of estimator accepts initial coefficients (coef_init)."""
+
+    try:
+        return 'coef_init' in inspect.getargspec(estimator.fit).args
+    except TypeError:
+        return False
+
+
+def _warm_start_group(params):
+    # settings that differ only in their numeric parameters can start from each other's coefficients
+    return tuple(sorted((key, repr(value)) for key, value in params.items()
+                        if isinstance(value, bool) or not isinstance(value, (int, long, float))))
+
+
+def warm_start_order(params_list):
+    """Return the indices of params_list ordered so that similar settings are adjacent.
+
+    Settings are grouped by their non numeric parameters and, within a group, sorted by
+    decreasing numeric parameters (e.g. from the strongest to the weakest regularization)."""
+
+    def sort_key(i):
+        params = params_list[i]
+        numeric = tuple(-value for key, value in sorted(params.items())
+                        if isinstance(value, (int, long, float)) and not isinstance(value, bool))
+        return _warm_start_group(params), numeric
+    return sorted(range(len(params_list)), key=sort_key)
+
+
+def _warm_fit_and_score_path(estimator, params_list, X, y, train, test, scorings, state):
+    # fit the settings one after the other on a fold, each one starting from the coefficients
+    # last reached in the same group; state maps groups to (coef, intercept)
+    from sklearn.base import clone
+    state = dict(state)
+    results = []
+    for params in params_list:
+        group = _warm_start_group(params)
+        fold_estimator = clone(estimator)
+        fold_estimator.set_params(**params)
+        try:
+            if group in state:
+                # the fit updates the initial coefficients in place: they must not be
+                # the read-only memory mapped arrays received from the parent
+                coef, intercept = [np.array(array) for array in state[group]]
+                fold_estimator.fit(X[train], y[train], coef_init=coef, intercept_init=intercept)
+            else:
+                fold_estimator.fit(X[train], y[train])
+            results.append(_test_scores(fold_estimator, X, y, test, scorings))
+            state[group] = (fold_estimator.coef_, fold_estimator.intercept_)
+        except Exception as e:
+            results.append(e)
+    return results, state
+
+
+class WarmStartCV(object):
+
+    """Cross validation of estimator settings with warm started fits.
+
+    The folds are fit in parallel. Within each fold the settings are fit in
+    warm_start_order, each starting from the coefficients of the previous similar
+    setting. The coefficients reached in each fold are kept across calls, so that
+    later batches of settings on the same data start from them; the final fit on
+    all the data starts from their average over the folds.
+
+    Parameters
+    ----------
+    X, y : the data matrix and the targets.
+
+    cv : int (default 10)
+        Number of stratified folds.
+
+    n_jobs : int (default 1)
+        Number of folds fit in parallel.
+    """
+
+    def __init__(self, X, y, cv=10, n_jobs=1):
+        from sklearn import cross_validation
+        self.X = X
+        self.y = np.asarray(y)
+        self.folds = list(cross_validation.StratifiedKFold(self.y, n_folds=cv))
+        self.n_jobs = n_jobs
+        self.fold_states = [dict() for fold in self.folds]
+
+    def cross_val_scores(self, estimator, params_list, scorings=SCORINGS):
+        """Return the results of each setting in params_list as in multi_metric_cross_val_scores
+        with catch_errors=True."""
+
+        from sklearn.externals import joblib
+        order = warm_start_order(params_list)
+        ordered_params_list = [params_list[i] for i in order]
+        outputs = joblib.Parallel(n_jobs=self.n_jobs)(
+            joblib.delayed(_warm_fit_and_score_path)(estimator, ordered_params_list, self.X, self.y,
+                                                     train, test, scorings, state)
+            for (train, test), state in zip(self.folds, self.fold_states))
+        self.fold_states = [state for fold_results, state in outputs]
+        results = [None] * len(params_list)
+        for position, i in enumerate(order):
+            setting_scores = [fold_results[position] for fold_results, state in outputs]
+            errors = [scores for scores in setting_scores if isinstance(scores, Exception)]
+            if errors:
+                results[i] = errors[0]
+            else:
+                results[i] = dict((scoring, np.array([scores[scoring] for scores in setting_scores]))
+                                  for scoring in scorings)
+        return results
+
+    def fit(self, estimator, params):
+        """Fit estimator (with parameters params) on all the data, starting from the average of the
+        coefficients reached in the folds for the group of params."""
+
+        group = _warm_start_group(params)
+        states = [state[group] for state in self.fold_states if group in state]
+        if len(states) == 0:
+            return estimator.fit(self.X, self.y)
+        coef = np.mean([state[0] for state in states], axis=0)
+        intercept = np.mean([state[1] for state in states], axis=0)
+        return estimator.fit(self.X, self.y, coef_init=coef, intercept_init=intercept)
+
+
+def report_scores(scores, log=logger.debug):
+    """Log mean and standard deviation of the results of multi_metric_cross_val_scores."""
+
+    for scoring in SCORINGS:
+        if scoring in scores:
+            log('%20s: %.3f +- %.3f' % (scoring, np.nanmean(scores[scoring]), np.nanstd(scores[scoring])))
+
+
+def _stratified_subsample(y, fraction, min_size=10, random_state=1):
+    # return the indices of a random stratified subset of the rows; smaller fractions give
+    # subsets of larger ones since they are prefixes of the same permutations
+    rnd = np.random.RandomState(random_state)
+    rows = []
+    for target in np.unique(y):
+        class_rows = np.flatnonzero(y == target)
+        size = min(len(class_rows), max(min_size, int(np.ceil(fraction * len(class_rows)))))
+        rows.append(rnd.permutation(class_rows)[:size])
+    return np.sort(np.concatenate(rows))
+
+
+def successive_halving_search(estimator, param_dist, X, y,
+                              n_candidates=40,
+                              factor=3,
+                              cv=10,
+                              min_cv=3,
+                              scoring='roc_auc',
+                              n_jobs=-1,
+                              random_state=1):
+    """Search the parameters of the estimator with successive halving.
+
+    n_candidates settings are sampled from param_dist. At each rung the surviving
+    settings are evaluated on a stratified subsample of the rows and only the best
+    1/factor of them are promoted: early rungs use a fraction factor**-k of the rows
+    and min_cv folds, the last rung uses all the rows and cv folds. All the scorings
+    of the last rung come from the same cross validation pass.
+
+    Return the best estimator refit on all the data, its parameters and its scores.
+    """
+
+    from sklearn.base import clone
+    from sklearn.grid_search import ParameterSampler
+    y = np.asarray(y)
+    candidates = list(ParameterSampler(param_dist, n_iter=n_candidates, random_state=random_state))
+    n_rungs = int(np.floor(np.log(len(candidates)) / np.log(factor) + 1e-9)) + 1
+    for rung in range(n_rungs):
+        last_rung = rung == n_rungs - 1
+        fraction = float(factor) ** (rung - n_rungs + 1)
+        rung_cv = cv if last_rung else min(min_cv, cv)
+        rows = _stratified_subsample(y, fraction, min_size=2 * rung_cv, random_state=random_state)
+        scorings = SCORINGS if last_rung else [scoring]
+        results = multi_metric_cross_val_scores(estimator, X[rows], y[rows],
+                                                cv=rung_cv,
+                                                scorings=scorings,
+                                                n_jobs=n_jobs,
+                                                params_list=candidates)
+        mean_scores = [np.nanmean(result[scoring]) for result in results]
+        ranking = np.argsort([-score for score in mean_scores], kind='mergesort')
+        logger.debug('Rung %d/%d: %d settings on %d instances with %d folds, best %s: %.3f' %
+                     (rung + 1, n_rungs, len(candidates), len(rows), rung_cv, scoring, mean_scores[ranking[0]]))
+        if last_rung:
+            break
+        n_survivors = max(1, len(candidates) // factor)
+        candidates = [candidates[i] for i in ranking[:n_survivors]]
+    best = ranking[0]
+    best_estimator = clone(estimator)
+    best_estimator.set_params(**candidates[best])
+    best_estimator.fit(X, y)
+    return best_estimator, candidates[best], results[best]
+
+
 def fit_estimator(estimator,
                   positive_data_matrix=None,
                   negative_data_matrix=None,
@@ -297,7 +844,17 @@ def fit_estimator(estimator,
                   cv=10,
                   n_jobs=-1,
                   n_iter_search=40,
-                  random_state=1):
+                  random_state=1,
+                  search='random',
+                  halving_factor=3):
+    """Optimize the hyperparameters of the estimator.
+
+    search can be 'random' for a randomized search where all the n_iter_search
+    settings are evaluated with cv folds on all data, or 'halving' for a successive
+    halving search where n_iter_search settings are first evaluated on small subsamples
+    and only the best 1/halving_factor of them are promoted to larger ones."""
+
+    from scipy.stats import randint, uniform
     # hyperparameter optimization
     param_dist = {"n_iter": randint(5, 100),
                   "power_t": uniform(0.1),
@@ -306,52 +863,67 @@ def fit_estimator(estimator,
                   "penalty": ["l1", "l2", "elasticnet"],
                   "learning_rate": ["invscaling", "constant", "optimal"]}
     scoring = 'roc_auc'
-    n_iter_search = n_iter_search
-    random_search = RandomizedSearchCV(estimator,
-                                       param_distributions=param_dist,
-                                       n_iter=n_iter_search,
-                                       cv=cv,
-                                       scoring=scoring,
-                                       n_jobs=n_jobs,
-                                       random_state=random_state,
-                                       refit=True)
     X, y = make_data_matrix(positive_data_matrix=positive_data_matrix,
                             negative_data_matrix=negative_data_matrix,
                             target=target)
-    random_search.fit(X, y)
+    if search == 'halving':
+        best_estimator, best_params, scores = successive_halving_search(estimator, param_dist, X, y,
+                                                                        n_candidates=n_iter_search,
+                                                                        factor=halving_factor,
+                                                                        cv=cv,
+                                                                        scoring=scoring,
+                                                                        n_jobs=n_jobs,
+                                                                        random_state=random_state)
+    elif search == 'random':
+        from sklearn.grid_search import RandomizedSearchCV
+        random_search = RandomizedSearchCV(estimator,
+                                           param_distributions=param_dist,
+                                           n_iter=n_iter_search,
+                                           cv=cv,
+                                           scoring=scoring,
+                                           n_jobs=n_jobs,
+                                           random_state=random_state,
+                                           refit=True)
+        random_search.fit(X, y)
+        best_estimator = random_search.best_estimator_
+        # assess the generalization capacity of the model via a single multi metric cross validation
+        scores = multi_metric_cross_val_scores(best_estimator, X, y, cv=cv, n_jobs=n_jobs)
+    else:
+        raise Exception('ERROR: unknown search: %s' % search)
 
     logger.debug('\nClassifier:')
-    logger.debug('%s' % random_search.best_estimator_)
+    logger.debug('%s' % best_estimator)
     logger.debug('\nPredictive performance:')
-    # assess the generalization capacity of the model via a 10-fold cross
-    # validation
-    for scoring in ['accuracy', 'precision', 'recall', 'f1', 'average_precision', 'roc_auc']:
-        scores = cross_validation.cross_val_score(random_search.best_estimator_, X, y, cv=cv,
-                                                  scoring=scoring, n_jobs=n_jobs)
-        logger.debug('%20s: %.3f +- %.3f' %
-                     (scoring, np.mean(scores), np.std(scores)))
-
-    return random_search.best_estimator_
+    report_scores(scores)
+    return best_estimator
 
 
 def fit(iterable_pos, iterable_neg=None,
         vectorizer=None,
-        estimator=SGDClassifier(
-            average=True, class_weight='balanced', shuffle=True),
+        estimator=None,
         fit_flag=False,
         n_jobs=-1,
         cv=10,
         n_iter_search=1,
         random_state=1,
         n_blocks=5,
-        block_size=None):
+        block_size=None,
+        pool=None,
+        search='random'):
+    """Fit the estimator on the vectorized positive and negative instances; if estimator is
+    None a new SGDClassifier(average=True, class_weight='balanced', shuffle=True) is used."""
+
+    if estimator is None:
+        from sklearn.linear_model import SGDClassifier
+        estimator = SGDClassifier(average=True, class_weight='balanced', shuffle=True)
     start = time()
     positive_data_matrix = vectorize(iterable_pos,
                                      vectorizer=vectorizer,
                                      fit_flag=fit_flag,
                                      n_blocks=n_blocks,
                                      block_size=block_size,
-                                     n_jobs=n_jobs)
+                                     n_jobs=n_jobs,
+                                     pool=pool)
     logger.debug('Positive data: %s' % describe(positive_data_matrix))
     if iterable_neg:
         negative_data_matrix = vectorize(iterable_neg,
@@ -359,7 +931,8 @@ def fit(iterable_pos, iterable_neg=None,
                                          fit_flag=False,
                                          n_blocks=n_blocks,
                                          block_size=block_size,
-                                         n_jobs=n_jobs)
+                                         n_jobs=n_jobs,
+                                         pool=pool)
         logger.debug('Negative data: %s' % describe(negative_data_matrix))
     else:
         negative_data_matrix = None
@@ -375,7 +948,131 @@ def fit(iterable_pos, iterable_neg=None,
                                   cv=cv,
                                   n_jobs=n_jobs,
                                   n_iter_search=n_iter_search,
-                                  random_state=random_state)
+                                  random_state=random_state,
+                                  search=search)
+    logger.debug('Elapsed time: %.1f secs' % (time() - start))
+    return estimator
+
+
+def interleave_classes(iterable_pos, iterable_neg=None):
+    """Yield (instance, target) pairs alternating positive (1) and negative (-1) instances.
+
+    When one of the iterables is exhausted the remaining instances of the other follow."""
+
+    iterators = [(iter(iterable_pos), 1)]
+    if iterable_neg is not None:
+        iterators.append((iter(iterable_neg), -1))
+    while iterators:
+        for iterator, target in list(iterators):
+            try:
+                yield next(iterator), target
+            except StopIteration:
+                iterators.remove((iterator, target))
+
+
+def buffered_shuffle(iterable, buffer_size=1000, random_state=1):
+    """Yield the items of iterable in random order, holding at most buffer_size items in memory."""
+
+    rnd = random.Random(random_state)
+    buffer = []
+    for item in iterable:
+        if len(buffer) < buffer_size:
+            buffer.append(item)
+        else:
+            i = rnd.randrange(buffer_size)
+            yield buffer[i]
+            buffer[i] = item
+    rnd.shuffle(buffer)
+    for item in buffer:
+        yield item
+
+
+def chunk_iterator(iterable, chunk_size=1000):
+    """Yield lists of at most chunk_size consecutive items of iterable."""
+
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def fit_online(iterable_pos, iterable_neg=None,
+               vectorizer=None,
+               estimator=None,
+               chunk_size=1000,
+               n_epochs=1,
+               buffer_size=None,
+               feature_store_path=None,
+               random_state=1,
+               n_jobs=-1,
+               n_blocks=5,
+               block_size=None,
+               pool=None):
+    """Fit an estimator that supports partial_fit streaming the instances in chunks.
+
+    Positive and negative graphs are interleaved, shuffled within a buffer of
+    buffer_size instances (default 10 * chunk_size) and vectorized chunk_size at a
+    time, so that only one chunk of graphs and one data matrix are in memory at any
+    time. Suitable estimators are for example SGDClassifier, PassiveAggressiveClassifier
+    and MultinomialNB; if estimator is None a new SGDClassifier is used.
+
+    If n_epochs > 1 the data matrices of the first epoch are written to the feature
+    store at feature_store_path (a temporary one if None) and the following epochs
+    replay them from disk in a different random order, without vectorizing again.
+    """
+
+    if estimator is None:
+        # NOTE: partial_fit accumulates, a shared default instance would carry over between calls
+        from sklearn.linear_model import SGDClassifier
+        estimator = SGDClassifier(average=True)
+    if not hasattr(estimator, 'partial_fit'):
+        raise Exception('ERROR: the estimator does not support partial_fit: %s' % estimator)
+    start = time()
+    if buffer_size is None:
+        buffer_size = 10 * chunk_size
+    classes = np.array([-1, 1])
+    store = None
+    temporary_dir = None
+    if n_epochs > 1:
+        if feature_store_path is None:
+            temporary_dir = tempfile.mkdtemp(prefix='eden_fit_online_')
+            feature_store_path = os.path.join(temporary_dir, 'features')
+        store = FeatureStore(feature_store_path, overwrite=True)
+    try:
+        instances = buffered_shuffle(interleave_classes(iterable_pos, iterable_neg),
+                                     buffer_size=buffer_size,
+                                     random_state=random_state)
+        n_instances = 0
+        for chunk in chunk_iterator(instances, chunk_size=chunk_size):
+            graphs = [graph for graph, target in chunk]
+            y = np.array([target for graph, target in chunk])
+            data_matrix = vectorize(graphs,
+                                    vectorizer=vectorizer,
+                                    n_blocks=n_blocks,
+                                    block_size=block_size,
+                                    n_jobs=n_jobs,
+                                    pool=pool)
+            estimator.partial_fit(data_matrix, y, classes=classes)
+            if store is not None:
+                store.append(data_matrix, target=y)
+            n_instances += len(chunk)
+            logger.debug('Epoch 1/%d: %d instances (%.1f secs)' % (n_epochs, n_instances, time() - start))
+        rnd = np.random.RandomState(random_state)
+        for epoch in range(1, n_epochs):
+            # replay the stored chunks in a new random order
+            for shard_id in rnd.permutation(store.n_shards):
+                data_matrix = store.read_shard(shard_id)
+                y = store.shard_target(shard_id)
+                rows = rnd.permutation(data_matrix.shape[0])
+                estimator.partial_fit(data_matrix[rows], y[rows], classes=classes)
+            logger.debug('Epoch %d/%d (%.1f secs)' % (epoch + 1, n_epochs, time() - start))
+    finally:
+        if temporary_dir is not None:
+            shutil.rmtree(temporary_dir, ignore_errors=True)
     logger.debug('Elapsed time: %.1f secs' % (time() - start))
     return estimator
 
@@ -385,6 +1082,7 @@ def estimate_model(positive_data_matrix=None,
                    target=None,
                    estimator=None,
                    n_jobs=4):
+    from sklearn.metrics import classification_report, roc_auc_score, average_precision_score
     X, y = make_data_matrix(positive_data_matrix=positive_data_matrix,
                             negative_data_matrix=negative_data_matrix,
                             target=target)
@@ -401,10 +1099,7 @@ def estimate_model(positive_data_matrix=None,
     logger.info('ROC: %.3f' % roc)
 
     logger.info('Cross-validated estimate')
-    for scoring in ['accuracy', 'precision', 'recall', 'f1', 'average_precision', 'roc_auc']:
-        scores = cross_validation.cross_val_score(estimator, X, y, cv=5,
-                                                  scoring=scoring, n_jobs=n_jobs)
-        logger.info('%20s: %.3f +- %.3f' % (scoring, np.mean(scores), np.std(scores)))
+    report_scores(multi_metric_cross_val_scores(estimator, X, y, cv=5, n_jobs=n_jobs), log=logger.info)
 
     return roc, apr
 
@@ -415,17 +1110,20 @@ def estimate(iterable_pos=None,
              vectorizer=None,
              n_blocks=5,
              block_size=None,
-             n_jobs=4):
+             n_jobs=4,
+             pool=None):
     positive_data_matrix = vectorize(iterable_pos,
                                      vectorizer=vectorizer,
                                      n_blocks=n_blocks,
                                      block_size=block_size,
-                                     n_jobs=n_jobs)
+                                     n_jobs=n_jobs,
+                                     pool=pool)
     negative_data_matrix = vectorize(iterable_neg,
                                      vectorizer=vectorizer,
                                      n_blocks=n_blocks,
                                      block_size=block_size,
-                                     n_jobs=n_jobs)
+                                     n_jobs=n_jobs,
+                                     pool=pool)
     return estimate_model(positive_data_matrix=positive_data_matrix,
                           negative_data_matrix=negative_data_matrix,
                           estimator=estimator,
@@ -438,12 +1136,14 @@ def predict(iterable=None,
             mode='decision_function',
             n_blocks=5,
             block_size=None,
-            n_jobs=4):
+            n_jobs=4,
+            pool=None):
     data_matrix = vectorize(iterable,
                             vectorizer=vectorizer,
                             n_blocks=n_blocks,
                             block_size=block_size,
-                            n_jobs=n_jobs)
+                            n_jobs=n_jobs,
+                            pool=pool)
     if mode == 'decision_function':
         out = estimator.decision_function(data_matrix)
     elif mode == 'predict_proba':
@@ -468,19 +1168,24 @@ def load_target(name):
     return np.array(target).astype(int)
 
 
-def store_matrix(matrix='', output_dir_path='', out_file_name='', output_format=''):
+def store_matrix(matrix='', output_dir_path='', out_file_name='', output_format='', ids=None, target=None):
     if not os.path.exists(output_dir_path):
         os.mkdir(output_dir_path)
     full_out_file_name = os.path.join(output_dir_path, out_file_name)
-    if output_format == "MatrixMarket":
+    if output_format == "feature_store":
+        # ids and target are stored together with the rows
+        FeatureStore(full_out_file_name, overwrite=True).append(matrix, ids=ids, target=target)
+    elif output_format == "MatrixMarket":
         if len(matrix.shape) == 1:
             raise Exception(
                 "'MatrixMarket' format supports only 2D dimensional array and not vectors")
         else:
+            from scipy import io
             io.mmwrite(full_out_file_name, matrix, precision=None)
     elif output_format == "numpy":
         np.save(full_out_file_name, matrix)
     elif output_format == "joblib":
+        from sklearn.externals import joblib
         joblib.dump(matrix, full_out_file_name)
     elif output_format == "text":
         with open(full_out_file_name, "w") as f:
@@ -497,11 +1202,13 @@ def dump(obj, output_dir_path='', out_file_name=''):
     if not os.path.exists(output_dir_path):
         os.mkdir(output_dir_path)
     full_out_file_name = os.path.join(output_dir_path, out_file_name) + ".pkl"
+    from sklearn.externals import joblib
     joblib.dump(obj, full_out_file_name)
 
 
 def load(output_dir_path='', out_file_name=''):
     full_out_file_name = os.path.join(output_dir_path, out_file_name) + ".pkl"
+    from sklearn.externals import joblib
     obj = joblib.load(full_out_file_name)
     return obj
 
@@ -520,8 +1227,11 @@ def save_output(text=None, output_dir_path=None, out_file_name=None):
     if not os.path.exists(output_dir_path):
         os.mkdir(output_dir_path)
     full_out_file_name = os.path.join(output_dir_path, out_file_name)
+    # text can be any iterable: lines are written as they are produced
+    n_lines = 0
     with open(full_out_file_name, 'w') as f:
         for line in text:
             f.write("%s\n" % str(line).strip())
+            n_lines += 1
     logger.info("Written file: %s (%d lines)" %
-                (full_out_file_name, len(text)))
+                (full_out_file_name, n_lines))
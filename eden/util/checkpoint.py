@@ -0,0 +1,143 @@
+"""Snapshots and asynchronous checkpoints of the best model found by a search.
+
+SnapshotTracker keeps private copies of the components of the best model,
+copying a component only when it has changed since the previous snapshot
+(as signalled by a version), so that unchanged components such as the
+pre_processor or the vectorizer are not deep copied at every improvement.
+
+AsyncCheckpointer writes snapshots to disk in a background thread. Saves
+are debounced: a snapshot submitted while a save is running, or less than
+min_interval seconds after the previous save, replaces any pending one, so
+that only the most recent snapshot is written. flush() and close() wait
+until the last submitted snapshot is on disk.
+"""
+
+import copy
+import threading
+from time import time
+import logging
+logger = logging.getLogger(__name__)
+
+# minimal number of seconds between two saves
+MIN_INTERVAL = 10
+
+
+class SnapshotTracker(object):
+
+    """Copy-on-write snapshots of named components."""
+
+    def __init__(self):
+        self.components = dict()
+        self.versions = dict()
+        self.n_copies = 0
+
+    def snapshot(self, name, value, version=None, copy_value=True):
+        """Record value as the current state of the component name.
+
+        If version is not None and equal to the version of the previous snapshot, the
+        previous copy is kept. If copy_value is False, value is recorded as it is: the
+        caller guarantees that it will not be modified afterwards."""
+
+        if version is not None and name in self.versions and self.versions[name] == version:
+            return self.components[name]
+        if copy_value:
+            value = copy.deepcopy(value)
+            self.n_copies += 1
+        self.components[name] = value
+        self.versions[name] = version
+        return value
+
+    def get(self, name, default=None):
+        return self.components.get(name, default)
+
+
+class AsyncCheckpointer(object):
+
+    """Call save_fun(snapshot) in a background thread for the most recent submitted snapshot.
+
+    Parameters
+    ----------
+    save_fun : callable
+        Function that writes a snapshot to disk.
+
+    min_interval : float (default MIN_INTERVAL)
+        Minimal number of seconds between the start of two saves.
+    """
+
+    def __init__(self, save_fun, min_interval=MIN_INTERVAL):
+        self.save_fun = save_fun
+        self.min_interval = min_interval
+        self.n_saves = 0
+        self._pending = None
+        self._has_pending = False
+        self._saving = False
+        self._closed = False
+        self._last_save = None
+        self._error = None
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, snapshot):
+        """Schedule snapshot to be saved, replacing any snapshot that is not yet being saved."""
+
+        with self._condition:
+            if self._closed:
+                raise Exception('ERROR: checkpointer is closed')
+            self._pending = snapshot
+            self._has_pending = True
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._has_pending and not self._closed:
+                    self._condition.wait()
+                if not self._has_pending:
+                    return
+                wait_time = 0
+                if self._last_save is not None and not self._closed:
+                    wait_time = self._last_save + self.min_interval - time()
+                if wait_time > 0:
+                    # debounce: later submissions replace the pending snapshot meanwhile
+                    self._condition.wait(wait_time)
+                    continue
+                snapshot, self._pending, self._has_pending = self._pending, None, False
+                self._saving = True
+                self._last_save = time()
+            try:
+                self.save_fun(snapshot)
+                self.n_saves += 1
+            except Exception as e:
+                logger.warning('Checkpoint failed: %s' % e)
+                self._error = e
+            with self._condition:
+                self._saving = False
+                self._condition.notify_all()
+
+    def flush(self):
+        """Wait until the last submitted snapshot has been saved, saving it now if needed."""
+
+        with self._condition:
+            # saving immediately is allowed once flushing
+            self._last_save = None
+            self._condition.notify_all()
+            while self._has_pending or self._saving:
+                self._condition.wait(1)
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def close(self, flush=True):
+        """Stop the background thread, saving the pending snapshot if flush is True."""
+
+        with self._condition:
+            if not flush:
+                self._pending, self._has_pending = None, False
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
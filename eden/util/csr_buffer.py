@@ -0,0 +1,232 @@
+"""Memory mapped output buffers for sparse matrices computed in parallel.
+
+Each block of instances is assigned a region of three shared files (column
+indices, data and row pointers) sized from an estimate of its number of
+nonzeros. The worker that computes the block writes its rows directly into
+the region and returns only the sizes; the parent compacts the regions in
+place and wraps read-only maps of them in a csr_matrix without copying. When
+the files are in a memory backed file system (e.g. /dev/shm) the compacted
+arrays are copied instead, since the memory of an unlinked tmpfs file stays
+charged to that file system for as long as it is mapped. A block that does
+not fit its region is returned as a regular (pickled) matrix.
+"""
+
+import os
+import numpy as np
+from scipy.sparse import csr_matrix
+import logging
+logger = logging.getLogger(__name__)
+
+# capacity of each block relative to its estimated number of nonzeros
+NNZ_HEADROOM = 1.5
+# minimal capacity of each block
+MIN_BLOCK_NNZ = 1024
+# number of instances vectorized in the calling process to estimate the nonzeros per unit of cost
+N_CALIBRATION_INSTANCES = 3
+
+# observed nonzeros per unit of cost, indexed by nnz_key
+_nnz_per_cost = dict()
+
+
+def nnz_key(vectorizer, item):
+    """Return the key under which the nonzeros per unit of cost are remembered.
+
+    The key depends on the vectorizer parameters and on the kind of instance (e.g.
+    graphs or sequences), since costs are measured in different units."""
+
+    params = vectorizer.__dict__
+    return (type(vectorizer).__name__, type(item).__name__) + \
+        tuple(sorted((name, value) for name, value in params.items()
+                     if isinstance(value, (bool, int, long, float, basestring))))
+
+
+def estimate_nnz_per_cost(key, items, costs, transform=None):
+    """Return the expected number of nonzeros per unit of cost.
+
+    The estimate is remembered under key and refined with the sizes observed in
+    parallel runs; the first time it is measured by transforming a few instances
+    with transform(items)."""
+
+    if key not in _nnz_per_cost:
+        sample = range(min(N_CALIBRATION_INSTANCES, len(items)))
+        sample_cost = sum(costs[i] for i in sample)
+        sample_matrix = transform([items[i] for i in sample])
+        sample_nnz = sample_matrix.nnz if sample_matrix is not None else 0
+        _nnz_per_cost[key] = float(sample_nnz) / max(1, sample_cost)
+    return _nnz_per_cost[key]
+
+
+def update_nnz_per_cost(key, nnz, cost):
+    """Record the number of nonzeros observed for a block of the given cost."""
+
+    _nnz_per_cost[key] = max(_nnz_per_cost.get(key, 0), float(nnz) / max(1, cost))
+
+
+def block_capacities(block_costs, nnz_per_cost):
+    """Return the capacity in nonzeros of blocks with the given costs."""
+
+    return [int(nnz_per_cost * cost * NNZ_HEADROOM) + MIN_BLOCK_NNZ for cost in block_costs]
+
+
+def memory_backed(path):
+    """Return True if path is in a memory backed file system (tmpfs or ramfs)."""
+
+    path = os.path.realpath(path)
+    mount_point, fs_type = '', None
+    try:
+        with open('/proc/mounts') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                # mount points with spaces are escaped as \040
+                point = fields[1].replace('\\040', ' ')
+                if (path == point or path.startswith(point.rstrip('/') + '/')) and len(point) >= len(mount_point):
+                    mount_point, fs_type = point, fields[2]
+    except IOError:
+        return False
+    return fs_type in ('tmpfs', 'ramfs')
+
+
+def buffer_size(block_rows, block_nnz, n_features):
+    """Return the number of bytes of the files of a CSRBuffer with the given sizes, if all written."""
+
+    indices_itemsize = 4 if n_features < 2 ** 31 else 8
+    return sum(block_nnz) * (indices_itemsize + 8) + (sum(block_rows) + len(block_rows)) * 8
+
+
+class CSRBuffer(object):
+
+    """Shared output buffer for the blocks of a sparse matrix.
+
+    Parameters
+    ----------
+    path_prefix : string
+        Prefix of the paths of the buffer files (e.g. in a memory backed directory).
+
+    block_rows : list of int
+        The number of rows of each block.
+
+    block_nnz : list of int
+        The capacity in nonzeros of each block.
+
+    n_features : int
+        The number of columns of the matrix.
+    """
+
+    def __init__(self, path_prefix, block_rows, block_nnz, n_features):
+        self.n_features = n_features
+        self.indices_dtype = np.int32 if n_features < 2 ** 31 else np.int64
+        self.paths = dict((name, path_prefix + '_' + name + '.bin') for name in ['indices', 'data', 'indptr'])
+        self.memory_backed = memory_backed(os.path.dirname(os.path.abspath(path_prefix)))
+        self.nnz_offsets = np.concatenate([[0], np.cumsum(block_nnz)]).astype(np.int64)
+        self.row_offsets = np.concatenate([[0], np.cumsum([n_rows + 1 for n_rows in block_rows])]).astype(np.int64)
+        # the files are sparse: pages are allocated only when written
+        for name, size in [('indices', self.nnz_offsets[-1]), ('data', self.nnz_offsets[-1]),
+                           ('indptr', self.row_offsets[-1])]:
+            with open(self.paths[name], 'wb') as f:
+                f.truncate(max(1, size) * np.dtype(self._dtype(name)).itemsize)
+
+    def _dtype(self, name):
+        return {'indices': self.indices_dtype, 'data': np.float64, 'indptr': np.int64}[name]
+
+    def slot(self, block_id):
+        """Return the description of the region of block_id to be passed to write_block."""
+
+        return (self.paths, self._dtype('indices'),
+                self.nnz_offsets[block_id], self.nnz_offsets[block_id + 1] - self.nnz_offsets[block_id],
+                self.row_offsets[block_id], self.row_offsets[block_id + 1] - self.row_offsets[block_id])
+
+    def _map(self, name, start=0, size=None, mode='r+'):
+        dtype = self._dtype(name)
+        if size is None:
+            size = os.path.getsize(self.paths[name]) // np.dtype(dtype).itemsize
+        return np.memmap(self.paths[name], dtype=dtype, mode=mode, offset=start * np.dtype(dtype).itemsize,
+                         shape=(size,))
+
+    def assemble(self, results):
+        """Return the csr_matrix of the blocks given the list of results of write_block in block order.
+
+        The blocks are compacted in place and the files are removed. The indices and data
+        of the matrix are read-only maps of the removed files, unless the files are in a
+        memory backed file system: there the mapped pages would keep using its space (e.g.
+        a size limited /dev/shm) for the lifetime of the matrix, so they are copied."""
+
+        nnz_list = [nnz for nnz, n_rows, overflow in results]
+        total_nnz = sum(nnz_list)
+        n_rows_total = sum(n_rows for nnz, n_rows, overflow in results)
+        indices = self._map('indices')
+        data = self._map('data')
+        indptr_buffer = self._map('indptr')
+        overflow_blocks = [i for i, (nnz, n_rows, overflow) in enumerate(results) if overflow is not None]
+        if overflow_blocks:
+            logger.debug('%d blocks exceeded their buffer capacity' % len(overflow_blocks))
+            # regions cannot be compacted in place: copy into new arrays
+            out_indices = np.empty(total_nnz, dtype=self.indices_dtype)
+            out_data = np.empty(total_nnz, dtype=np.float64)
+        else:
+            out_indices, out_data = indices, data
+        indptr = np.empty(n_rows_total + 1, dtype=np.int64)
+        nnz_position = row_position = 0
+        for block_id, (nnz, n_rows, overflow) in enumerate(results):
+            if overflow is not None:
+                block_indices, block_data, block_indptr = overflow.indices, overflow.data, overflow.indptr
+            else:
+                start = self.nnz_offsets[block_id]
+                block_indices, block_data = indices[start:start + nnz], data[start:start + nnz]
+                row_start = self.row_offsets[block_id]
+                block_indptr = indptr_buffer[row_start:row_start + n_rows + 1]
+            if overflow is not None or out_indices is not indices or start != nnz_position:
+                # regions move only towards the start of the buffers, overlaps are handled by numpy
+                out_indices[nnz_position:nnz_position + nnz] = block_indices
+                out_data[nnz_position:nnz_position + nnz] = block_data
+            indptr[row_position:row_position + n_rows] = block_indptr[:n_rows] + nnz_position
+            nnz_position += nnz
+            row_position += n_rows
+        indptr[row_position] = nnz_position
+        if out_indices is indices:
+            if self.memory_backed:
+                out_indices, out_data = np.array(indices[:total_nnz]), np.array(data[:total_nnz])
+            else:
+                # the writes through the shared maps are visible to any other map of the files
+                out_indices = self._map('indices', size=max(1, total_nnz), mode='r')
+                out_data = self._map('data', size=max(1, total_nnz), mode='r')
+        del indices, data, indptr_buffer
+        self.remove()
+        return csr_matrix((out_data[:total_nnz], out_indices[:total_nnz], indptr),
+                          shape=(n_rows_total, self.n_features), copy=False)
+
+    def remove(self):
+        """Remove the buffer files; the memory stays available to the mapped arrays."""
+
+        for path in self.paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def write_block(data_matrix, slot):
+    """Write the rows of data_matrix into the buffer region described by slot.
+
+    Return (nnz, n_rows, overflow) where overflow is None if the rows were written,
+    otherwise it is data_matrix itself. A None data_matrix is a block without rows."""
+
+    paths, indices_dtype, nnz_start, nnz_capacity, row_start, row_capacity = slot
+    if data_matrix is None:
+        return 0, 0, None
+    data_matrix = csr_matrix(data_matrix)
+    n_rows = data_matrix.shape[0]
+    nnz = data_matrix.indptr[-1]
+    if nnz > nnz_capacity or n_rows + 1 > row_capacity:
+        return nnz, n_rows, data_matrix
+    if nnz > 0:
+        for name, dtype, values in [('indices', indices_dtype, data_matrix.indices[:nnz]),
+                                    ('data', np.float64, data_matrix.data[:nnz])]:
+            region = np.memmap(paths[name], dtype=dtype, mode='r+',
+                               offset=nnz_start * np.dtype(dtype).itemsize, shape=(nnz,))
+            region[:] = values
+            del region
+    region = np.memmap(paths['indptr'], dtype=np.int64, mode='r+',
+                       offset=row_start * np.dtype(np.int64).itemsize, shape=(n_rows + 1,))
+    region[:] = data_matrix.indptr
+    del region
+    return nnz, n_rows, None
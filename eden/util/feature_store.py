@@ -0,0 +1,264 @@
+"""Sharded on-disk storage for vectorized datasets.
+
+A feature store is a directory holding one sub-directory per shard and a
+manifest.json file. Each shard is a CSR block of rows saved as the three
+arrays indptr.npy, indices.npy and data.npy, which are read back with
+np.load(mmap_mode='r') so that only the rows that are used are paged in.
+Each shard also keeps the graph ids (ids.json) and the targets
+(target.npy) of its rows, when given.
+
+The manifest lists the shards with their number of rows and nonzeros, the
+number of features, the vectorizer parameters and any user supplied info
+(e.g. the pre_processor parameters). Shards can be appended at any time;
+the manifest is replaced atomically after each shard is written.
+"""
+
+import os
+import json
+import shutil
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
+import logging
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+
+
+def vectorizer_params(vectorizer):
+    """Return the class name and the constructor parameters of the vectorizer.
+
+    The parameters are those of Vectorizer.get_params, i.e. the same that are
+    recorded in a compiled scorer (see eden.scorer)."""
+
+    if vectorizer is None:
+        return None
+    return {'class': type(vectorizer).__name__, 'params': vectorizer.get_params()}
+
+
+class FeatureStore(object):
+
+    """Directory of CSR shards with their row ids and targets.
+
+    Parameters
+    ----------
+    path : string
+        The directory of the store. It is created at the first append.
+
+    overwrite : bool (default False)
+        If True remove any existing store at path.
+    """
+
+    def __init__(self, path, overwrite=False):
+        self.path = path
+        if overwrite and os.path.exists(path):
+            shutil.rmtree(path)
+        manifest_path = os.path.join(path, MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {'version': FORMAT_VERSION,
+                             'n_features': None,
+                             'vectorizer': None,
+                             'info': None,
+                             'shards': []}
+        self._shard_cache = dict()
+
+    def __len__(self):
+        return self.n_rows
+
+    def __repr__(self):
+        return 'FeatureStore(path=%s, shape=%s, n_shards=%d)' % (self.path, self.shape, self.n_shards)
+
+    @property
+    def n_rows(self):
+        return sum(shard['n_rows'] for shard in self.manifest['shards'])
+
+    @property
+    def n_shards(self):
+        return len(self.manifest['shards'])
+
+    @property
+    def shape(self):
+        return self.n_rows, self.manifest['n_features']
+
+    @property
+    def nnz(self):
+        return sum(shard['nnz'] for shard in self.manifest['shards'])
+
+    @property
+    def info(self):
+        return self.manifest['info']
+
+    @property
+    def vectorizer(self):
+        return self.manifest['vectorizer']
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.path, MANIFEST))
+
+    def set_info(self, info=None, vectorizer=None):
+        """Record user info (must be JSON serializable) and the vectorizer parameters in the manifest."""
+
+        if info is not None:
+            self.manifest['info'] = info
+        if vectorizer is not None:
+            self.manifest['vectorizer'] = vectorizer_params(vectorizer)
+        self._write_manifest()
+
+    def _write_manifest(self):
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        manifest_path = os.path.join(self.path, MANIFEST)
+        with open(manifest_path + '.tmp', 'w') as f:
+            json.dump(self.manifest, f)
+        os.rename(manifest_path + '.tmp', manifest_path)
+
+    def append(self, data_matrix, ids=None, target=None):
+        """Write data_matrix as a new shard, together with the optional ids and target of its rows."""
+
+        data_matrix = csr_matrix(data_matrix)
+        n_rows, n_features = data_matrix.shape
+        if self.manifest['n_features'] is None:
+            self.manifest['n_features'] = n_features
+        elif self.manifest['n_features'] != n_features:
+            raise Exception('ERROR: shard has %d features while the store has %d' %
+                            (n_features, self.manifest['n_features']))
+        if ids is not None and len(ids) != n_rows:
+            raise Exception('ERROR: %d ids for %d rows' % (len(ids), n_rows))
+        if target is not None and len(target) != n_rows:
+            raise Exception('ERROR: %d targets for %d rows' % (len(target), n_rows))
+        name = 'shard_%06d' % self.n_shards
+        shard_path = os.path.join(self.path, name)
+        if os.path.exists(shard_path):
+            # leftover of an interrupted append
+            shutil.rmtree(shard_path)
+        os.makedirs(shard_path)
+        data_matrix.sort_indices()
+        np.save(os.path.join(shard_path, 'indptr.npy'), data_matrix.indptr)
+        np.save(os.path.join(shard_path, 'indices.npy'), data_matrix.indices)
+        np.save(os.path.join(shard_path, 'data.npy'), data_matrix.data)
+        if ids is not None:
+            with open(os.path.join(shard_path, 'ids.json'), 'w') as f:
+                json.dump(list(ids), f)
+        if target is not None:
+            np.save(os.path.join(shard_path, 'target.npy'), np.asarray(target))
+        self.manifest['shards'].append({'name': name,
+                                        'n_rows': n_rows,
+                                        'nnz': int(data_matrix.nnz),
+                                        'ids': ids is not None,
+                                        'target': target is not None})
+        self._write_manifest()
+        logger.debug('Written shard %s with %d rows and %d nonzeros' % (name, n_rows, data_matrix.nnz))
+
+    def _shard_path(self, shard_id, file_name):
+        return os.path.join(self.path, self.manifest['shards'][shard_id]['name'], file_name)
+
+    def read_shard(self, shard_id):
+        """Return the csr_matrix of a shard; the arrays are memory mapped, not loaded."""
+
+        if shard_id not in self._shard_cache:
+            arrays = [np.load(self._shard_path(shard_id, name + '.npy'), mmap_mode='r')
+                      for name in ['data', 'indices', 'indptr']]
+            shape = (self.manifest['shards'][shard_id]['n_rows'], self.manifest['n_features'])
+            self._shard_cache[shard_id] = csr_matrix(tuple(arrays), shape=shape, copy=False)
+        return self._shard_cache[shard_id]
+
+    def shard_ids(self, shard_id):
+        """Return the list of the ids of the rows of a shard (None if not stored)."""
+
+        if not self.manifest['shards'][shard_id]['ids']:
+            return None
+        with open(self._shard_path(shard_id, 'ids.json')) as f:
+            return json.load(f)
+
+    def shard_target(self, shard_id):
+        """Return the array of the targets of the rows of a shard (None if not stored)."""
+
+        if not self.manifest['shards'][shard_id]['target']:
+            return None
+        return np.load(self._shard_path(shard_id, 'target.npy'))
+
+    def iter_shards(self):
+        """Yield the triplets (data_matrix, ids, target) shard by shard."""
+
+        for shard_id in range(self.n_shards):
+            yield self.read_shard(shard_id), self.shard_ids(shard_id), self.shard_target(shard_id)
+
+    def _row_offsets(self):
+        return np.concatenate([[0], np.cumsum([shard['n_rows'] for shard in self.manifest['shards']])])
+
+    def _shard_ranges(self, start, stop):
+        # yield (shard_id, local_start, local_stop) for the shards that overlap [start, stop)
+        offsets = self._row_offsets()
+        for shard_id in range(self.n_shards):
+            shard_start, shard_stop = max(start, offsets[shard_id]), min(stop, offsets[shard_id + 1])
+            if shard_start < shard_stop:
+                yield shard_id, shard_start - offsets[shard_id], shard_stop - offsets[shard_id]
+
+    def read_rows(self, start=0, stop=None):
+        """Return the csr_matrix of the rows in the range [start, stop)."""
+
+        if stop is None:
+            stop = self.n_rows
+        blocks = [self.read_shard(shard_id)[local_start:local_stop]
+                  for shard_id, local_start, local_stop in self._shard_ranges(start, stop)]
+        if len(blocks) == 0:
+            return csr_matrix((0, self.manifest['n_features']))
+        if len(blocks) == 1:
+            return blocks[0]
+        return vstack(blocks, format='csr')
+
+    def take(self, rows):
+        """Return the csr_matrix of the given rows, in the given order."""
+
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return csr_matrix((0, self.manifest['n_features']))
+        order = np.argsort(rows, kind='mergesort')
+        sorted_rows = rows[order]
+        offsets = self._row_offsets()
+        shard_of_row = np.searchsorted(offsets, sorted_rows, side='right') - 1
+        blocks = []
+        for shard_id in np.unique(shard_of_row):
+            local_rows = sorted_rows[shard_of_row == shard_id] - offsets[shard_id]
+            blocks.append(self.read_shard(shard_id)[local_rows])
+        data_matrix = vstack(blocks, format='csr')
+        # restore the requested order
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+        return data_matrix[inverse]
+
+    def ids(self, start=0, stop=None):
+        """Return the list of the ids of the rows in the range [start, stop)."""
+
+        if stop is None:
+            stop = self.n_rows
+        ids = []
+        for shard_id, local_start, local_stop in self._shard_ranges(start, stop):
+            shard_ids = self.shard_ids(shard_id)
+            if shard_ids is None:
+                shard_ids = [None] * self.manifest['shards'][shard_id]['n_rows']
+            ids += shard_ids[local_start:local_stop]
+        return ids
+
+    def target(self, start=0, stop=None):
+        """Return the array of the targets of the rows in the range [start, stop)."""
+
+        if stop is None:
+            stop = self.n_rows
+        targets = []
+        for shard_id, local_start, local_stop in self._shard_ranges(start, stop):
+            shard_target = self.shard_target(shard_id)
+            if shard_target is None:
+                raise Exception('ERROR: no target stored for shard %d' % shard_id)
+            targets.append(shard_target[local_start:local_stop])
+        if len(targets) == 0:
+            return np.array([])
+        return np.concatenate(targets)
+
+    def to_csr(self):
+        """Return all the rows as a single csr_matrix (memory mapped if the store has a single shard)."""
+
+        return self.read_rows(0, self.n_rows)
@@ -0,0 +1,493 @@
+"""Compact binary encoding of EDeN graphs.
+
+A graph is encoded as a single byte string made of a small header followed by
+aligned numeric arrays:
+
+- the node identifiers (as an integer array when they are integers);
+- the edge list as two integer arrays of positions in the node array;
+- one typed column per node (and per edge) attribute: bool, integer and float
+  values are stored as arrays, strings as integer codes into an interned table,
+  any other value (e.g. list or dict labels) in a pickled fallback column;
+  a presence mask is added only when some nodes lack the attribute;
+- the graph-level attributes (e.g. 'id', 'sequence', 'structure').
+
+The header holds the string tables, the column layout and the graph
+attributes; the arrays are exposed without copies by GraphView, which
+offers the read-only part of the networkx interface used by the Vectorizer.
+Integer arrays use the smallest dtype that can hold their values.
+GraphStore keeps encoded graphs in an append-only file that is read back via
+memory mapping.
+"""
+
+import os
+import struct
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+import numpy as np
+import networkx as nx
+
+MAGIC = b'EDG1'
+# magic, header length, data offset
+PREAMBLE = struct.Struct('<4sII')
+ALIGNMENT = 8
+INDEX_SUFFIX = '.index.npy'
+
+
+def _native_string(value):
+    # keep plain strings so that hashing and comparisons match the original labels
+    if isinstance(value, unicode):
+        try:
+            return str(value)
+        except UnicodeEncodeError:
+            return value
+    return value
+
+
+INTEGER_TYPES = set([int, long])
+STRING_TYPES = set([str, unicode])
+INTEGER_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+CODE_DTYPES = [np.uint8, np.uint16, np.int32]
+
+
+def _column_type(values):
+    types = set(type(value) for value in values)
+    if types == set([bool]):
+        return 'bool'
+    if types and types <= INTEGER_TYPES:
+        if -2 ** 63 <= min(values) and max(values) < 2 ** 63:
+            return 'int'
+        return 'object'
+    if types == set([float]):
+        return 'float'
+    if types and types <= STRING_TYPES:
+        return 'str'
+    return 'object'
+
+
+def _smallest_dtype(values, dtypes):
+    # values is a non empty numpy array
+    low, high = values.min(), values.max()
+    for dtype in dtypes:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return dtype
+    return dtypes[-1]
+
+
+_MISSING = object()
+
+
+class _Writer(object):
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def add(self, data):
+        """Append data aligned to ALIGNMENT and return its location.
+
+        The location is (offset, length, dtype) for numpy arrays and (offset, length, None)
+        for byte strings."""
+
+        dtype = None
+        if isinstance(data, np.ndarray):
+            dtype = data.dtype.str
+            data = np.ascontiguousarray(data).tostring()
+        offset = self.size
+        self.chunks.append(data)
+        self.size += len(data)
+        padding = -self.size % ALIGNMENT
+        if padding:
+            self.chunks.append(b'\0' * padding)
+            self.size += padding
+        return offset, len(data), dtype
+
+    def add_integers(self, values, dtypes=INTEGER_DTYPES):
+        """Append integers using the smallest dtype in dtypes that can represent them."""
+
+        values = np.asarray(values, dtype=np.int64)
+        if len(values) == 0:
+            dtype = dtypes[0]
+        else:
+            dtype = _smallest_dtype(values, dtypes)
+        return self.add(values.astype(dtype))
+
+    def add_object(self, value):
+        return self.add(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+
+def _encode_columns(items, writer):
+    # items is a list of attribute dicts, one per node (or edge)
+    names = set()
+    for attributes in items:
+        names.update(attributes)
+    columns = []
+    for name in sorted(names):
+        values = [attributes.get(name, _MISSING) for attributes in items]
+        column = {'name': name, 'mask': None}
+        if any(value is _MISSING for value in values):
+            column['mask'] = writer.add(np.array([value is not _MISSING for value in values], dtype=np.uint8))
+            values = [value for value in values if value is not _MISSING]
+        column_type = column['type'] = _column_type(values)
+        if column_type == 'bool':
+            column['data'] = writer.add(np.array(values, dtype=np.uint8))
+        elif column_type == 'int':
+            column['data'] = writer.add_integers(values)
+        elif column_type == 'float':
+            column['data'] = writer.add(np.array(values, dtype=np.float64))
+        elif column_type == 'str':
+            # intern the strings
+            codes = dict()
+            for value in values:
+                if value not in codes:
+                    codes[value] = len(codes)
+            table = sorted(codes, key=codes.get)
+            column['table'] = table
+            column['data'] = writer.add_integers([codes[value] for value in values], CODE_DTYPES)
+        else:
+            column['data'] = writer.add_object(values)
+        columns.append(column)
+    return columns
+
+
+def encode_graph(graph):
+    """Encode a networkx graph into a compact byte string."""
+
+    nodes = graph.nodes()
+    node_position = dict((node, i) for i, node in enumerate(nodes))
+    writer = _Writer()
+    header = {'directed': graph.is_directed(),
+              'n_nodes': len(nodes),
+              'graph': graph.graph}
+    if _column_type(nodes) == 'int':
+        header['node_ids'] = ('int', writer.add_integers(nodes))
+    else:
+        header['node_ids'] = ('object', writer.add_object(nodes))
+    header['node_columns'] = _encode_columns([graph.node[node] for node in nodes], writer)
+    edges = graph.edges(data=True)
+    header['n_edges'] = len(edges)
+    header['sources'] = writer.add_integers([node_position[u] for u, v, d in edges], CODE_DTYPES)
+    header['targets'] = writer.add_integers([node_position[v] for u, v, d in edges], CODE_DTYPES)
+    header['edge_columns'] = _encode_columns([d for u, v, d in edges], writer)
+    header_data = pickle.dumps(header, pickle.HIGHEST_PROTOCOL)
+    data_offset = PREAMBLE.size + len(header_data)
+    data_offset += -data_offset % ALIGNMENT
+    padding = b'\0' * (data_offset - PREAMBLE.size - len(header_data))
+    return b''.join([PREAMBLE.pack(MAGIC, len(header_data), data_offset), header_data, padding] + writer.chunks)
+
+
+def decode_graph(data):
+    """Decode a byte string produced by encode_graph into a networkx graph."""
+
+    return GraphView(data).to_networkx()
+
+
+class GraphView(object):
+
+    """Read-only, zero-copy view over an encoded graph.
+
+    The numeric columns are numpy arrays that share memory with the encoded
+    buffer. The view implements the subset of the networkx interface used to
+    read graphs (graph, nodes, nodes_iter, edges_iter, number_of_nodes, ...),
+    so that it can be passed directly to the Vectorizer. Pickling a view
+    transfers only its encoded bytes.
+
+    Parameters
+    ----------
+    data : buffer
+        The encoded graph: a byte string, a numpy uint8 array or a memory map.
+    """
+
+    def __init__(self, data):
+        self.buffer = np.frombuffer(data, dtype=np.uint8)
+        magic, header_length, data_offset = PREAMBLE.unpack(self.buffer[:PREAMBLE.size].tostring())
+        if magic != MAGIC:
+            raise Exception('ERROR: not an encoded EDeN graph')
+        header = pickle.loads(self.buffer[PREAMBLE.size:PREAMBLE.size + header_length].tostring())
+        self._data = self.buffer[data_offset:]
+        self.header = header
+        self.graph = header['graph']
+        self.directed = header['directed']
+        self.n_nodes = header['n_nodes']
+        self.n_edges = header['n_edges']
+        self._node_ids = None
+        self._node_attributes = None
+
+    def __reduce__(self):
+        # a view travels between processes as its compact encoding
+        return GraphView, (self.tostring(),)
+
+    def __len__(self):
+        return self.n_nodes
+
+    def __iter__(self):
+        return iter(self.nodes())
+
+    def tostring(self):
+        """Return the encoded graph as a byte string."""
+
+        return self.buffer.tostring()
+
+    def _array(self, location):
+        offset, length, dtype = location
+        return self._data[offset:offset + length].view(dtype)
+
+    def _object(self, location):
+        offset, length, dtype = location
+        return pickle.loads(self._data[offset:offset + length].tostring())
+
+    def is_directed(self):
+        return self.directed
+
+    def number_of_nodes(self):
+        return self.n_nodes
+
+    def number_of_edges(self):
+        return self.n_edges
+
+    def node_ids(self):
+        """Return the node identifiers (an integer array for integer identifiers)."""
+
+        if self._node_ids is None:
+            kind, location = self.header['node_ids']
+            if kind == 'int':
+                self._node_ids = self._array(location)
+            else:
+                self._node_ids = self._object(location)
+        return self._node_ids
+
+    def edge_index(self):
+        """Return the pair of arrays of source and target positions of the edges."""
+
+        return self._array(self.header['sources']), self._array(self.header['targets'])
+
+    def column(self, name, edges=False):
+        """Return the raw column of a node (or edge) attribute as (values, mask).
+
+        values is an array for bool, int and float attributes, a pair (codes, table)
+        for string attributes and a list otherwise; mask is None if all the items
+        have the attribute, otherwise a uint8 array with 1 for the items that have it.
+        """
+
+        columns = self.header['edge_columns'] if edges else self.header['node_columns']
+        for column in columns:
+            if column['name'] == name:
+                return self._column_values(column)
+        raise KeyError(name)
+
+    def _column_values(self, column):
+        mask = None
+        if column['mask'] is not None:
+            mask = self._array(column['mask'])
+        column_type = column['type']
+        if column_type == 'bool':
+            values = self._array(column['data']).astype(bool)
+        elif column_type in ['int', 'float']:
+            values = self._array(column['data'])
+        elif column_type == 'str':
+            values = (self._array(column['data']), column['table'])
+        else:
+            values = self._object(column['data'])
+        return values, mask
+
+    def _python_values(self, column):
+        values, mask = self._column_values(column)
+        if column['type'] == 'str':
+            codes, table = values
+            table = [_native_string(value) for value in table]
+            values = [table[code] for code in codes.tolist()]
+        elif column['type'] in ['bool', 'int', 'float']:
+            values = values.tolist()
+        return values, mask
+
+    def _attributes(self, columns, size):
+        names = []
+        value_lists = []
+        masked = []
+        for column in columns:
+            values, mask = self._python_values(column)
+            if mask is None:
+                names.append(_native_string(column['name']))
+                value_lists.append(values)
+            else:
+                masked.append((_native_string(column['name']), values, mask))
+        if names:
+            attributes = [dict(zip(names, row)) for row in zip(*value_lists)]
+        else:
+            attributes = [dict() for i in range(size)]
+        for name, values, mask in masked:
+            for position, value in zip(np.flatnonzero(mask).tolist(), values):
+                attributes[position][name] = value
+        return attributes
+
+    def nodes(self, data=False):
+        return list(self.nodes_iter(data=data))
+
+    def nodes_iter(self, data=False):
+        node_ids = self.node_ids()
+        if isinstance(node_ids, np.ndarray):
+            node_ids = node_ids.tolist()
+        if data is False:
+            return iter(node_ids)
+        return iter(zip(node_ids, self._attributes(self.header['node_columns'], self.n_nodes)))
+
+    def edges(self, data=False):
+        return list(self.edges_iter(data=data))
+
+    def edges_iter(self, data=False):
+        node_ids = self.node_ids()
+        if isinstance(node_ids, np.ndarray):
+            node_ids = node_ids.tolist()
+        sources, targets = self.edge_index()
+        pairs = [(node_ids[u], node_ids[v]) for u, v in zip(sources.tolist(), targets.tolist())]
+        if data is False:
+            return iter(pairs)
+        attributes = self._attributes(self.header['edge_columns'], self.n_edges)
+        return iter((u, v, d) for (u, v), d in zip(pairs, attributes))
+
+    def to_networkx(self):
+        """Return the networkx graph."""
+
+        if self.directed:
+            graph = nx.DiGraph()
+        else:
+            graph = nx.Graph()
+        graph.graph = dict(self.graph)
+        # fill the adjacency structures directly: the nodes and the edges are known to be unique
+        node_ids = self.node_ids()
+        if isinstance(node_ids, np.ndarray):
+            node_ids = node_ids.tolist()
+        graph.node.update(zip(node_ids, self._attributes(self.header['node_columns'], self.n_nodes)))
+        if self.directed:
+            successors, predecessors = graph.succ, graph.pred
+        else:
+            successors = predecessors = graph.adj
+        for node in node_ids:
+            successors[node] = dict()
+            predecessors[node] = dict()
+        for u, v, d in self.edges_iter(data=True):
+            successors[u][v] = d
+            predecessors[v][u] = d
+        return graph
+
+
+def encode_graphs(graphs):
+    """Return the list of the encodings of the graphs."""
+
+    return [encode_graph(graph) for graph in graphs]
+
+
+def as_networkx(graph):
+    """Return graph as a networkx graph, decoding it if it is an encoded graph or a GraphView."""
+
+    if isinstance(graph, GraphView):
+        return graph.to_networkx()
+    if isinstance(graph, bytes):
+        return decode_graph(graph)
+    return graph
+
+
+class GraphStore(object):
+
+    """Append-only on-disk collection of encoded graphs.
+
+    The graphs are stored one after the other in a single data file; the
+    offsets are kept in a companion '<path>.index.npy' file. Reading memory
+    maps the data file and returns GraphView objects without copying.
+
+    Parameters
+    ----------
+    path : string
+        The path of the data file.
+
+    mode : string (default 'r')
+        'r' to read, 'w' to create (or truncate) and 'a' to append.
+    """
+
+    def __init__(self, path, mode='r'):
+        self.path = path
+        self.mode = mode
+        self._offsets = [0]
+        self._mmap = None
+        self._file = None
+        if mode in ['r', 'a'] and os.path.exists(path + INDEX_SUFFIX):
+            self._offsets = np.load(path + INDEX_SUFFIX).tolist()
+        elif mode == 'r':
+            raise Exception('ERROR: no graph store found at: %s' % path)
+        if mode == 'w':
+            self._file = open(path, 'wb')
+        elif mode == 'a':
+            self._file = open(path, 'ab')
+            self._file.seek(self._offsets[-1])
+            self._file.truncate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def append(self, graph):
+        """Encode and append a networkx graph (or an already encoded one)."""
+
+        if isinstance(graph, GraphView):
+            data = graph.tostring()
+        elif isinstance(graph, bytes):
+            data = graph
+        else:
+            data = encode_graph(graph)
+        padding = -len(data) % ALIGNMENT
+        self._file.write(data)
+        if padding:
+            self._file.write(b'\0' * padding)
+        self._offsets.append(self._offsets[-1] + len(data) + padding)
+
+    def extend(self, graphs):
+        for graph in graphs:
+            self.append(graph)
+
+    def flush(self):
+        """Write the index so that the graphs appended so far can be read."""
+
+        if self._file is not None:
+            self._file.flush()
+            np.save(self.path + INDEX_SUFFIX, np.array(self._offsets, dtype=np.int64))
+        self._mmap = None
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _data(self):
+        if self._mmap is None:
+            if self._offsets[-1] == 0:
+                return None
+            self._mmap = np.memmap(self.path, dtype=np.uint8, mode='r', shape=(self._offsets[-1],))
+        return self._mmap
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return GraphView(self._data()[self._offsets[i]:self._offsets[i + 1]])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def graphs(self, start=0, stop=None):
+        """Yield networkx graphs for the records in the range [start, stop)."""
+
+        if stop is None:
+            stop = len(self)
+        for i in range(start, stop):
+            yield self[i].to_networkx()
@@ -0,0 +1,153 @@
+"""Lightweight per-stage timers and counters.
+
+Stages are identified by dotted names (e.g. 'vectorize.bfs') and
+accumulate the number of calls, the elapsed seconds and arbitrary counters
+(e.g. instances, nnz, bytes). Instrumentation is disabled by default: when
+disabled, timer() and laps() cost a function call and record nothing.
+
+Each process has its own registry: the stages executed in the worker
+processes of a WorkerPool are not reported by the parent process, hence
+the profile command runs the pipeline serially.
+
+Typical use::
+
+    with timer('optimize.fit'):
+        estimator.fit(X, y)
+
+    graph_laps = laps()
+    ...
+    graph_laps.lap('vectorize.bfs')
+    ...
+    graph_laps.lap('vectorize.neighborhood_hash', instances=1)
+"""
+
+import threading
+from time import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+_stages = OrderedDict()
+_lock = threading.Lock()
+_enabled = False
+_start_time = None
+
+
+def enable():
+    """Start recording, clearing the previous records."""
+
+    global _enabled
+    reset()
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    global _start_time
+    with _lock:
+        _stages.clear()
+        _start_time = time()
+
+
+def add(stage, seconds=0, n_calls=1, **counts):
+    """Add seconds and counts to the records of stage."""
+
+    if not _enabled:
+        return
+    with _lock:
+        if stage not in _stages:
+            _stages[stage] = dict(n_calls=0, seconds=0.0, counts=OrderedDict())
+        record = _stages[stage]
+        record['n_calls'] += n_calls
+        record['seconds'] += seconds
+        for key in counts:
+            record['counts'][key] = record['counts'].get(key, 0) + counts[key]
+
+
+def count(stage, **counts):
+    """Add counts to the records of stage, without timing it."""
+
+    add(stage, n_calls=0, **counts)
+
+
+@contextmanager
+def timer(stage, **counts):
+    """Record the time spent in the with block under stage."""
+
+    if not _enabled:
+        yield
+        return
+    start = time()
+    try:
+        yield
+    finally:
+        add(stage, time() - start, **counts)
+
+
+class _Laps(object):
+
+    def __init__(self):
+        self.last = time()
+
+    def lap(self, stage, **counts):
+        now = time()
+        add(stage, now - self.last, **counts)
+        self.last = now
+
+
+class _NoLaps(object):
+
+    def lap(self, stage, **counts):
+        pass
+
+
+_NO_LAPS = _NoLaps()
+
+
+def laps():
+    """Return an object whose lap(stage, **counts) records under stage the time since
+    the previous lap (or since the call to laps)."""
+
+    if not _enabled:
+        return _NO_LAPS
+    return _Laps()
+
+
+def stages():
+    """Return a copy of the records: a dict stage -> dict(n_calls, seconds, counts)."""
+
+    with _lock:
+        return OrderedDict((stage, dict(n_calls=record['n_calls'],
+                                        seconds=record['seconds'],
+                                        counts=OrderedDict(record['counts'])))
+                           for stage, record in _stages.items())
+
+
+def report():
+    """Return a text table with the calls, seconds, share of the elapsed time and
+    throughput of each stage, sorted by stage name."""
+
+    records = stages()
+    elapsed = time() - _start_time if _start_time is not None else 0
+    text = []
+    text.append('Stage breakdown over %.2f sec:' % elapsed)
+    text.append('%-36s %10s %10s %7s  %s' % ('stage', 'calls', 'sec', '%', 'counts'))
+    for stage in sorted(records):
+        record = records[stage]
+        seconds = record['seconds']
+        share = 100 * seconds / elapsed if elapsed > 0 else 0
+        counts = []
+        for key, value in record['counts'].items():
+            if seconds > 0:
+                counts.append('%s: %d (%.1f/sec)' % (key, value, value / seconds))
+            else:
+                counts.append('%s: %d' % (key, value))
+        text.append('%-36s %10d %10.3f %7.1f  %s' % (stage, record['n_calls'], seconds, share, ', '.join(counts)))
+    return '\n'.join(text)
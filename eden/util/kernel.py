@@ -0,0 +1,124 @@
+"""Blockwise computation of the linear kernel (Gram) matrix of a sparse data matrix.
+
+The Gram matrix is never held in memory as a whole: the products of a row
+block with a column block of the data matrix are computed independently
+and written directly into a memory mapped .npy file. Only the blocks on
+and above the diagonal are computed, the symmetric ones are written
+transposed. Alternatively only the top_k largest entries of each row are
+kept, in a sparse matrix.
+"""
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from eden.util.pool import resolve_pool
+import logging
+logger = logging.getLogger(__name__)
+
+# default number of rows (and columns) of a block
+BLOCK_SIZE = 2000
+
+
+def _block_intervals(n, block_size):
+    return [(start, min(start + block_size, n)) for start in range(0, n, block_size)]
+
+
+def _gram_block(row_start, row_end, col_start, col_end, data_matrix=None, path=None, dtype=None):
+    # compute a block of the Gram matrix and write it, and its symmetric block, in the .npy file path
+    block = (data_matrix[row_start:row_end] * data_matrix[col_start:col_end].T).toarray().astype(dtype)
+    gram_matrix = np.load(path, mmap_mode='r+')
+    gram_matrix[row_start:row_end, col_start:col_end] = block
+    if row_start != col_start:
+        gram_matrix[col_start:col_end, row_start:row_end] = block.T
+    gram_matrix.flush()
+    del gram_matrix
+
+
+def _top_k_block(row_start, row_end, data_matrix=None, top_k=None, block_size=None, dtype=None):
+    # return the values and the column indices of the top_k largest entries of each row of a
+    # row block, merging the candidates one column block at a time
+    rows = data_matrix[row_start:row_end]
+    n_rows = row_end - row_start
+    values = np.zeros((n_rows, 0), dtype=dtype)
+    cols = np.zeros((n_rows, 0), dtype=np.int64)
+    row_ids = np.arange(n_rows)[:, None]
+    for col_start, col_end in _block_intervals(data_matrix.shape[0], block_size):
+        block = (rows * data_matrix[col_start:col_end].T).toarray().astype(dtype)
+        values = np.hstack([values, block])
+        cols = np.hstack([cols, np.tile(np.arange(col_start, col_end), (n_rows, 1))])
+        if values.shape[1] > top_k:
+            ids = np.argpartition(-values, top_k - 1, axis=1)[:, :top_k]
+            values, cols = values[row_ids, ids], cols[row_ids, ids]
+    return values, cols
+
+
+def gram_matrix(data_matrix, path=None, block_size=BLOCK_SIZE, dtype=np.float64, top_k=None,
+                n_jobs=-1, pool=None):
+    """Return the linear kernel matrix data_matrix * data_matrix.T computed block by block.
+
+    Parameters
+    ----------
+    data_matrix : scipy sparse matrix
+        The instances.
+
+    path : string
+        Path of the .npy file the dense Gram matrix is written in; required if top_k is None.
+
+    block_size : int (default BLOCK_SIZE)
+        Number of rows and columns of a block: each task uses O(block_size ** 2) memory.
+
+    dtype : numpy dtype (default np.float64)
+        Type of the entries of the Gram matrix, e.g. np.float32 to halve its size.
+
+    top_k : int or None (default None)
+        If not None keep only the top_k largest entries of each row (including the diagonal).
+
+    n_jobs : int (default -1)
+        Number of worker processes; if 1 the blocks are computed in the current process.
+
+    pool : WorkerPool or None (default None)
+        Pool of worker processes, see eden.util.pool.
+
+    Returns
+    -------
+    The Gram matrix memory mapped from path if top_k is None, otherwise a csr_matrix
+    with top_k entries per row.
+    """
+
+    data_matrix = csr_matrix(data_matrix)
+    n = data_matrix.shape[0]
+    intervals = _block_intervals(n, block_size)
+    state = dict(data_matrix=data_matrix, dtype=dtype)
+    if top_k is None:
+        if path is None:
+            raise Exception('ERROR: path is required to write the dense Gram matrix')
+        # create the file, the tasks write their blocks in it
+        np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(n, n))
+        state.update(path=path)
+        fun = _gram_block
+        # upper triangle blocks only
+        args_list = [(row_start, row_end, col_start, col_end)
+                     for i, (row_start, row_end) in enumerate(intervals)
+                     for col_start, col_end in intervals[i:]]
+    else:
+        top_k = min(top_k, n)
+        state.update(top_k=top_k, block_size=block_size)
+        fun = _top_k_block
+        args_list = intervals
+    if n_jobs == 1:
+        results = [fun(*args, **state) for args in args_list]
+    else:
+        pool = resolve_pool(pool, n_jobs=n_jobs)
+        token = pool.share(**state)
+        try:
+            results = pool.map_shared(fun, token, args_list)
+        finally:
+            pool.release(token)
+    logger.debug('Computed Gram matrix of %d instances in %d blocks' % (n, len(args_list)))
+    if top_k is None:
+        return np.load(path, mmap_mode='r')
+    values = np.vstack([block_values for block_values, block_cols in results])
+    cols = np.vstack([block_cols for block_values, block_cols in results])
+    sparse_gram_matrix = csr_matrix((values.ravel(), cols.ravel(), np.arange(0, n * top_k + 1, top_k)),
+                                    shape=(n, n))
+    sparse_gram_matrix.sort_indices()
+    return sparse_gram_matrix
@@ -0,0 +1,110 @@
+"""Cache of data matrices keyed on the parameters that produced them.
+
+The most recently used matrices are kept in memory up to a budget in bytes;
+the least recently used ones are then spilled to feature stores on disk and
+memory mapped back when they are requested again.
+"""
+
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from eden.util.feature_store import FeatureStore
+import logging
+logger = logging.getLogger(__name__)
+
+# default memory budget in bytes
+MEMORY_BUDGET = 512 * 1024 ** 2
+
+
+def matrix_nbytes(data_matrix, target=None):
+    """Return the number of bytes used by the arrays of a csr_matrix and of its target."""
+
+    nbytes = data_matrix.data.nbytes + data_matrix.indices.nbytes + data_matrix.indptr.nbytes
+    if target is not None:
+        nbytes += target.nbytes
+    return nbytes
+
+
+class DataMatrixCache(object):
+
+    """Least recently used cache of (data_matrix, target) pairs.
+
+    Parameters
+    ----------
+    memory_budget : int or None (default MEMORY_BUDGET)
+        Maximal number of bytes of the matrices kept in memory. If 0 all matrices are
+        spilled, if None nothing is spilled.
+
+    spill_dir : string or None (default None)
+        Directory of the feature stores of the spilled matrices. If None a temporary
+        directory is created at the first spill.
+    """
+
+    def __init__(self, memory_budget=MEMORY_BUDGET, spill_dir=None):
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self._own_spill_dir = False
+        self._memory = OrderedDict()
+        self._spilled = dict()
+        self.nbytes = 0
+        self.n_hits = self.n_misses = 0
+
+    def __contains__(self, key):
+        return key in self._memory or key in self._spilled
+
+    def __len__(self):
+        return len(self._memory) + len(self._spilled)
+
+    def get(self, key):
+        """Return the pair (data_matrix, target) stored under key, or None."""
+
+        if key in self._memory:
+            self.n_hits += 1
+            entry = self._memory.pop(key)
+            self._memory[key] = entry
+            return entry
+        if key in self._spilled:
+            self.n_hits += 1
+            store = FeatureStore(self._spilled[key])
+            return store.to_csr(), store.target()
+        self.n_misses += 1
+        return None
+
+    def put(self, key, data_matrix, target):
+        """Store the pair (data_matrix, target) under key, spilling older entries if over budget."""
+
+        if key in self:
+            return
+        self._memory[key] = (data_matrix, target)
+        self.nbytes += matrix_nbytes(data_matrix, target)
+        if self.memory_budget is not None:
+            while self.nbytes > self.memory_budget and self._memory:
+                self._spill()
+
+    def _spill(self):
+        key, (data_matrix, target) = self._memory.popitem(last=False)
+        self.nbytes -= matrix_nbytes(data_matrix, target)
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix='eden_matrix_cache_')
+            self._own_spill_dir = True
+        path = os.path.join(self.spill_dir, 'matrix_%06d' % len(self._spilled))
+        store = FeatureStore(path, overwrite=True)
+        store.append(data_matrix, target=target)
+        store.set_info(info={'key': repr(key)})
+        self._spilled[key] = path
+        logger.debug('Spilled data matrix %s to %s' % (data_matrix.shape, path))
+
+    def clear(self):
+        """Remove all the entries and the spilled feature stores."""
+
+        self._memory.clear()
+        self.nbytes = 0
+        for path in self._spilled.values():
+            if os.path.exists(path):
+                shutil.rmtree(path)
+        self._spilled.clear()
+        if self._own_spill_dir and os.path.exists(self.spill_dir):
+            shutil.rmtree(self.spill_dir)
+            self.spill_dir = None
+            self._own_spill_dir = False
@@ -0,0 +1,124 @@
+"""Streaming writers of sparse data matrices.
+
+The rows are written one block at a time, as soon as each block is
+available, so that the whole data matrix is never held in memory. All the
+writers have the same interface: write(data_matrix, ids=None) appends a
+block of rows, close() completes the file. Row ids are written in step
+with the rows: in the shards of a feature store, otherwise one per line
+in the file <path>.ids.
+"""
+
+from itertools import chain, izip
+import numpy as np
+from scipy.sparse import csr_matrix
+from eden.util.feature_store import FeatureStore
+import logging
+logger = logging.getLogger(__name__)
+
+MATRIX_MARKET_BANNER = '%%MatrixMarket matrix coordinate real general\n'
+# width reserved for the size line of the MatrixMarket header, written at close time
+SIZE_LINE_WIDTH = 64
+
+
+class _TextMatrixWriter(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.n_rows = 0
+        self.n_cols = None
+        self.nnz = 0
+        self._file = open(path, 'w')
+        self._ids_file = None
+
+    def write(self, data_matrix, ids=None):
+        data_matrix = csr_matrix(data_matrix)
+        if self.n_cols is None:
+            self.n_cols = data_matrix.shape[1]
+        elif self.n_cols != data_matrix.shape[1]:
+            raise Exception('ERROR: block has %d features while the matrix has %d' %
+                            (data_matrix.shape[1], self.n_cols))
+        if ids is not None:
+            if len(ids) != data_matrix.shape[0]:
+                raise Exception('ERROR: %d ids for %d rows' % (len(ids), data_matrix.shape[0]))
+            if self._ids_file is None:
+                self._ids_file = open(self.path + '.ids', 'w')
+            for id in ids:
+                self._ids_file.write('%s\n' % id)
+        data_matrix.sort_indices()
+        self._write_block(data_matrix)
+        self.n_rows += data_matrix.shape[0]
+        self.nnz += data_matrix.nnz
+
+    def _write_block(self, data_matrix):
+        raise NotImplementedError("Should have implemented this")
+
+    def close(self):
+        self._file.close()
+        if self._ids_file is not None:
+            self._ids_file.close()
+        logger.info('Written file: %s (%d rows, %d nonzeros)' % (self.path, self.n_rows, self.nnz))
+
+
+class MatrixMarketWriter(_TextMatrixWriter):
+
+    """Write the blocks in MatrixMarket coordinate format in the file path.
+
+    The size line of the header is reserved when the file is opened and is
+    filled in by close()."""
+
+    def __init__(self, path):
+        super(MatrixMarketWriter, self).__init__(path)
+        self._file.write(MATRIX_MARKET_BANNER)
+        self._file.write(' ' * (SIZE_LINE_WIDTH - 1) + '\n')
+
+    def _write_block(self, data_matrix):
+        rows = np.repeat(np.arange(data_matrix.shape[0]), np.diff(data_matrix.indptr)) + self.n_rows + 1
+        cols = data_matrix.indices + 1
+        # a single format operation per block is much faster than formatting line by line
+        entries = chain.from_iterable(izip(rows.tolist(), cols.tolist(), data_matrix.data.tolist()))
+        self._file.write(('%d %d %.17g\n' * data_matrix.nnz) % tuple(entries))
+
+    def close(self):
+        size_line = '%d %d %d' % (self.n_rows, self.n_cols or 0, self.nnz)
+        self._file.seek(len(MATRIX_MARKET_BANNER))
+        self._file.write(size_line.ljust(SIZE_LINE_WIDTH - 1))
+        super(MatrixMarketWriter, self).close()
+
+
+class SVMLightWriter(_TextMatrixWriter):
+
+    """Write the blocks in svmlight format in the file path, with target 0 for all rows."""
+
+    def _write_block(self, data_matrix):
+        # zero based feature indices
+        line_formats = ['0' + ' %d:%.17g' * n_entries + '\n' for n_entries in np.diff(data_matrix.indptr)]
+        entries = chain.from_iterable(izip(data_matrix.indices.tolist(), data_matrix.data.tolist()))
+        self._file.write(''.join(line_formats) % tuple(entries))
+
+
+class FeatureStoreWriter(object):
+
+    """Write each block as a shard of the feature store in the directory path."""
+
+    def __init__(self, path, vectorizer=None):
+        self.store = FeatureStore(path, overwrite=True)
+        if vectorizer is not None:
+            self.store.set_info(vectorizer=vectorizer)
+
+    def write(self, data_matrix, ids=None):
+        self.store.append(data_matrix, ids=ids)
+
+    def close(self):
+        logger.info('Written feature store: %s' % self.store)
+
+
+def matrix_writer(path, output_format, vectorizer=None):
+    """Return the streaming writer of output_format ('feature_store', 'MatrixMarket' or 'svmlight')."""
+
+    if output_format == 'feature_store':
+        return FeatureStoreWriter(path, vectorizer=vectorizer)
+    if output_format == 'MatrixMarket':
+        return MatrixMarketWriter(path + '.mtx')
+    if output_format == 'svmlight':
+        return SVMLightWriter(path + '.svmlight')
+    raise Exception('ERROR: no streaming writer for format: %s' % output_format)
@@ -0,0 +1,259 @@
+"""Single pass random partitioning of iterables.
+
+Each item is assigned to a partition as soon as it is read, so the iterable
+is consumed only once and never needs to be counted or copied. Without
+stratification the partition of an item is a function of a seeded hash of
+its index (or of a key such as the graph id), so that the same item always
+lands in the same partition for a given random_state. With stratification
+the items of each stratum are assigned following a shuffled schedule, so
+that every stratum is split in the requested proportions.
+
+The partitions are returned as iterators that share the source iterator:
+the items read while advancing one partition are queued for the others.
+Only the first MAX_QUEUED_ITEMS items of each queue are kept in memory, the
+following ones are spooled to a temporary file on disk, so that consuming
+one partition entirely before the others does not load the dataset in memory.
+"""
+
+import os
+import hashlib
+import random
+import tempfile
+import cPickle as pickle
+from collections import deque
+import logging
+logger = logging.getLogger(__name__)
+
+# number of items of a stratum whose assignment is planned at once
+SCHEDULE_SIZE = 100
+# number of items of each partition queued in memory before spooling to disk
+MAX_QUEUED_ITEMS = 1000
+
+
+def hash_fraction(key, random_state=1):
+    """Return a number in [0, 1) that is a seeded hash of key."""
+
+    digest = hashlib.md5('%s:%s' % (random_state, key)).hexdigest()
+    return int(digest[:13], 16) / float(16 ** 13)
+
+
+def _cumulative(fractions):
+    total = float(sum(fractions))
+    if total <= 0 or any(fraction < 0 for fraction in fractions):
+        raise Exception('ERROR: fractions must be non negative and not all zero: %s' % (fractions,))
+    cumulative, position = [], 0
+    for fraction in fractions:
+        position += fraction / total
+        cumulative.append(position)
+    cumulative[-1] = 1.0
+    return cumulative
+
+
+def _bisect(cumulative, value):
+    for part_id, bound in enumerate(cumulative):
+        if value < bound:
+            return part_id
+    return len(cumulative) - 1
+
+
+def _schedule(fractions, size, rng):
+    # largest remainder allotment of size slots, in random order
+    total = float(sum(fractions))
+    quotas = [size * fraction / total for fraction in fractions]
+    counts = [int(quota) for quota in quotas]
+    by_remainder = sorted(range(len(fractions)), key=lambda i: (counts[i] - quotas[i], rng.random()))
+    for part_id in by_remainder[:size - sum(counts)]:
+        counts[part_id] += 1
+    schedule = [part_id for part_id, count in enumerate(counts) for i in range(count)]
+    rng.shuffle(schedule)
+    return schedule
+
+
+def _graph_attribute(attribute):
+    def stratum(graph):
+        return graph.graph[attribute]
+    return stratum
+
+
+class PartitionAssigner(object):
+
+    """Assign items to partitions one at a time.
+
+    Parameters
+    ----------
+    fractions : list of float
+        The relative sizes of the partitions.
+
+    key : callable or None (default None)
+        Function of the item used as hash key. If None the index of the item is used.
+
+    stratify : callable, string or None (default None)
+        Function of the item returning its stratum. A string is the name of a
+        graph attribute, i.e. item.graph[stratify].
+
+    random_state : int (default 1)
+        Seed of the hash and of the stratified schedules.
+    """
+
+    def __init__(self, fractions=(.5, .5), key=None, stratify=None, random_state=1):
+        self.fractions = list(fractions)
+        self.cumulative = _cumulative(self.fractions)
+        self.key = key
+        if isinstance(stratify, basestring):
+            stratify = _graph_attribute(stratify)
+        self.stratify = stratify
+        self.random_state = random_state
+        self.index = 0
+        self._schedules = dict()
+
+    def _stratified(self, stratum):
+        if stratum not in self._schedules:
+            self._schedules[stratum] = [random.Random(hash_fraction(stratum, self.random_state)), deque()]
+        rng, schedule = self._schedules[stratum]
+        if not schedule:
+            schedule.extend(_schedule(self.fractions, SCHEDULE_SIZE, rng))
+        return schedule.popleft()
+
+    def assign(self, item):
+        """Return the partition id of the next item."""
+
+        if self.stratify is not None:
+            part_id = self._stratified(self.stratify(item))
+        else:
+            key = self.index if self.key is None else self.key(item)
+            part_id = _bisect(self.cumulative, hash_fraction(key, self.random_state))
+        self.index += 1
+        return part_id
+
+
+class _Spool(object):
+
+    """First in first out queue that keeps up to max_in_memory items in memory and
+    the following ones pickled in a temporary file in dir_path (None for the default
+    temporary directory), created when first needed."""
+
+    def __init__(self, dir_path=None, max_in_memory=MAX_QUEUED_ITEMS):
+        self.dir_path = dir_path
+        self.max_in_memory = max_in_memory
+        self.memory = deque()
+        self.file = None
+        self.read_position = self.write_position = 0
+        self.size = 0
+
+    def __len__(self):
+        return len(self.memory) + self.size
+
+    def append(self, item):
+        # the items in memory are always older than those in the file
+        if self.size == 0 and len(self.memory) < self.max_in_memory:
+            self.memory.append(item)
+            return
+        if self.file is None:
+            self.file = tempfile.TemporaryFile(dir=self.dir_path)
+        self.file.seek(self.write_position)
+        pickle.dump(item, self.file, pickle.HIGHEST_PROTOCOL)
+        self.write_position = self.file.tell()
+        self.size += 1
+
+    def popleft(self):
+        if self.memory:
+            return self.memory.popleft()
+        self.file.seek(self.read_position)
+        item = pickle.load(self.file)
+        self.read_position = self.file.tell()
+        self.size -= 1
+        if self.size == 0:
+            # reuse the space once all the queued items have been read
+            self.file.seek(0)
+            self.file.truncate()
+            self.read_position = self.write_position = 0
+        return item
+
+
+class _SharedSource(object):
+
+    def __init__(self, iterable, assigner, spool_dir=None):
+        self.iterator = iter(iterable)
+        self.assigner = assigner
+        n_parts = len(assigner.fractions)
+        if spool_dir is not None and not os.path.exists(spool_dir):
+            os.makedirs(spool_dir)
+        self.queues = [_Spool(spool_dir) for i in range(n_parts)]
+
+    def next_of(self, part_id):
+        queue = self.queues[part_id]
+        while not queue:
+            # raises StopIteration when the source is exhausted
+            item = self.iterator.next()
+            self.queues[self.assigner.assign(item)].append(item)
+        return queue.popleft()
+
+
+def _partition_iterator(source, part_id):
+    while True:
+        try:
+            item = source.next_of(part_id)
+        except StopIteration:
+            return
+        yield item
+
+
+def partition_iter(iterable, fractions=(.5, .5), key=None, stratify=None, random_state=1, spool_dir=None):
+    """Split iterable in len(fractions) partitions reading it only once.
+
+    Parameters
+    ----------
+    iterable : iterable
+        The items to split.
+
+    fractions : list of float (default (.5, .5))
+        The relative sizes of the partitions.
+
+    key : callable or None (default None)
+        Function of the item used as hash key (e.g. lambda graph: graph.graph['id']),
+        so that the partition of an item does not depend on its position.
+        If None the index of the item is used.
+
+    stratify : callable, string or None (default None)
+        Function of the item returning its stratum, or name of a graph attribute.
+        Each stratum is split in the given proportions (up to the rounding of each
+        block of SCHEDULE_SIZE items).
+
+    random_state : int (default 1)
+        Seed of the assignment.
+
+    spool_dir : string or None (default None)
+        Directory of the temporary files of the queues; if None the default
+        temporary directory is used.
+
+    Returns
+    -------
+    list of iterators, one per partition, that can be consumed in any order.
+    The items read ahead for the partitions that are not being consumed are
+    queued: at most MAX_QUEUED_ITEMS per partition in memory, the others in a
+    temporary file, so that memory stays bounded whatever the order of consumption.
+    """
+
+    assigner = PartitionAssigner(fractions=fractions, key=key, stratify=stratify, random_state=random_state)
+    source = _SharedSource(iterable, assigner, spool_dir=spool_dir)
+    return [_partition_iterator(source, part_id) for part_id in range(len(assigner.fractions))]
+
+
+def partition_to_sinks(iterable, sinks, fractions=None, key=None, stratify=None, random_state=1):
+    """Read iterable once and pass each item to the sink function of its partition.
+
+    Sinks are e.g. the append methods of GraphStore objects or of lists. Return
+    the number of items written to each sink."""
+
+    if fractions is None:
+        fractions = [1] * len(sinks)
+    if len(fractions) != len(sinks):
+        raise Exception('ERROR: %d fractions for %d sinks' % (len(fractions), len(sinks)))
+    assigner = PartitionAssigner(fractions=fractions, key=key, stratify=stratify, random_state=random_state)
+    counts = [0] * len(sinks)
+    for item in iterable:
+        part_id = assigner.assign(item)
+        sinks[part_id](item)
+        counts[part_id] += 1
+    logger.debug('Partition sizes: %s' % counts)
+    return counts
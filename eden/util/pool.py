@@ -0,0 +1,354 @@
+import atexit
+import os
+from time import time
+import shutil
+import tempfile
+import hashlib
+import threading
+import multiprocessing as mp
+from collections import OrderedDict
+import dill
+from eden import apply_async
+from eden.util import instrumentation
+import logging
+logger = logging.getLogger(__name__)
+
+# maximal number of shared states cached in each worker process
+MAX_SHARED_STATES = 4
+
+# shared states installed in the current (worker) process, indexed by token
+_shared_states = OrderedDict()
+
+
+def free_space(path):
+    """Return the number of bytes available to unprivileged users in the file system of path."""
+
+    stat = os.statvfs(path)
+    return stat.f_bavail * stat.f_frsize
+
+
+def load_shared(token):
+    """Return the shared state identified by token, loading it only the first time it is requested."""
+
+    if token in _shared_states:
+        # mark as most recently used
+        state = _shared_states.pop(token)
+    else:
+        with open(token, 'rb') as f:
+            state = dill.load(f)
+        while len(_shared_states) >= MAX_SHARED_STATES:
+            _shared_states.popitem(last=False)
+    _shared_states[token] = state
+    return state
+
+
+def run_shared(fun, token, args):
+    """Call fun(*args, **state) where state is the shared state identified by token."""
+
+    return fun(*args, **load_shared(token))
+
+
+def run_shared_task(task):
+    """Execute a task submitted by WorkerPool.map_shared.
+
+    Return the task id, the worker pid, the elapsed time and the result."""
+
+    task_id, encoded_fun, token, args = task
+    start = time()
+    result = run_shared(dill.loads(encoded_fun), token, args)
+    return task_id, os.getpid(), time() - start, result
+
+
+class WorkerPool(object):
+
+    """Managed pool of worker processes that can be reused across calls.
+
+    The worker processes are started lazily at the first submission and are
+    kept alive until close() or terminate() are called, so that the cost of
+    forking and importing is paid only once. The pool can be used as a context
+    manager to guarantee a clean shutdown.
+
+    Heavy read-only objects (e.g. a fitted vectorizer or a pre_processor) can
+    be registered once with share(): the tasks submitted with apply_shared()
+    carry only the returned token and their own data, while each worker
+    deserializes the state at most once.
+
+    Parameters
+    ----------
+    n_jobs : int (default -1)
+        The number of worker processes. A value of -1 means to use all
+        available cores.
+
+    maxtasksperchild : int (default None)
+        The number of tasks a worker process can complete before it is
+        replaced with a fresh one. None means that workers live as long as the
+        pool.
+    """
+
+    def __init__(self, n_jobs=-1, maxtasksperchild=None):
+        if n_jobs is None or n_jobs == -1:
+            n_jobs = mp.cpu_count()
+        if n_jobs < 1:
+            raise Exception('ERROR: n_jobs must be a positive integer or -1, got: %s' % n_jobs)
+        self.n_jobs = n_jobs
+        self.maxtasksperchild = maxtasksperchild
+        self._pool = None
+        self._shared_dir = None
+        self._spill_dir = None
+        self._shared_refs = dict()
+        self._n_shared_paths = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+        return False
+
+    def __getstate__(self):
+        # NOTE: the processes cannot be transferred, only the sizing is
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        state['_shared_dir'] = None
+        state['_spill_dir'] = None
+        state['_shared_refs'] = dict()
+        state.pop('_lock', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'WorkerPool(n_jobs=%d, running=%s)' % (self.n_jobs, self.is_running())
+
+    def is_running(self):
+        return self._pool is not None
+
+    def get_pool(self):
+        """Return the underlying multiprocessing pool, starting the workers if needed."""
+
+        if self._pool is None:
+            logger.debug('Starting pool of %d workers' % self.n_jobs)
+            self._pool = mp.Pool(processes=self.n_jobs, maxtasksperchild=self.maxtasksperchild)
+        return self._pool
+
+    def apply_async(self, fun, args, callback=None):
+        """Submit fun(*args) to the workers using dill as serializer."""
+
+        return apply_async(self.get_pool(), fun, args, callback=callback)
+
+    def share(self, **state):
+        """Register the keyword arguments as a shared state and return its token.
+
+        Sharing the same content twice returns the same token, so that workers
+        that have already installed the state do not load it again.
+        """
+
+        payload = dill.dumps(state)
+        instrumentation.count('pool.share', bytes=len(payload))
+        with self._lock:
+            token = os.path.join(self._get_shared_dir(), hashlib.sha1(payload).hexdigest() + '.dill')
+            if token not in self._shared_refs:
+                with open(token, 'wb') as f:
+                    f.write(payload)
+                self._shared_refs[token] = 0
+            self._shared_refs[token] += 1
+        return token
+
+    def shared_path(self, prefix, size=None):
+        """Return a new path in the shared directory of the pool.
+
+        The directory is memory backed when possible and is removed when the pool is closed.
+        If size is not None the path is in a file system with at least size bytes available:
+        when the memory backed one (e.g. a small /dev/shm in a container) is too small a
+        directory in the temporary directory is used, and if also that is too small None is
+        returned."""
+
+        with self._lock:
+            self._n_shared_paths += 1
+            name = '%s_%d' % (prefix, self._n_shared_paths)
+            shared_dir = self._get_shared_dir()
+            if size is None or free_space(shared_dir) >= size:
+                return os.path.join(shared_dir, name)
+            if free_space(tempfile.gettempdir()) >= size:
+                if self._spill_dir is None:
+                    self._spill_dir = tempfile.mkdtemp(prefix='eden_pool_')
+                logger.debug('Not enough space in %s for %d bytes: using %s' % (shared_dir, size, self._spill_dir))
+                return os.path.join(self._spill_dir, name)
+            logger.debug('Not enough space for %d bytes in %s and %s' % (size, shared_dir, tempfile.gettempdir()))
+            return None
+
+    def _get_shared_dir(self):
+        if self._shared_dir is None:
+            # prefer a memory backed file system when available
+            base_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+            self._shared_dir = tempfile.mkdtemp(prefix='eden_pool_', dir=base_dir)
+        return self._shared_dir
+
+    def release(self, token):
+        """Release the shared state identified by token; the state is removed when no caller uses it."""
+
+        with self._lock:
+            if token in self._shared_refs:
+                self._shared_refs[token] -= 1
+                if self._shared_refs[token] == 0:
+                    self._shared_refs.pop(token)
+                    if os.path.exists(token):
+                        os.remove(token)
+
+    def apply_shared(self, fun, token, args, callback=None):
+        """Submit fun(*args, **state) where state is the shared state identified by token."""
+
+        return self.apply_async(run_shared, (fun, token, args), callback=callback)
+
+    def map_shared(self, fun, token, args_list):
+        """Apply fun(*args, **state) to each args tuple in args_list and return the results in order.
+
+        Tasks are dispatched one at a time to the first idle worker and collected in
+        completion order, so that a few expensive tasks do not leave the other workers
+        idle; the original order is restored at the end. The per-worker utilization is
+        logged at debug level.
+        """
+
+        start = time()
+        # only the function needs dill, the data travels with the native pickler
+        encoded_fun = dill.dumps(fun)
+        tasks = ((task_id, encoded_fun, token, args) for task_id, args in enumerate(args_list))
+        results = dict()
+        busy_time = dict()
+        n_tasks = dict()
+        for task_id, pid, elapsed, result in self.get_pool().imap_unordered(run_shared_task, tasks, chunksize=1):
+            results[task_id] = result
+            busy_time[pid] = busy_time.get(pid, 0) + elapsed
+            n_tasks[pid] = n_tasks.get(pid, 0) + 1
+        self._log_utilization(time() - start, busy_time, n_tasks)
+        instrumentation.add('pool.map_shared', time() - start, tasks=len(results))
+        return [results[task_id] for task_id in range(len(results))]
+
+    def _log_utilization(self, wall_time, busy_time, n_tasks):
+        if not logger.isEnabledFor(logging.DEBUG) or wall_time <= 0:
+            return
+        text = []
+        text.append('Worker utilization over %.2f sec (%d tasks on %d/%d workers):' %
+                    (wall_time, sum(n_tasks.values()), len(n_tasks), self.n_jobs))
+        for pid in sorted(busy_time):
+            text.append('  worker %d: %3d tasks  busy %.2f sec (%3.0f%%)' %
+                        (pid, n_tasks[pid], busy_time[pid], 100 * busy_time[pid] / wall_time))
+        text.append('  mean utilization: %.0f%%' % (100 * sum(busy_time.values()) / (wall_time * self.n_jobs)))
+        logger.debug('\n'.join(text))
+
+    def map(self, fun, args_list):
+        """Apply fun to each args tuple in args_list and return the results in order."""
+
+        results = [self.apply_async(fun, args) for args in args_list]
+        return [result.get() for result in results]
+
+    def close(self):
+        """Wait for the submitted tasks to complete and stop the workers."""
+
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+            logger.debug('Closed pool of %d workers' % self.n_jobs)
+        self._remove_shared_dir()
+
+    def terminate(self):
+        """Stop the workers immediately without completing outstanding work."""
+
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            logger.debug('Terminated pool of %d workers' % self.n_jobs)
+        self._remove_shared_dir()
+
+    def _remove_shared_dir(self):
+        if self._shared_dir is not None:
+            shutil.rmtree(self._shared_dir, ignore_errors=True)
+            self._shared_dir = None
+            self._shared_refs = dict()
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+
+
+_default_pools = dict()
+
+
+def get_default_pool(n_jobs=-1):
+    """Return the module-level pool with n_jobs workers, creating it if needed.
+
+    Default pools are shared by all the callers that do not provide an explicit
+    pool and are shut down at interpreter exit.
+    """
+
+    if n_jobs is None or n_jobs == -1:
+        n_jobs = mp.cpu_count()
+    if n_jobs not in _default_pools:
+        _default_pools[n_jobs] = WorkerPool(n_jobs=n_jobs)
+    return _default_pools[n_jobs]
+
+
+def resolve_pool(pool=None, n_jobs=-1):
+    """Return pool if given, otherwise the default pool with n_jobs workers."""
+
+    if pool is not None:
+        return pool
+    return get_default_pool(n_jobs=n_jobs)
+
+
+class BackgroundTask(object):
+
+    """Call fun(*args, **kwargs) in a daemon thread.
+
+    Useful to overlap work that is mostly done by the workers of a pool (e.g.
+    vectorizing the next batch of instances) with computations in the calling
+    thread. The result, or the exception raised by fun, is returned, or raised,
+    by result()."""
+
+    def __init__(self, fun, *args, **kwargs):
+        self._result = self._error = None
+        self._thread = threading.Thread(target=self._run, args=(fun, args, kwargs))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, fun, args, kwargs):
+        try:
+            self._result = fun(*args, **kwargs)
+        except Exception as e:
+            self._error = e
+
+    def done(self):
+        return not self._thread.is_alive()
+
+    def result(self):
+        """Wait for the end of the task and return its result."""
+
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+def max_n_jobs(*n_jobs_list):
+    """Return the largest number of jobs, where -1 (all cores) dominates any other value."""
+
+    if -1 in n_jobs_list:
+        return -1
+    return max(n_jobs_list)
+
+
+def shutdown_default_pools():
+    """Close all the module-level default pools."""
+
+    for n_jobs in list(_default_pools):
+        _default_pools.pop(n_jobs).close()
+
+
+atexit.register(shutdown_default_pools)
@@ -0,0 +1,170 @@
+"""Streaming readers for local files and URLs.
+
+Inputs are read in large chunks and split into lines (or records) on the
+fly, so that memory use does not depend on the size of the input. gzip,
+bzip2 and xz compressed inputs are recognized from their first bytes and
+decompressed incrementally; large uncompressed local files are memory
+mapped instead of being read through an additional buffer.
+"""
+
+import os
+import re
+import mmap
+import zlib
+import bz2
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+import logging
+logger = logging.getLogger(__name__)
+
+# size of the chunks read from the input
+CHUNK_SIZE = 4 * 1024 * 1024
+# uncompressed local files at least this large are memory mapped
+MMAP_MIN_SIZE = 64 * 1024 * 1024
+
+URL_PATTERN = re.compile(r'^(https?|ftp)://', re.IGNORECASE)
+
+GZIP_MAGIC = b'\x1f\x8b'
+BZIP2_MAGIC = b'BZh'
+XZ_MAGIC = b'\xfd7zXZ\x00'
+
+
+def is_url(uri):
+    return URL_PATTERN.match(uri) is not None
+
+
+def _file_chunks(path, chunk_size=CHUNK_SIZE):
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        if size >= MMAP_MIN_SIZE:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for start in range(0, size, chunk_size):
+                    yield data[start:start + chunk_size]
+            finally:
+                data.close()
+        else:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+
+def _url_chunks(url, chunk_size=CHUNK_SIZE):
+    import requests
+    response = requests.get(url, stream=True)
+    response.raise_for_status()
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        if chunk:
+            yield chunk
+
+
+def _decompressor(head):
+    if head.startswith(GZIP_MAGIC):
+        # accept the gzip header and trailer
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if head.startswith(BZIP2_MAGIC):
+        return bz2.BZ2Decompressor()
+    if head.startswith(XZ_MAGIC):
+        if lzma is None:
+            raise Exception('ERROR: reading xz compressed input requires the lzma module '
+                            '(backports.lzma on Python 2)')
+        return lzma.LZMADecompressor()
+    return None
+
+
+def _decompressed(chunks, decompressor, head):
+    # concatenated streams (e.g. from bgzip, pbzip2, xz -T or cat) are decoded
+    # one after the other, restarting the decompressor on the unused data
+    is_xz = head.startswith(XZ_MAGIC)
+    restarted = False
+    for chunk in chunks:
+        while chunk:
+            if restarted and is_xz:
+                # xz streams may be separated by null byte padding
+                chunk = chunk.lstrip(b'\x00')
+                if not chunk:
+                    break
+            try:
+                data = decompressor.decompress(chunk)
+            except EOFError:
+                # the previous bz2 or xz stream ended exactly at a chunk boundary
+                decompressor = _decompressor(head)
+                restarted = True
+                continue
+            restarted = False
+            if data:
+                yield data
+            chunk = decompressor.unused_data
+            if chunk:
+                decompressor = _decompressor(head)
+                restarted = True
+    if hasattr(decompressor, 'flush'):
+        data = decompressor.flush()
+        if data:
+            yield data
+
+
+def read_chunks(uri, chunk_size=CHUNK_SIZE):
+    """Yield the content of a local file or URL in chunks, decompressing it if needed."""
+
+    if is_url(uri):
+        chunks = _url_chunks(uri, chunk_size=chunk_size)
+    else:
+        chunks = _file_chunks(uri, chunk_size=chunk_size)
+    for head in chunks:
+        decompressor = _decompressor(head)
+        if decompressor is None:
+            yield head
+            for chunk in chunks:
+                yield chunk
+        else:
+            logger.debug('Decompressing %s' % uri)
+            for chunk in _decompressed(_prepend(head, chunks), decompressor, head):
+                yield chunk
+        break
+
+
+def _prepend(item, iterator):
+    yield item
+    for other in iterator:
+        yield other
+
+
+def read_lines(uri, chunk_size=CHUNK_SIZE):
+    """Yield the lines of a local file or URL, including the line terminators."""
+
+    remainder = b''
+    for chunk in read_chunks(uri, chunk_size=chunk_size):
+        lines = (remainder + chunk).splitlines(True)
+        if lines and not lines[-1].endswith(b'\n'):
+            # incomplete last line (or a \r that could be followed by \n)
+            remainder = lines.pop()
+        else:
+            remainder = b''
+        for line in lines:
+            yield line
+    if remainder:
+        yield remainder
+
+
+def read_records(uri, separator='$$$$', chunk_size=CHUNK_SIZE):
+    """Yield the records of a local file or URL, each record ending with a separator line.
+
+    The separator line is included in the record, e.g. for SDF files where records end
+    with '$$$$'. Content after the last separator is yielded as a final record."""
+
+    lines = []
+    for line in read_lines(uri, chunk_size=chunk_size):
+        lines.append(line)
+        if line.strip() == separator:
+            yield ''.join(lines)
+            lines = []
+    if ''.join(lines).strip():
+        yield ''.join(lines)
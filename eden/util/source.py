@@ -0,0 +1,113 @@
+"""Sources that can be iterated more than once.
+
+Several stages (fitting a vectorizer and then transforming, building the
+data matrices of successive optimization iterations, selecting instances
+in active learning) need to read the same instances more than once. Rather
+than duplicating one-shot iterators with itertools.tee, which silently
+keeps in memory everything one branch has read and the others have not,
+these stages ask for a replayable source and iterate it again:
+
+- lists, tuples and other containers are iterated again;
+- ReplayableSource re-opens its input, e.g. re-reading a file with a loader;
+- GraphStore objects re-read the encoded graphs from disk;
+- CachedSource keeps in memory all the items of a one-shot iterator for its
+  whole life; it is used only on explicit request, with cache=True.
+
+Without cache, replayable() refuses one-shot iterators, while fan_out()
+falls back to itertools.tee, which drops the items once all the copies have
+read them: this costs little memory when the copies advance together.
+"""
+
+from itertools import tee
+import logging
+logger = logging.getLogger(__name__)
+
+
+class ReplayableSource(object):
+
+    """Source that calls factory(*args, **kwargs) to obtain a new iterator at each iteration.
+
+    Example: ReplayableSource(fasta_to_sequence, 'seqs.fa.gz') re-reads the file
+    each time it is iterated."""
+
+    def __init__(self, factory, *args, **kwargs):
+        self.factory = factory
+        self.args = args
+        self.kwargs = kwargs
+
+    def __iter__(self):
+        return iter(self.factory(*self.args, **self.kwargs))
+
+    def __repr__(self):
+        return 'ReplayableSource(%s)' % getattr(self.factory, '__name__', self.factory)
+
+
+class CachedSource(object):
+
+    """Memory cache of a one-shot iterator.
+
+    The items are read from the iterator as the first iteration proceeds and are
+    replayed from memory by the following (or concurrent) iterations."""
+
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+        self.items = []
+        self.exhausted = False
+
+    def _fill(self, position):
+        while not self.exhausted and position >= len(self.items):
+            try:
+                self.items.append(self.iterator.next())
+            except StopIteration:
+                self.exhausted = True
+                self.iterator = None
+                logger.debug('Cached %d instances in memory' % len(self.items))
+
+    def __iter__(self):
+        position = 0
+        while True:
+            self._fill(position)
+            if position >= len(self.items):
+                return
+            yield self.items[position]
+            position += 1
+
+    def __len__(self):
+        self._fill(float('inf'))
+        return len(self.items)
+
+
+def is_replayable(iterable):
+    """Return True if iterating iterable again yields the same items again.
+
+    Iterators (generators, files, itertools objects) return themselves from iter()
+    and can be read only once; containers and the sources in this module do not."""
+
+    return iter(iterable) is not iterable
+
+
+def replayable(iterable, cache=False):
+    """Return a source equivalent to iterable that can be iterated more than once.
+
+    Replayable inputs are returned as they are. One-shot iterators are wrapped in a
+    CachedSource if cache is True, otherwise an exception is raised: in that case
+    pass a ReplayableSource, a GraphStore or a list instead."""
+
+    if is_replayable(iterable):
+        return iterable
+    if cache is False:
+        raise Exception('ERROR: %s can be read only once; use a ReplayableSource or enable caching' %
+                        type(iterable).__name__)
+    return CachedSource(iterable)
+
+
+def fan_out(iterable, n_copies=2, cache=False):
+    """Return n_copies iterators over the items of iterable, re-reading it when possible.
+
+    One-shot iterators are duplicated with itertools.tee, or with a CachedSource if
+    cache is True."""
+
+    if is_replayable(iterable) or cache:
+        source = replayable(iterable, cache=cache)
+        return [iter(source) for i in range(n_copies)]
+    return list(tee(iterable, n_copies))
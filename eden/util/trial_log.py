@@ -0,0 +1,114 @@
+"""Append-only log of the configurations evaluated by a hyperparameter search.
+
+Each trial is written as one JSON object per line and flushed to disk at
+once, so that the log survives the death of the process; a partially
+written last line is ignored when the log is read back. The log is used to
+resume a search: configurations already in the log are not evaluated
+again and the iteration count continues from the last logged iteration.
+"""
+
+import os
+import json
+import logging
+logger = logging.getLogger(__name__)
+
+
+def _native(value):
+    # JSON decodes strings as unicode and tuples as lists: strings are converted back
+    # so that the parameters read from the log compare equal to freshly sampled ones
+    if isinstance(value, unicode):
+        try:
+            return str(value)
+        except UnicodeEncodeError:
+            return value
+    if isinstance(value, list):
+        return [_native(item) for item in value]
+    if isinstance(value, dict):
+        return dict((_native(key), _native(item)) for key, item in value.items())
+    return value
+
+
+def trial_key(pre_processor_args, vectorizer_args, estimator_args):
+    """Return the string identifying a configuration."""
+
+    return repr((sorted(pre_processor_args.items()),
+                 sorted(vectorizer_args.items()),
+                 sorted(estimator_args.items())))
+
+
+class TrialLog(object):
+
+    """JSON lines file of trial records.
+
+    Parameters
+    ----------
+    path : string
+        The path of the log file.
+
+    resume : bool (default True)
+        If True the records of an existing log are loaded and new records are
+        appended to it, otherwise the log is started anew.
+    """
+
+    def __init__(self, path, resume=True):
+        self.path = path
+        self.records = []
+        if resume and os.path.exists(path):
+            self._load()
+        elif os.path.exists(path):
+            os.remove(path)
+        self._keys = dict((record['key'], record) for record in self.records if 'key' in record)
+
+    def _load(self):
+        n_corrupted = 0
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    self.records.append(_native(json.loads(line)))
+                except ValueError:
+                    n_corrupted += 1
+        if n_corrupted:
+            logger.warning('Skipped %d incomplete records in %s' % (n_corrupted, self.path))
+            # rewrite the log without the incomplete records
+            with open(self.path + '.tmp', 'w') as f:
+                for record in self.records:
+                    f.write(json.dumps(record, default=repr) + '\n')
+            os.rename(self.path + '.tmp', self.path)
+        logger.info('Loaded %d trials from %s' % (len(self.records), self.path))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def get(self, key):
+        return self._keys.get(key)
+
+    def append(self, record):
+        """Write record (a dict, with the configuration identifier under 'key') to the log."""
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        line = json.dumps(record, default=repr)
+        with open(self.path, 'a') as f:
+            f.write(line + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.records.append(record)
+        if 'key' in record:
+            self._keys[record['key']] = record
+
+    def last_iteration(self):
+        """Return the largest logged iteration, -1 if the log is empty."""
+
+        return max([record.get('iteration', -1) for record in self.records] + [-1])
+
+    def best(self):
+        """Return the record of the trial with the best score among those that improved the best score."""
+
+        improved = [record for record in self.records if record.get('improved')]
+        if not improved:
+            return None
+        return max(improved, key=lambda record: record['score'])
@@ -104,6 +104,7 @@ setup(
               ],
     scripts=['bin/alignment',
              'bin/model',
+             'bin/model_client',
              'bin/motif',
              'bin/location_predictor',
              'bin/motif_display.py',
@@ -0,0 +1,34 @@
+import time
+from eden.util.checkpoint import SnapshotTracker, AsyncCheckpointer
+
+
+class TestCheckpoint:
+
+    def test_snapshot_tracker(self):
+        """Test that components are copied only when their version changes."""
+
+        tracker = SnapshotTracker()
+        value = {'a': [1]}
+        first = tracker.snapshot('value', value, version=1)
+        value['a'].append(2)
+        assert(tracker.snapshot('value', value, version=1) is first and first == {'a': [1]})
+        assert(tracker.snapshot('value', value, version=2) == {'a': [1, 2]})
+        assert(tracker.n_copies == 2)
+
+    def test_async_checkpointer(self):
+        """Test that saves are debounced and that the last snapshot is always saved."""
+
+        saved = []
+
+        def save(snapshot):
+            time.sleep(0.05)
+            saved.append(snapshot)
+
+        checkpointer = AsyncCheckpointer(save, min_interval=60)
+        for i in range(20):
+            checkpointer.submit(i)
+        checkpointer.flush()
+        assert(saved[-1] == 19 and len(saved) <= 2)
+        checkpointer.submit(20)
+        checkpointer.close()
+        assert(saved[-1] == 20)
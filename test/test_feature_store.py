@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+from scipy.sparse import vstack
+from scipy.io import mmread
+from sklearn.datasets import load_svmlight_file
+from eden.converter.fasta import sequence_to_eden
+from eden.graph import Vectorizer
+from eden.util import store_matrix
+from eden.util.feature_store import FeatureStore
+from eden.util.matrix_cache import DataMatrixCache, matrix_nbytes
+from eden.util.matrix_writer import matrix_writer
+from test_vectorize import make_seqs
+
+
+class TestFeatureStore:
+
+    def setup(self):
+        self.dir_path = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir_path, 'store')
+        self.vectorizer = Vectorizer(complexity=2)
+        self.seqs = make_seqs(n_seqs=30)
+        self.data_matrix = self.vectorizer.transform(sequence_to_eden(self.seqs))
+        self.ids = [header for header, seq in self.seqs]
+        self.target = np.array([1, -1] * 15)
+
+    def teardown(self):
+        shutil.rmtree(self.dir_path)
+
+    def test_append_and_read(self):
+        """Test appending shards and reading back row ranges and row subsets across shards."""
+
+        store = FeatureStore(self.path)
+        for start, end in [(0, 12), (12, 20), (20, 30)]:
+            store.append(self.data_matrix[start:end], ids=self.ids[start:end], target=self.target[start:end])
+        store.set_info(info={'source': 'test'}, vectorizer=self.vectorizer)
+        store = FeatureStore(self.path)
+        assert(store.shape == self.data_matrix.shape and store.n_shards == 3)
+        assert(store.info == {'source': 'test'})
+        assert(store.vectorizer['params'] == self.vectorizer.get_params())
+        assert((store.to_csr() - self.data_matrix).nnz == 0)
+        assert((store.read_rows(10, 25) - self.data_matrix[10:25]).nnz == 0)
+        rows = [25, 3, 14, 3, 0]
+        assert((store.take(rows) - vstack([self.data_matrix[row] for row in rows])).nnz == 0)
+        assert(store.ids(10, 25) == self.ids[10:25])
+        assert(list(store.target()) == list(self.target))
+
+    def test_store_matrix(self):
+        """Test the feature_store output format of store_matrix."""
+
+        store_matrix(matrix=self.data_matrix, output_dir_path=self.dir_path, out_file_name='data_matrix',
+                     output_format='feature_store', ids=self.ids)
+        store = FeatureStore(os.path.join(self.dir_path, 'data_matrix'))
+        assert((store.to_csr() - self.data_matrix).nnz == 0)
+        assert(store.ids() == self.ids)
+
+    def test_matrix_writers(self):
+        """Test that the streaming writers write the blocks and their ids in step."""
+
+        readers = {'feature_store': lambda path: FeatureStore(path).to_csr(),
+                   'MatrixMarket': lambda path: mmread(path + '.mtx'),
+                   'svmlight': lambda path: load_svmlight_file(path + '.svmlight', zero_based=True,
+                                                               n_features=self.data_matrix.shape[1])[0]}
+        for output_format in ['feature_store', 'MatrixMarket', 'svmlight']:
+            writer = matrix_writer(self.path, output_format, vectorizer=self.vectorizer)
+            for start, end in [(0, 12), (12, 20), (20, 30)]:
+                writer.write(self.data_matrix[start:end], ids=self.ids[start:end])
+            writer.close()
+            data_matrix = readers[output_format](self.path)
+            assert(data_matrix.shape == self.data_matrix.shape)
+            assert(abs(data_matrix - self.data_matrix).max() < 1e-12)
+        assert(FeatureStore(self.path).ids() == self.ids)
+        with open(self.path + '.svmlight.ids') as f:
+            assert(f.read().split() == self.ids)
+
+    def test_data_matrix_cache(self):
+        """Test that the least recently used matrices are spilled to disk and read back."""
+
+        cache = DataMatrixCache(memory_budget=int(1.5 * matrix_nbytes(self.data_matrix, self.target)),
+                                spill_dir=self.dir_path)
+        for key in ['a', 'b', 'c']:
+            cache.put(key, self.data_matrix, self.target)
+        assert(len(cache) == 3 and cache.get('d') is None)
+        for key in ['a', 'b', 'c']:
+            data_matrix, target = cache.get(key)
+            assert((data_matrix - self.data_matrix).nnz == 0 and list(target) == list(self.target))
+        assert(len(os.listdir(self.dir_path)) == 2)
+        cache.clear()
+        assert(len(os.listdir(self.dir_path)) == 0)
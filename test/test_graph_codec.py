@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import pickle
+import networkx as nx
+from eden.converter.fasta import sequence_to_eden
+from eden.graph import Vectorizer
+from eden.util import mp_pre_process
+from eden.util.pool import WorkerPool
+from eden.util.graph_codec import encode_graph, decode_graph, GraphView, GraphStore
+from test_vectorize import make_seqs
+
+
+def assert_same_graph(graph, other):
+    assert(graph.is_directed() == other.is_directed())
+    assert(graph.graph == other.graph)
+    assert(sorted(graph.nodes(data=True)) == sorted(other.nodes(data=True)))
+    assert(sorted(graph.edges(data=True)) == sorted(other.edges(data=True)))
+
+
+class TestGraphCodec:
+
+    def test_round_trip(self):
+        """Test that encoding and decoding preserves nodes, edges and all the attributes."""
+
+        graph = nx.DiGraph(id='G1', sequence='AC', structure='..')
+        graph.add_node('a', label='A', position=0, weight=0.5, node=True)
+        graph.add_node('b', label=[1, 2], position=2 ** 40)
+        graph.add_node('c', label='C', position=-1, weight=1.0)
+        graph.add_edge('a', 'b', label='-')
+        graph.add_edge('b', 'c', label='=', weight=2.0)
+        assert_same_graph(graph, decode_graph(encode_graph(graph)))
+        for graph in sequence_to_eden(make_seqs(n_seqs=5)):
+            assert_same_graph(graph, decode_graph(encode_graph(graph)))
+
+    def test_vectorize_views(self):
+        """Test that GraphView objects are vectorized as the corresponding networkx graphs."""
+
+        seqs = make_seqs()
+        vectorizer = Vectorizer(complexity=2)
+        data_matrix = vectorizer.transform(sequence_to_eden(seqs))
+        views = [GraphView(encode_graph(graph)) for graph in sequence_to_eden(seqs)]
+        views = pickle.loads(pickle.dumps(views, pickle.HIGHEST_PROTOCOL))
+        assert((vectorizer.transform(views) - data_matrix).nnz == 0)
+        with WorkerPool(n_jobs=2) as pool:
+            graphs = mp_pre_process(seqs, pre_processor=sequence_to_eden, n_jobs=2, pool=pool, as_views=True)
+        assert(all(isinstance(graph, GraphView) for graph in graphs))
+        assert((vectorizer.transform(graphs) - data_matrix).nnz == 0)
+
+    def test_graph_store(self):
+        """Test writing, appending and memory mapped reading of a graph store."""
+
+        graphs = list(sequence_to_eden(make_seqs(n_seqs=10)))
+        dir_path = tempfile.mkdtemp()
+        try:
+            path = os.path.join(dir_path, 'graphs.bin')
+            with GraphStore(path, mode='w') as store:
+                store.extend(graphs[:6])
+            with GraphStore(path, mode='a') as store:
+                store.extend(graphs[6:])
+            store = GraphStore(path)
+            assert(len(store) == len(graphs))
+            for graph, view in zip(graphs, store):
+                assert_same_graph(graph, view.to_networkx())
+            assert(store[-1].graph['id'] == graphs[-1].graph['id'])
+        finally:
+            shutil.rmtree(dir_path)
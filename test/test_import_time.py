@@ -0,0 +1,36 @@
+import sys
+import subprocess
+
+# modules that are loaded at first use only, not when the command line tools start
+LAZY_MODULES = ['sklearn.grid_search', 'sklearn.cross_validation', 'sklearn.metrics', 'sklearn.cluster',
+                'sklearn.linear_model', 'scipy.io', 'scipy.stats', 'requests', 'matplotlib', 'pymf', 'sknn']
+
+# generous upper bound on the import time of eden.model_base in a fresh interpreter, in seconds
+IMPORT_TIME_BUDGET = 2.0
+
+# analysis modules that must not load the lazy modules at import time either
+ANALYSIS_MODULES = ['eden.embedding', 'eden.embedder', 'eden.selector', 'eden.auto_cluster',
+                    'eden.iterated_semisupervised_feature_selection']
+
+PROBE = """
+import sys
+from time import time
+start = time()
+import eden.model_base
+elapsed = time() - start
+for name in %r:
+    __import__(name)
+print(elapsed)
+print(' '.join(name for name in %r if name in sys.modules))
+""" % (ANALYSIS_MODULES, LAZY_MODULES)
+
+
+class TestImportTime:
+
+    def test_import_time(self):
+        """Test that importing the command line entry point is fast and that it and the analysis modules load no heavy optional module."""
+
+        output = subprocess.check_output([sys.executable, '-W', 'ignore', '-c', PROBE])
+        elapsed, loaded = (output.split('\n') + [''])[:2]
+        assert(loaded.strip() == ''), 'eagerly imported: %s' % loaded
+        assert(float(elapsed) < IMPORT_TIME_BUDGET), 'import took %s sec' % elapsed
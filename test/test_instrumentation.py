@@ -0,0 +1,26 @@
+from eden.converter.fasta import sequence_to_eden
+from eden.graph import Vectorizer
+from eden.util import instrumentation
+from test_vectorize import make_seqs
+
+
+class TestInstrumentation:
+
+    def test_vectorize_stages(self):
+        """Test that the vectorization stages are recorded only when instrumentation is enabled."""
+
+        seqs = make_seqs(n_seqs=20, random_state=1)
+        vectorizer = Vectorizer(complexity=2)
+        instrumentation.enable()
+        try:
+            data_matrix = vectorizer.transform(sequence_to_eden(seqs))
+            stages = instrumentation.stages()
+        finally:
+            instrumentation.disable()
+        assert(stages['vectorize.bfs']['n_calls'] == len(seqs))
+        assert(stages['vectorize.normalization']['counts']['instances'] == len(seqs))
+        assert(stages['vectorize.sparse_matrix']['counts']['nnz'] == data_matrix.nnz)
+        assert('vectorize.bfs' in instrumentation.report())
+        instrumentation.reset()
+        vectorizer.transform(sequence_to_eden(seqs))
+        assert(len(instrumentation.stages()) == 0)
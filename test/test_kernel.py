@@ -0,0 +1,28 @@
+import os
+import tempfile
+import shutil
+import numpy as np
+from scipy.sparse import random as sparse_random
+from eden.util.kernel import gram_matrix
+from eden.util.pool import WorkerPool
+
+
+class TestKernel:
+
+    def test_gram_matrix(self):
+        """Test that the blockwise Gram matrix equals the direct product, serially and with a pool."""
+
+        data_matrix = sparse_random(23, 50, density=.2, format='csr', random_state=1)
+        expected = (data_matrix * data_matrix.T).toarray()
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'gram.npy')
+            assert(np.allclose(gram_matrix(data_matrix, path=path, block_size=5, n_jobs=1), expected))
+            with WorkerPool(n_jobs=2) as pool:
+                kernel_matrix = gram_matrix(data_matrix, path=path, block_size=5, dtype=np.float32, pool=pool)
+                assert(kernel_matrix.dtype == np.float32 and np.allclose(kernel_matrix, expected, atol=1e-6))
+                top_k_matrix = gram_matrix(data_matrix, block_size=5, top_k=3, pool=pool)
+            assert((top_k_matrix.getnnz(axis=1) == 3).all())
+            assert(np.allclose(np.sort(top_k_matrix.toarray(), axis=1)[:, -3:], np.sort(expected, axis=1)[:, -3:]))
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import shutil
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from eden.converter.fasta import sequence_to_eden
+from eden.graph import Vectorizer
+from eden.model import ActiveLearningBinaryClassificationModel
+from eden.scorer import CompiledScorer
+from eden.util.trial_log import TrialLog
+from test_vectorize import make_seqs
+
+
+def pre_processor(seqs, **args):
+    return sequence_to_eden(seqs)
+
+
+class TestModel:
+
+    def test_chunked_decision_function(self):
+        """Test that the chunked predictions match those computed on the whole data matrix."""
+
+        seqs = make_seqs(n_seqs=50)
+        model = ActiveLearningBinaryClassificationModel(pre_processor=pre_processor,
+                                                        vectorizer=Vectorizer(complexity=2),
+                                                        estimator=SGDClassifier(random_state=1),
+                                                        n_jobs=1, pre_processor_n_jobs=1)
+        model.fit_default(seqs[:25], seqs[25:], dict(), dict(), dict())
+        margins = model.decision_function(seqs)
+        assert(np.allclose(model.decision_function(seqs, chunk_size=7), margins))
+        assert((model.predict(iter(seqs), chunk_size=7) == model.predict(seqs)).all())
+        margins_info = list(model.decision_function_info(iter(seqs), key='id', chunk_size=7))
+        assert([info for margin, info in margins_info] == [id for id, seq in seqs])
+        assert(np.allclose([margin for margin, info in margins_info], margins))
+        assert(len(model.decision_function([], chunk_size=7)) == 0 and len(model.predict([], chunk_size=7)) == 0)
+
+    def test_compile(self):
+        """Test that the compiled scorer reproduces the margins of the model."""
+
+        seqs = make_seqs(n_seqs=50)
+        model = ActiveLearningBinaryClassificationModel(pre_processor=pre_processor,
+                                                        vectorizer=Vectorizer(complexity=2, r=1, nbits=16),
+                                                        estimator=SGDClassifier(penalty='l1', random_state=1),
+                                                        n_jobs=1, pre_processor_n_jobs=1)
+        model.fit_default(seqs[:25], seqs[25:], dict(), dict(), dict())
+        directory = tempfile.mkdtemp()
+        try:
+            model.compile(directory)
+            scorer = CompiledScorer(directory)
+            assert(len(scorer.hashes) == np.count_nonzero(model.estimator.coef_))
+            data_matrix = model._data_matrix(seqs)
+            assert(np.allclose(scorer.decision_function(data_matrix), model.decision_function(seqs)))
+            assert((scorer.predict(data_matrix) == model.predict(seqs)).all())
+            assert(np.allclose(scorer.decision_function_graphs(pre_processor(seqs)), model.decision_function(seqs)))
+            assert(scorer.vectorizer().get_params() == model.vectorizer.get_params())
+            model.description = object()
+            try:
+                model.compile(directory)
+                assert(False)
+            except Exception as e:
+                assert('ERROR' in str(e))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_resume_scores_from_checkpoint(self):
+        """Test that a resumed search takes the best score from the checkpointed model, not from the log."""
+
+        seqs = make_seqs(n_seqs=60)
+        directory = tempfile.mkdtemp()
+        try:
+            model_name = os.path.join(directory, 'model')
+            trial_log_path = os.path.join(directory, 'trials.jsonl')
+            args = dict(model_name=model_name, n_inner_iter_estimator=2, cv=3, trial_log_path=trial_log_path,
+                        vectorizer_parameters={'complexity': [2]},
+                        estimator_parameters={'alpha': [1e-4, 1e-3, 1e-2], 'penalty': ['l1', 'l2']})
+            model = ActiveLearningBinaryClassificationModel(pre_processor=pre_processor,
+                                                            estimator=SGDClassifier(random_state=1),
+                                                            n_jobs=1, pre_processor_n_jobs=1)
+            model.optimize(seqs[:30], seqs[30:], n_iter=2, **args)
+            best_scores = model.best_scores_
+            # an improvement logged just before a crash, whose model was never checkpointed
+            log = TrialLog(trial_log_path)
+            log.append(dict(iteration=1, key='lost', improved=True, score=2.0, score_mean=2.0, score_std=0.0,
+                            pre_processor_args={}, vectorizer_args={'complexity': 2},
+                            estimator_args={'alpha': 1e-2, 'penalty': 'l1'}))
+            model = ActiveLearningBinaryClassificationModel(pre_processor=pre_processor,
+                                                            estimator=SGDClassifier(random_state=1),
+                                                            n_jobs=1, pre_processor_n_jobs=1)
+            model.optimize(seqs[:30], seqs[30:], n_iter=3, resume=True, **args)
+            assert(best_scores[0] <= model.best_scores_[0] <= 1)
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,43 @@
+import shutil
+import tempfile
+from eden.util import random_bipartition_iter
+from eden.util.partition import partition_iter, partition_to_sinks
+
+
+def counting(n_items, counter):
+    for i in range(n_items):
+        counter[0] += 1
+        yield i
+
+
+class TestPartition:
+
+    def test_single_pass(self):
+        """Test that the parts cover the input once, reading it once, whatever the order of consumption."""
+
+        counter = [0]
+        part1, part2 = random_bipartition_iter(counting(1000, counter), relative_size=.7)
+        part2, part1 = list(part2), list(part1)
+        assert(counter[0] == 1000)
+        assert(sorted(part1 + part2) == range(1000))
+        assert(part1 == sorted(part1) and 600 < len(part1) < 800)
+        assert(random_bipartition_iter(range(1000), relative_size=.7)[0].next() == part1[0])
+
+        dir_path = tempfile.mkdtemp()
+        try:
+            parts = partition_iter(range(6000), fractions=[1, 1, 2], spool_dir=dir_path)
+            parts = [list(part) for part in reversed(parts)]
+            assert(sorted(sum(parts, [])) == range(6000))
+            assert(all(part == sorted(part) for part in parts))
+        finally:
+            shutil.rmtree(dir_path)
+
+    def test_stratified(self):
+        """Test that each stratum is split in the requested proportions."""
+
+        items = [(i, i % 3 == 0) for i in range(3000)]
+        parts = [[], []]
+        counts = partition_to_sinks(items, [part.append for part in parts], fractions=[.8, .2],
+                                    stratify=lambda item: item[1])
+        assert(counts == [2400, 600])
+        assert(sum(1 for i, label in parts[1] if label) == 200)
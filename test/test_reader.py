@@ -0,0 +1,68 @@
+import os
+import bz2
+import gzip
+import shutil
+import tempfile
+from eden.converter.fasta import fasta_to_sequence
+from eden.util.reader import read_lines, read_records
+
+
+class BZ2Member(object):
+
+    """Write one complete bzip2 stream, also appending to a file (BZ2File of Python 2 cannot)."""
+
+    def __init__(self, path, mode):
+        self.f = open(path, mode)
+        self.compressor = bz2.BZ2Compressor()
+
+    def write(self, data):
+        self.f.write(self.compressor.compress(data))
+
+    def close(self):
+        self.f.write(self.compressor.flush())
+        self.f.close()
+
+
+class TestReader:
+
+    def setup(self):
+        self.dir_path = tempfile.mkdtemp()
+        self.lines = ['>seq_%d\n' % i if i % 2 == 0 else 'ACGU' * (i % 7 + 1) + '\n' for i in range(200)]
+        self.text = ''.join(self.lines)
+
+    def teardown(self):
+        shutil.rmtree(self.dir_path)
+
+    def _write(self, name, opener, members=1):
+        path = os.path.join(self.dir_path, name)
+        size = len(self.text) // members + 1
+        for member in range(members):
+            # every member is a complete compressed stream
+            f = opener(path, 'ab' if member > 0 else 'wb')
+            f.write(self.text[member * size:(member + 1) * size])
+            f.close()
+        return path
+
+    def test_read_lines(self):
+        """Test reading lines of plain, gzip and bzip2 files (also multi member) with small chunks."""
+
+        paths = [self._write('plain.fa', open),
+                 self._write('single.fa.gz', gzip.open),
+                 self._write('multi.fa.gz', gzip.open, members=3),
+                 self._write('compressed.fa.bz2', bz2.BZ2File),
+                 self._write('multi.fa.bz2', BZ2Member, members=3)]
+        for path in paths:
+            for chunk_size in [7, 64, 1024 * 1024]:
+                assert(list(read_lines(path, chunk_size=chunk_size)) == self.lines)
+            seqs = list(fasta_to_sequence(path))
+            assert(len(seqs) == 100 and seqs[-1][0] == 'seq_198')
+
+    def test_read_records(self):
+        """Test splitting a file into records ending with a separator line."""
+
+        records = ['mol_%d\n  data\n$$$$\n' % i for i in range(10)]
+        path = os.path.join(self.dir_path, 'mols.sdf.gz')
+        f = gzip.open(path, 'wb')
+        f.write(''.join(records) + 'last\n')
+        f.close()
+        assert(list(read_records(path, separator='$$$$', chunk_size=5)) == records + ['last\n'])
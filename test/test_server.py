@@ -0,0 +1,59 @@
+import threading
+from eden.server import MicroBatcher, PredictionService, make_server
+from eden.client import PredictionClient
+
+
+def score(instances):
+    return [(len(seq) - 40, id) for id, seq in instances]
+
+
+class TestServer:
+
+    def test_micro_batcher(self):
+        """Test that concurrent requests are scored together and get back their own results."""
+
+        batch_sizes = []
+
+        def score_batch(instances):
+            batch_sizes.append(len(instances))
+            return score(instances)
+
+        batcher = MicroBatcher(score_batch, max_batch_size=100, max_wait=0.5)
+        replies = dict()
+
+        def request(i):
+            replies[i] = batcher.submit([('ID%d' % i, 'A' * i), ('ID%d' % i, 'C' * 2 * i)]).results
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.close()
+        assert(sum(batch_sizes) == 10 and len(batch_sizes) < 5)
+        assert(all(replies[i] == [(i - 40, 'ID%d' % i), (2 * i - 40, 'ID%d' % i)] for i in range(5)))
+
+    def test_server(self):
+        """Test a prediction and the metrics over HTTP."""
+
+        service = PredictionService(score, max_wait=0)
+        server = make_server(service, port=0)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            client = PredictionClient(port=server.server_address[1])
+            for i in range(2):
+                reply = client.predict(instances=[['a', 'A' * 50], ['b', 'C' * 30]])
+                assert(reply['predictions'] == [1, -1] and reply['ids'] == ['a', 'b'])
+            assert(client.metrics()['n_requests'] == 2)
+            try:
+                client.predict(input_file='missing.fa')
+                assert(False)
+            except Exception as e:
+                assert('input files' in str(e))
+            client.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.close()
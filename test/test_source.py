@@ -0,0 +1,40 @@
+from eden.converter.fasta import sequence_to_eden
+from eden.graph import Vectorizer
+from eden.util.source import ReplayableSource, CachedSource, replayable, fan_out
+from test_vectorize import make_seqs
+
+
+def counting_source(items, counter):
+    counter[0] += 1
+    for item in items:
+        yield item
+
+
+class TestSource:
+
+    def test_replay(self):
+        """Test that replayable sources are re-opened and one-shot iterators are cached only if allowed."""
+
+        counter = [0]
+        source = ReplayableSource(counting_source, range(10), counter)
+        first, second = fan_out(source)
+        assert(list(second) == list(first) == range(10) and counter[0] == 2)
+        cached = replayable(counting_source(range(10), counter), cache=True)
+        assert(isinstance(cached, CachedSource))
+        first, second = iter(cached), iter(cached)
+        assert(first.next() == 0 and list(second) == range(10) and list(first) == range(1, 10))
+        first, second = fan_out(counting_source(range(10), counter))
+        assert(list(first) == list(second) == range(10) and counter[0] == 4)
+        try:
+            replayable(iter(range(10)))
+            assert(False)
+        except Exception as e:
+            assert('ERROR' in str(e))
+
+    def test_fit_transform(self):
+        """Test that fit_transform re-reads a replayable source of graphs."""
+
+        seqs = make_seqs(n_seqs=20)
+        vectorizer = Vectorizer(complexity=2)
+        data_matrix = vectorizer.fit_transform(ReplayableSource(sequence_to_eden, seqs))
+        assert((data_matrix - vectorizer.transform(sequence_to_eden(seqs))).nnz == 0)
@@ -0,0 +1,29 @@
+import os
+import tempfile
+import shutil
+from eden.util.trial_log import TrialLog, trial_key
+
+
+class TestTrialLog:
+
+    def test_resume(self):
+        """Test that a log is read back without its incomplete last record and that logged keys are found."""
+
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'trials.jsonl')
+            log = TrialLog(path)
+            for i, score in enumerate([.5, .7, .6]):
+                key = trial_key({}, {'complexity': 2}, {'penalty': 'l1', 'alpha': i})
+                log.append(dict(iteration=i, key=key, score=score, improved=score > .6,
+                                estimator_args={'penalty': 'l1', 'alpha': i}))
+            with open(path, 'a') as f:
+                f.write('{"iteration": 3, "key"')
+            log = TrialLog(path)
+            assert(len(log) == 3 and log.last_iteration() == 2)
+            assert(log.best()['score'] == .7)
+            assert(trial_key({}, {'complexity': 2}, {'penalty': 'l1', 'alpha': 1}) in log)
+            assert(log.get(log.best()['key'])['estimator_args'] == {'penalty': 'l1', 'alpha': 1})
+            assert(len(TrialLog(path, resume=False)) == 0 and not os.path.exists(path))
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,204 @@
+import os
+import random
+import tempfile
+import shutil
+from scipy.sparse import vstack
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.linear_model import SGDClassifier
+from eden.converter.fasta import sequence_to_eden
+from eden.graph import Vectorizer
+from eden.util import vectorize, multiprocess_vectorize, mp_pre_process, pre_process_vectorize
+from eden.util import compute_balanced_intervals, fit_online
+from eden.util import make_data_matrix, successive_halving_search, SCORINGS
+from eden.util import WarmStartCV, warm_start_order, supports_warm_start
+from eden.util.pool import WorkerPool
+from eden.util import pool as pool_module
+from eden.util.csr_buffer import CSRBuffer, write_block
+
+
+def make_seqs(n_seqs=60, min_len=10, max_len=80, random_state=1):
+    random.seed(random_state)
+    return [('ID%d' % i, ''.join(random.choice('ACGU') for _ in range(random.randint(min_len, max_len))))
+            for i in range(n_seqs)]
+
+
+class TestVectorize:
+
+    def test_vectorize_with_pool(self):
+        """Test that a reused pool produces the same data matrix as the serial vectorization."""
+
+        seqs = make_seqs()
+        vectorizer = Vectorizer(complexity=2)
+        serial_data_matrix = vectorize(sequence_to_eden(seqs), vectorizer=vectorizer, n_jobs=1)
+        with WorkerPool(n_jobs=2) as pool:
+            for i in range(2):
+                data_matrix = vectorize(sequence_to_eden(seqs), vectorizer=vectorizer, n_jobs=2, pool=pool)
+                assert(data_matrix.shape == serial_data_matrix.shape)
+                assert((data_matrix - serial_data_matrix).nnz == 0)
+            assert(pool.is_running())
+        assert(pool.is_running() is False)
+
+    def test_mp_pre_process_with_pool(self):
+        """Test that the parallel pre-processing preserves the order of the instances."""
+
+        seqs = make_seqs()
+        with WorkerPool(n_jobs=2) as pool:
+            graphs = mp_pre_process(seqs, pre_processor=sequence_to_eden, n_jobs=2, pool=pool)
+        assert([graph.graph['id'] for graph in graphs] == [header for header, seq in seqs])
+
+    def test_pre_process_vectorize(self):
+        """Test that the fused pre-processing and vectorization stage matches the two separate stages."""
+
+        seqs = make_seqs()
+        vectorizer = Vectorizer(complexity=2)
+        serial_data_matrix = vectorize(sequence_to_eden(seqs), vectorizer=vectorizer, n_jobs=1)
+        with WorkerPool(n_jobs=2) as pool:
+            data_matrix, ids = pre_process_vectorize(seqs,
+                                                     pre_processor=sequence_to_eden,
+                                                     vectorizer=vectorizer,
+                                                     key='id',
+                                                     n_jobs=2,
+                                                     pool=pool)
+        assert((data_matrix - serial_data_matrix).nnz == 0)
+        assert(ids == [header for header, seq in seqs])
+        try:
+            pre_process_vectorize([], pre_processor=sequence_to_eden, vectorizer=vectorizer, key='id', n_jobs=1)
+            assert(False)
+        except Exception as e:
+            assert('ERROR' in str(e))
+
+    def test_shared_output(self):
+        """Test that the rows written in the shared buffer match the pickled blocks."""
+
+        seqs = make_seqs()
+        graphs = list(sequence_to_eden(seqs))
+        vectorizer = Vectorizer(complexity=2)
+        with WorkerPool(n_jobs=2) as pool:
+            data_matrix = vectorize(graphs, vectorizer=vectorizer, n_jobs=2, pool=pool)
+            pickled_data_matrix = multiprocess_vectorize(graphs, vectorizer=vectorizer, pool=pool, shared_output=False)
+        assert(data_matrix.shape == pickled_data_matrix.shape)
+        assert((data_matrix - pickled_data_matrix).nnz == 0)
+
+    def test_shared_output_without_space(self):
+        """Test that the blocks are collected in memory when there is no space for the shared buffer."""
+
+        seqs = make_seqs()
+        graphs = list(sequence_to_eden(seqs))
+        vectorizer = Vectorizer(complexity=2)
+        free_space = pool_module.free_space
+        pool_module.free_space = lambda path: 0
+        try:
+            with WorkerPool(n_jobs=2) as pool:
+                assert(pool.shared_path('csr', size=1) is None)
+                data_matrix = multiprocess_vectorize(graphs, vectorizer=vectorizer, pool=pool)
+                try:
+                    pre_process_vectorize([], pre_processor=sequence_to_eden, vectorizer=vectorizer,
+                                          n_jobs=2, pool=pool)
+                    assert(False)
+                except Exception as e:
+                    assert('ERROR' in str(e))
+        finally:
+            pool_module.free_space = free_space
+        assert((data_matrix - vectorize(graphs, vectorizer=vectorizer, n_jobs=1)).nnz == 0)
+
+    def test_csr_buffer_overflow(self):
+        """Test the assembly of blocks that fit their region together with blocks that do not."""
+
+        vectorizer = Vectorizer(complexity=2)
+        blocks = [vectorizer.transform(sequence_to_eden(make_seqs(n_seqs=5, random_state=i))) for i in range(4)]
+        dir_path = tempfile.mkdtemp()
+        try:
+            block_nnz = [blocks[0].nnz, blocks[1].nnz - 1, blocks[2].nnz + 10, 0]
+            output_buffer = CSRBuffer(os.path.join(dir_path, 'csr'), [5] * 4, block_nnz, vectorizer.feature_size)
+            results = [write_block(block, output_buffer.slot(i)) for i, block in enumerate(blocks)]
+            assert([overflow is not None for nnz, n_rows, overflow in results] == [False, True, False, True])
+            data_matrix = output_buffer.assemble(results)
+            assert(os.listdir(dir_path) == [])
+        finally:
+            shutil.rmtree(dir_path)
+        assert((data_matrix - vstack(blocks)).nnz == 0)
+
+    def test_csr_buffer_read_only(self):
+        """Test that assembled blocks are read-only maps of the buffer, or copies in a memory backed directory."""
+
+        vectorizer = Vectorizer(complexity=2)
+        blocks = [vectorizer.transform(sequence_to_eden(make_seqs(n_seqs=5, random_state=i))) for i in range(3)]
+        for base_dir in [None, '/dev/shm']:
+            if base_dir is not None and not os.path.isdir(base_dir):
+                continue
+            dir_path = tempfile.mkdtemp(dir=base_dir)
+            try:
+                block_nnz = [block.nnz + 10 for block in blocks]
+                output_buffer = CSRBuffer(os.path.join(dir_path, 'csr'), [5] * 3, block_nnz, vectorizer.feature_size)
+                results = [write_block(block, output_buffer.slot(i)) for i, block in enumerate(blocks)]
+                data_matrix = output_buffer.assemble(results)
+                assert(os.listdir(dir_path) == [])
+            finally:
+                shutil.rmtree(dir_path)
+            assert(data_matrix.data.flags.writeable == output_buffer.memory_backed)
+            assert(data_matrix.indices.flags.writeable == output_buffer.memory_backed)
+            assert((data_matrix - vstack(blocks)).nnz == 0)
+
+    def test_compute_balanced_intervals(self):
+        """Test that the intervals are contiguous and have similar cost."""
+
+        costs = [10, 1, 1, 1, 1, 1, 1, 1, 1, 1, 10, 1]
+        intervals = compute_balanced_intervals(costs, n_blocks=3)
+        assert(intervals[0][0] == 0 and intervals[-1][1] == len(costs))
+        assert(all(end == start for (_, end), (start, _) in zip(intervals[:-1], intervals[1:])))
+        assert(len(intervals) == 3)
+        assert(max(sum(costs[start:end]) for start, end in intervals) <= 11)
+
+    def test_fit_online(self):
+        """Test the chunked online training with a single epoch and with epochs replayed from disk."""
+
+        vectorizer = Vectorizer(complexity=2)
+        pos = [(header, 'ACGUACGGGU' * 2 + seq) for header, seq in make_seqs(n_seqs=40, random_state=1)]
+        neg = make_seqs(n_seqs=40, random_state=2)
+        data_matrix = vectorize(sequence_to_eden(pos + neg), vectorizer=vectorizer, n_jobs=1)
+        y = [1] * len(pos) + [-1] * len(neg)
+        for n_epochs in [1, 3]:
+            estimator = fit_online(sequence_to_eden(pos), sequence_to_eden(neg),
+                                   vectorizer=vectorizer,
+                                   estimator=MultinomialNB(),
+                                   chunk_size=16,
+                                   n_epochs=n_epochs,
+                                   n_jobs=1)
+            assert(estimator.score(data_matrix, y) > 0.9)
+
+    def test_successive_halving(self):
+        """Test that the halving search returns a fitted estimator and all the cross validated scores."""
+
+        vectorizer = Vectorizer(complexity=2)
+        pos = [(header, 'ACGUACGGGU' * 2 + seq) for header, seq in make_seqs(n_seqs=45, random_state=1)]
+        neg = make_seqs(n_seqs=45, random_state=2)
+        positive_data_matrix = vectorize(sequence_to_eden(pos), vectorizer=vectorizer, n_jobs=1)
+        negative_data_matrix = vectorize(sequence_to_eden(neg), vectorizer=vectorizer, n_jobs=1)
+        X, y = make_data_matrix(positive_data_matrix=positive_data_matrix,
+                                negative_data_matrix=negative_data_matrix)
+        param_dist = {'alpha': [1e-6, 1e-4, 1e-2, 1], 'penalty': ['l1', 'l2']}
+        estimator, params, scores = successive_halving_search(SGDClassifier(), param_dist, X, y,
+                                                              n_candidates=8, factor=3, cv=5, n_jobs=1)
+        assert(sorted(scores) == sorted(SCORINGS))
+        assert(len(scores['roc_auc']) == 5)
+        assert(estimator.get_params()['alpha'] == params['alpha'])
+        assert(estimator.score(X, y) > 0.9)
+
+    def test_warm_start_cv(self):
+        """Test the warm started cross validation of a batch of settings and the final warm started fit."""
+
+        vectorizer = Vectorizer(complexity=2)
+        pos = [(header, 'ACGUACGGGU' * 2 + seq) for header, seq in make_seqs(n_seqs=40, random_state=1)]
+        neg = make_seqs(n_seqs=40, random_state=2)
+        X = vectorize(sequence_to_eden(pos + neg), vectorizer=vectorizer, n_jobs=1)
+        y = [1] * len(pos) + [-1] * len(neg)
+        params_list = [{'alpha': 1e-4, 'penalty': 'l2'}, {'alpha': 1e-2, 'penalty': 'l1'},
+                       {'alpha': 1e-2, 'penalty': 'l2'}, {'alpha': 1e-3, 'penalty': 'l2'}]
+        assert(warm_start_order(params_list) == [1, 2, 3, 0])
+        assert(supports_warm_start(SGDClassifier()) and not supports_warm_start(MultinomialNB()))
+        warm_start_cv = WarmStartCV(X, y, cv=4, n_jobs=1)
+        for i in range(2):
+            results = warm_start_cv.cross_val_scores(SGDClassifier(), params_list, scorings=['roc_auc'])
+            assert(all(len(result['roc_auc']) == 4 and result['roc_auc'].mean() > 0.9 for result in results))
+        estimator = SGDClassifier(**params_list[0])
+        assert(warm_start_cv.fit(estimator, params_list[0]).score(X, y) > 0.9)